@@ -1,24 +1,60 @@
 # app.py
-from fastapi import FastAPI, HTTPException, Request, Header
+import time
+IMPORT_STARTED = time.perf_counter()  # start of the import-to-ready measurement
+
+from fastapi import FastAPI, Depends, HTTPException, Request, Header, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from models import SessionLocal, Knowledge, User
-import hashlib, re, json, os, time, uuid, csv, datetime, pickle
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from models import SessionLocal, Knowledge, User, get_db, init_db
+from knowledge_index import MIN_RETRIEVAL_SCORE, SNAPSHOT_PATH, KnowledgeIndex, TfidfIndex
+import knowledge_fts
+from knowledge_revision import KnowledgeWatcher
+from near_duplicates import DEFAULT_THRESHOLD, load_clusters, merge_entries
+from intent_engine import IntentEngine, keyword_intent
+from lang_id import LanguageIdentifier
+from chat_log import ChatLogStore, ChatLogWriter, iter_csv
+from response_cache import ResponseCache, cache_key
+from rate_limit import ChatAdmission, ConcurrencyGate, TokenBucketLimiter
+from response_rules import ResponseRules
+from token_store import TOKEN_SWEEP_SECONDS, TokenStore
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio, hashlib, math, threading, json, os
 
 # --------------------
 # App setup
 # --------------------
-app = FastAPI()
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# WARMUP decides when startup loads the DB schema, admin user, indexes and models:
+#   background - the server accepts requests at once, warm-up runs in db_executor (default)
+#   eager      - startup waits for the warm-up, so the first request is fast
+#   lazy       - nothing is loaded until a request needs it
+WARMUP = os.getenv("WARMUP", "background").lower()
+
+# seconds since IMPORT_STARTED; reported by /ready and /admin/metrics
+startup_timings: dict = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop = asyncio.get_running_loop()
+    startup_timings["import_seconds"] = round(APP_IMPORTED - IMPORT_STARTED, 3)
+    if WARMUP == "eager":
+        await loop.run_in_executor(db_executor, warm_up)
+    elif WARMUP != "lazy":
+        loop.run_in_executor(db_executor, warm_up)
+    startup_timings["serving_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    print(f"✓ Serving {startup_timings['serving_seconds']:.2f}s after import (warm-up: {WARMUP})")
+    sweeper = asyncio.create_task(sweep_tokens())
+    syncer = asyncio.create_task(sync_knowledge())
+    yield
+    sweeper.cancel()
+    syncer.cancel()
+
+app = FastAPI(lifespan=lifespan)
+# CORSMiddleware is added after ChatAdmission (below), so it wraps the
+# admission control and its 429/503 responses carry CORS headers too
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -46,13 +82,11 @@ def chat_page():
 # --------------------
 # NLP & Chat utilities
 # --------------------
-def preprocess(text: str) -> str:
-    """Clean and normalize text for matching."""
-    text = text.lower().strip()
-    return re.sub(r"[^a-zA-Z0-9\s]", "", text)
+# character-trigram language model trained by train_lang_id.py, loaded on first use
+lang_identifier = LanguageIdentifier()
 
 def auto_lang(msg: str) -> str:
-    """Auto-detect language from message using keyword heuristics.
+    """Auto-detect language from message using a character-trigram model.
 
     Returns language codes used in this app:
       en - English
@@ -68,282 +102,109 @@ def auto_lang(msg: str) -> str:
       (others default to en)
     """
     try:
-        words = msg.lower().split()
-        # Spanish detection
-        spanish_words = ["el", "la", "de", "que", "y", "a", "en", "es", "se", "del", "para", "con"]
-        if sum(1 for w in words if w in spanish_words) > len(words) * 0.3:
-            return "es"
-        # Luganda keywords
-        luganda_words = ["kyokka", "nze", "obulimi", "ssebo", "mukyala", "bye" , "ggwe"]
-        if any(w in luganda_words for w in words):
-            return "lg"
-        # Swahili keywords
-        swahili_words = ["sala", "mimi", "kwa", "ni", "jina", "chakula", "sawa"]
-        if any(w in swahili_words for w in words):
-            return "sw"
-        # Runyankole keywords
-        runyankole_words = ["ye", "omuntu", "enkorogoto", "obulimi", "togye"]
-        if any(w in runyankole_words for w in words):
-            return "rn"
-        # Acholi/Luo keywords
-        acholi_words = ["awuok", "anyo", "lul", "kede", "romo", "iny" ]
-        if any(w in acholi_words for w in words):
-            return "ach"
-        # Lango keywords
-        lango_words = ["par", "laber", "pi", "wak", "iyo", "yɛ" ]
-        if any(w in lango_words for w in words):
-            return "lg2"
-        # French keywords
-        french_words = ["bonjour","merci","oui","non","s'il","vous","être"]
-        if any(w in french_words for w in words):
-            return "fr"
-        # Arabic keywords
-        arabic_words = ["مرحبا","شكرا","نعم","لا","زراعة","مزارع"]
-        if any(w in arabic_words for w in words):
-            return "ar"
-        # Hindi keywords
-        hindi_words = ["नमस्ते","धन्यवाद","हाँ","नहीं","कृषि","फसल"]
-        if any(w in hindi_words for w in words):
-            return "hi"
-    except:
-        pass
-    return "en"
+        return lang_identifier.detect(msg)
+    except Exception as e:
+        print(f"Language detection error: {e}")
+        return "en"
+
+# trained intent model (sklearn or keyword-dict pickle), loaded once on first use
+intent_engine = IntentEngine()
 
 def detect_intent(msg: str) -> str:
-    """Simple intent detection based on keywords."""
-    msg_lower = msg.lower()
-    if any(word in msg_lower for word in ["disease", "pest", "illness", "sick", "damage"]):
-        return "disease"
-    elif any(word in msg_lower for word in ["fertilizer", "nutrient", "soil", "pH", "compost"]):
-        return "fertilizer"
-    elif any(word in msg_lower for word in ["water", "irrigation", "rain", "drought"]):
-        return "irrigation"
-    elif any(word in msg_lower for word in ["weather", "temperature", "climate", "season"]):
-        return "weather"
-    elif any(word in msg_lower for word in ["harvest", "mature", "ready", "pick", "crop"]):
-        return "harvest"
-    return "general"
+    """Classify the intent of a message with the trained intent model."""
+    try:
+        return intent_engine.predict(msg)
+    except Exception as e:
+        print(f"Intent detection error: {e}")
+        return keyword_intent(msg)
+
+# Retrieval over the Knowledge table, built once on first use.
+#   RETRIEVAL_MODE=tfidf   - cosine similarity over a sparse TF-IDF matrix (default)
+#   RETRIEVAL_MODE=keyword - token-overlap scoring on the inverted index
+#   RETRIEVAL_MODE=fts     - BM25 over the SQLite FTS5 table, nothing held in memory
+# Answers scoring below MIN_RETRIEVAL_SCORE (knowledge_index.py) are not used.
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "tfidf").lower()
+knowledge_index = KnowledgeIndex()
+tfidf_index = TfidfIndex(snapshot=SNAPSHOT_PATH)  # maps the prebuilt snapshot if current
+
+def retrieve_answer(question: str) -> tuple[str | None, float]:
+    """Return the best knowledge base answer and its similarity score (0..1)."""
+    try:
+        if RETRIEVAL_MODE == "tfidf":
+            return tfidf_index.best(question)
+        if RETRIEVAL_MODE == "fts":
+            with SessionLocal() as db:
+                return knowledge_fts.best(db, question)
+        answer = knowledge_index.search(question)
+        return answer, (1.0 if answer else 0.0)
+    except Exception as e:
+        print(f"Search knowledge error: {e}")
+        return None, 0.0
 
 def search_knowledge(question: str) -> str | None:
     """Search the knowledge base for an answer."""
+    answer, score = retrieve_answer(question)
+    return answer if score >= MIN_RETRIEVAL_SCORE else None
+
+def search_knowledge_batch(questions: list[str]) -> list[str | None]:
+    """search_knowledge() for many questions (one sparse matrix product in tfidf mode)."""
     try:
-        db = SessionLocal()
-        clean_q = preprocess(question)
-        
-        # Try exact match first
-        result = db.query(Knowledge).filter(Knowledge.question.ilike(f"%{clean_q}%")).first()
-        if result:
-            db.close()
-            return result.answer
-        
-        # Try keyword matching if exact match fails
-        keywords = clean_q.split()
-        best_match = None
-        best_score = 0
-        
-        for kb in db.query(Knowledge).all():
-            kb_text = preprocess(kb.question)
-            kb_words = kb_text.split()
-            
-            # Calculate matching score
-            matches = sum(1 for kw in keywords if kw in kb_words)
-            if matches > best_score:
-                best_score = matches
-                best_match = kb.answer
-        
-        db.close()
-        return best_match if best_score > 0 else None
+        if RETRIEVAL_MODE == "tfidf":
+            hits = tfidf_index.best_batch(questions)
+            return [a if score >= MIN_RETRIEVAL_SCORE else None for a, score in hits]
     except Exception as e:
         print(f"Search knowledge error: {e}")
-        try:
-            db.close()
-        except:
-            pass
-        return None
+    return [search_knowledge(q) for q in questions]
 
-def generate_smart_response(msg: str, intent: str, lang: str) -> str:
-    """Generate intelligent response based on intent and message."""
-    msg_lower = msg.lower().strip()
-    
-    # Handle greetings first
-    # expanded to recognize salutations in all supported languages
-    greetings = [
-        "hi", "hello", "hey", "greetings", "good morning", "good afternoon",
-        "good evening", "what's up", "whats up", "how are you", "howdy", "yo",
-        "hola", "buenos", "buenas",               # Spanish
-        "bonjour", "salut", "allo",              # French
-        "مرحبا", "أهلا", "سلام",                  # Arabic
-        "नमस्ते", "नमस्कार", "हैलो",             # Hindi
-        "gyebale", "hujambo", "bwakabona",       # Ugandan greetings
-        "anywak", "kieni"
-    ]
-
-    if any(greeting in msg_lower for greeting in greetings):
-        responses_greetings = {
-            "en": "Hello! I'm here to help with whatever's going on with your crops. Ask me anything.",
-            "es": "¡Hola! Estoy aquí para ayudarte con tus cultivos. Pregúntame lo que necesites.",
-            "lg": "Gyebale! Nja kukuyamba mu bikwata ku bulimi bwo. Nkwogeraiki.",
-            "sw": "Hujambo! Niko hapa kusaidia kuhusu kilimo chako. Uliza chochote.",
-            "rn": "Bwakabona! Ninkusiima kukuyamba ku bulimi bwo. Nyikiriza ekibuuzo.",
-            "ach": "Anywak! Kinyi ne kelo pa i ndeke? Twero kekenal.",
-            "lg2": "Keni! Awe poto ni pi. Nyero kacek.",
-            "fr": "Bonjour! Je suis là pour vous aider avec vos cultures. Demandez-moi ce que vous voulez.",
-            "ar": "مرحبا! أنا هنا لمساعدتك في زراعتك. اسألني أي شيء.",
-            "hi": "नमस्ते! मैं आपकी खेती में मदद के लिए यहाँ हूँ। मुझसे कुछ भी पूछें।"
-        }
-        return responses_greetings.get(lang, responses_greetings["en"])
-    
-    # Handle thank you / appreciation
-    thanks = ["thanks", "thank you", "gracias", "thx", "appreciated", "appreciate it", "thanks so much"]
-    if any(t in msg_lower for t in thanks):
-        responses_thanks = {
-            "en": "No problem at all! That's what I'm here for. Reach out anytime - farming life gets complicated and two heads are better than one.",
-            "es": "¡Sin problema! Para eso estoy aquí. Comunícate en cualquier momento - la vida agrícola es complicada y dos mentes son mejor que una.",
-            "lg": "Tolina kintu! Kino kye nnina okubaweereza. Omanyi okunyumya emirundi gyonna.",
-            "sw": "Hakuna shida! Niko hapa kukusaidia. Uliza wakati wowote.",
-            "rn": "Togenda! Ninkuhereza. Kabiririze emikolo gyonna.",
-            "ach": "Ket ma? Aneno iye. Win kit me tye.",
-            "lg2": "Okato! An iweyo. Nyumara chik.",
-        }
-        return responses_thanks.get(lang, responses_thanks["en"])
-    
-    # Handle yes/no responses
-    yes_words = ["yes", "yeah", "yep", "sure", "okay", "ok", "fine", "si", "sí", "claro"]
-    no_words = ["no", "nope", "nah", "not really", "no gracias"]
-    
-    if any(word in msg_lower for word in yes_words):
-        responses_yes = {
-            "en": "Awesome! Let's dig into it. What's giving you trouble?",
-            "es": "¡Genial! Vamos a profundizar. ¿Qué te está dando problemas?",
-            "lg": "Kikulu! Tujja kulaba. Kiki ekikuwangawo?",
-            "sw": "Vizuri! Tuanzie. Kuna tatizo gani?",
-            "rn": "Enkera! Tugendeeko. Kiki ekikukyungulira?",
-            "ach": "Tye otin! Dwala?",
-            "lg2": "Amwi! Min ma?",
-        }
-        return responses_yes.get(lang, responses_yes["en"])
-    
-    if any(word in msg_lower for word in no_words):
-        responses_no = {
-            "en": "All good. Just holler if you hit a snag later. I'll be around!",
-            "es": "Está bien. ¡Solo grita si tienes problemas luego! Estaré por aquí.",
-            "lg": "Byonna biri bulungi. Osobola kuneenya okumangiramu obuzibu. Nzijja kuba wano!",
-            "sw": "Sawa sawa. Niambie kama kupata shida baadaye. Niko hapa!",
-            "rn": "Byonna bisiima. Wanibainda obunaku obulungi. Ninkuba wano!",
-            "ach": "Bile! Kwena kony? Iko woko!",
-            "lg2": "Onyo! Watt? An iweyo.",
-        
-        }
-        return responses_no.get(lang, responses_no["en"])
-    
-    # Check for specific question keywords
-    if any(word in msg_lower for word in ["how", "what", "why", "when", "where", "can", "should", "do", "help"]):
-        # It's a question - try to find relevant answer
-        kb_answer = search_knowledge(msg)
-        if kb_answer:
-            return kb_answer
-    
-    # Generate contextual response based on intent
-    if intent == "disease":
-        if any(word in msg_lower for word in ["solution", "fix", "treatment", "cure", "prevent"]):
-            return "Okay, so here's what I'd do: First, remove any obviously infected plants - don't want it spreading. Then spray with a fungicide if it's fungal, or an organic option like neem oil. Keep your plants with room to breathe and avoid getting water on the leaves. Next year, try rotating your crops to break the disease cycle."
-        elif any(word in msg_lower for word in ["identify", "recognize", "see", "symptoms", "signs"]):
-            return "Tell me what you're seeing - are the leaves yellowing? Brown spots? Powdery white stuff? Is the stem soft and mushy? The more details you give me, the better I can help you pin down what it is."
-        else:
-            return "Disease problems? That's rough. We can figure this out. The usual suspects are blight, mildew, and various leaf spots. What crops are affected and what do the symptoms look like?"
-    
-    elif intent == "fertilizer":
-        if any(word in msg_lower for word in ["nitrogen", "phosphorus", "potassium", "npk"]):
-            return "So NPK - that's your nitrogen, phosphorus, and potassium. Nitrogen makes plants green and leafy, phosphorus builds strong roots, and potassium keeps plants healthy overall. A 10-10-10 mix works for most situations, but your soil test will tell you if you need to adjust."
-        elif any(word in msg_lower for word in ["soil", "test", "check", "measure"]):
-            return "Honestly, get your soil tested - saves you money in the long run. Your local ag extension office can check it. You want to know your pH (most crops like it between 6 and 7) and what nutrients you're lacking. Game changer."
-        elif any(word in msg_lower for word in ["type", "which", "best", "amount"]):
-            return "You got organic (compost, manure, that kind of thing) or chemical fertilizers. Use what makes sense for your farm. Start with a soil test to know what you need, then apply before planting and maybe once a month during the season."
-        else:
-            return "Fertilizer can be tricky. First move is get your soil tested. What crop are you working with?"
-    
-    elif intent == "irrigation":
-        if any(word in msg_lower for word in ["how much", "how often", "frequency", "amount", "schedule"]):
-            return "Most crops want about 1-2 inches of water a week, but the key is watering deep not daily. You want big roots, not shallow ones. Stick your finger in the soil 4 inches down - if it's dry, water it. Simple as that."
-        elif any(word in msg_lower for word in ["drought", "dry", "water", "rain"]):
-            return "Dry spell? Water early in the morning when it's cool - less waste that way. Throw down some mulch to keep moisture in the soil. Younger plants need it more than established ones. And if you can, drip irrigation is a lifesaver in drought."
-        elif any(word in msg_lower for word in ["method", "type", "system", "spray", "drip"]):
-            return "Drip systems are the most water-efficient. Sprinklers work well if you got the pressure. Flooding's simple but wastes water. Overhead's fine if you gotta keep bugs off. Depends what works for your setup."
-        else:
-            return "Watering's one of those things that takes practice. Tell me - are you letting it dry out between waterings or keeping it soaked?"
-    
-    elif intent == "weather":
-        if any(word in msg_lower for word in ["frost", "freeze", "cold", "temperature"]):
-            return "Frost coming? Get ready early - grab a frost cloth or blanket and get it on those plants before the sun goes down. Water a bit before the freeze, too - sounds weird but it helps. Next year, plant cold-hardy varieties."
-        elif any(word in msg_lower for word in ["rain", "rainfall", "wet", "waterlog"]):
-            return "Too much rain? First, make sure your ground drains okay - raised beds help if you got drainage issues. Don't work the soil when it's soaked - you'll mess up the structure. Raised beds are your friend here."
-        elif any(word in msg_lower for word in ["hot", "heat", "temperature", "sun", "shade"]):
-            return "Heat getting brutal? Shade cloth helps during peak heat, and mulch keeps the soil cooler. Water a bit more during heat waves. And yeah, some crops just handle heat better than others."
-        else:
-            return "Weather can make or break a season. What's the forecast looking like where you are?"
-    
-    elif intent == "harvest":
-        if any(word in msg_lower for word in ["when", "time", "mature", "ready", "ripe"]):
-            return "Timing is everything. Fruits should be fully colored, veggies should be at full size, greens before they bolt. Pick in the morning when it's cool - the produce stays fresher longer. What are you harvesting?"
-        elif any(word in msg_lower for word in ["how", "method", "technique", "proper"]):
-            return "Use clean tools, be gentle so you don't bruise anything, and harvest when it's cool. Handle with care - one bruise and it goes downhill fast."
-        elif any(word in msg_lower for word in ["storage", "keep", "preserve", "fresh"]):
-            return "Cool it down quick after you pick. Store it right - temperature matters, humidity matters. Keep stuff separate if you can, especially fruit that's ripening. Check on it regularly."
-        else:
-            return "Harvest time is exciting. What're you bringing in?"
-    
-    else:  # general intent
-        if "crop" in msg_lower or "plant" in msg_lower or "grow" in msg_lower:
-            return "Growing stuff is always an adventure. What's your question - disease issues, need to fertilize, watering problems, or something else?"
-        elif "soil" in msg_lower:
-            return "Soil's everything in farming. You gotta test it to know what you're working with, add organic stuff to keep it alive, watch your pH. What's going on with yours?"
-        elif "pest" in msg_lower:
-            return "Pests are the worst. First thing is figure out what bug you've actually got. Then you can decide whether to go the natural route or spray. What's bugging your crops?"
+# replies keyed on normalized message + resolved language; cleared on knowledge edits
+response_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "600")),
+)
+
+def index_upsert(kid: int, question: str, answer: str):
+    """Push a created or edited Knowledge row into the live retrieval structures."""
+    knowledge_index.add(kid, question, answer)
+    tfidf_index.add(kid, question, answer)
+    response_cache.clear()
+
+def index_remove(kid: int):
+    """Drop a deleted Knowledge row from the live retrieval structures."""
+    knowledge_index.remove(kid)
+    tfidf_index.remove(kid)
+    response_cache.clear()
+
+def replay_knowledge_rows(rows: dict):
+    """Apply Knowledge rows written through other workers ({id: (question, answer) or None})."""
+    for kid, row in rows.items():
+        if row is None:
+            index_remove(kid)
         else:
-            # If we have knowledge base entry, return it
-            kb_answer = search_knowledge(msg)
-            if kb_answer:
-                return kb_answer
-            return "I'm here if you need help. Ask me anything about your farm - pests, diseases, watering, fertilizer, weather... what's on your mind?"
-
-# Default responses for common intents
-responses = {
-    "disease": {
-        "en": "Diseases are no fun. Tell me what you're seeing - I can help.",
-        "es": "Las enfermedades son desagradables. Dime qué estás viendo - puedo ayudar.",
-    },
-    "fertilizer": {
-        "en": "Get your soil tested first - that way you know what you're actually lacking.",
-        "es": "Primero haz un análisis del suelo - así sabrás qué te falta.",
-    },
-    "irrigation": {
-        "en": "Check your soil - stick your finger 4 inches down and see if it's dry. That's your sign.",
-        "es": "Revisa tu suelo - mete el dedo 4 pulgadas y ve si está seco. Esa es tu señal.",
-    },
-    "weather": {
-        "en": "Weather's one of those things you can't control, but you can prepare for it.",
-        "es": "El clima es algo que no puedes controlar, pero puedes prepararte para ello.",
-    },
-    "harvest": {
-        "en": "Harvest time is when it all pays off. What are you bringing in?",
-        "es": "La cosecha es cuando todo vale la pena. ¿Qué estás recolectando?",
-    },
-    "general": {
-        "en": "I'm here for your farming questions. Shoot.",
-        "es": "Estoy aquí para tus preguntas agrícolas. Adelante.",
-    }
-}
+            index_upsert(kid, *row)
+
+def reload_knowledge():
+    """Rebuild the loaded retrieval indexes from the database (e.g. after a bulk import)."""
+    if knowledge_index.loaded:
+        knowledge_index.load_from_db()
+    if tfidf_index.loaded:
+        tfidf_index.load_from_db()
+    response_cache.clear()
+
+# Every worker follows the Knowledge change log (knowledge_revision.py) every
+# KNOWLEDGE_SYNC_SECONDS, so an edit made through one worker reaches the
+# indexes and reply caches of all of them.
+knowledge_watcher = KnowledgeWatcher(SessionLocal, on_rows=replay_knowledge_rows, on_reload=reload_knowledge)
+
+# Reply rules (keywords, priority, per-language replies) live in
+# response_rules.json and are re-read when the file changes.
+response_rules = ResponseRules(on_reload=response_cache.clear)
+
+DEFAULT_REPLY = "I'm here if you need help. Ask me anything about your farm - pests, diseases, watering, fertilizer, weather... what's on your mind?"
 
-# Fallback response if no knowledge base match
-fallback = {
-    "en": "Hmm, that one's not in my playbook, but I'm still here to help. Any farming challenges I can tackle?",
-    "es": "Esa no está en mi libro juego, pero sigo aquí para ayudar. ¿Algún desafío agrícola que pueda resolver?",
-    "lg": "Nnyinza okukyusa? Kino tekiri mu gida lyange naye ndyewunyisa okukuyamba. Eyini ekitufu mu bulimi?",
-    "sw": "Huo! Hii haipo katika kitabu changu, lakini niko hapa kusaidia. Kuna shida ya kilimo mail twressa?",
-    "rn": "Kino tekiri mu kyagenda kyange naye nkyopeerera okukuyamba. Ogira ekizibu ky'obulimi?",
-    "ach": "Ka! Iyi ritimo pa anena, toparo kany. En obedo ni?",
-    "lg2": "Keni! Okwero ni pi, laber okwera. Anyineri munyago?",
-}
+def generate_smart_response(msg: str, intent: str, lang: str, retrieve=search_knowledge) -> str:
+    """Generate intelligent response based on intent and message."""
+    reply = response_rules.respond(msg.strip(), intent, lang, retrieve)
+    return reply if reply is not None else DEFAULT_REPLY
 
 
 # --------------------
@@ -354,6 +215,9 @@ class ChatRequest(BaseModel):
     language: str = "auto"
     theme: str = "dark"
 
+# largest list accepted by /chat/batch
+MAX_CHAT_BATCH = int(os.getenv("MAX_CHAT_BATCH", "1000"))
+
 class SignupRequest(BaseModel):
     username: str
     password: str
@@ -371,21 +235,55 @@ class KnowledgeIn(BaseModel):
     language: str = "english"
     topic: str | None = None
 
+class DuplicateMergeIn(BaseModel):
+    keep: int
+    remove: list[int]
+    threshold: float = DEFAULT_THRESHOLD
+
 
 # --------------------
 # Utilities
 # --------------------
-CHAT_LOG_FILE = "chat_logs.txt"
-ADMIN_TOKEN_EXP_SECONDS = 60 * 60 * 3  # 3 hours
+# daily chat log segments + sidecar indexes; migrate an old chat_logs.txt with
+# `python chat_log.py migrate chat_logs.txt`
+CHAT_LOG_DIR = os.getenv("CHAT_LOG_DIR", "chat_logs")
+chat_log_store = ChatLogStore(CHAT_LOG_DIR)
+ADMIN_TOKEN_EXP_SECONDS = int(os.getenv("ADMIN_TOKEN_EXP_SECONDS", str(60 * 60 * 3)))  # 3 hours
+
+# batched background writer for the chat log (flushed on exit)
+chat_log_writer = ChatLogWriter(
+    chat_log_store,
+    max_batch=int(os.getenv("CHAT_LOG_BATCH_SIZE", "256")),
+    flush_interval=float(os.getenv("CHAT_LOG_FLUSH_SECONDS", "0.5")),
+    durability=os.getenv("CHAT_LOG_DURABILITY", "none").lower(),
+)
 
-# in-memory token store: token -> {username, expires}
-admin_tokens: dict = {}
+# login tokens: a per-worker dict in front of a store every worker shares
+# (TOKEN_STORE=sqlite | file | memory, see token_store.py)
+token_store = TokenStore()
 
 def hash_password(p: str) -> str:
     return hashlib.sha256(p.encode()).hexdigest()
 
-def ensure_default_admin():
-    """Create a default admin user if none exist (username=admin, password=admin123)."""
+_admin_lock = threading.Lock()
+_admin_checked = False
+
+def ensure_default_admin(force: bool = False):
+    """Create a default admin user if none exist (username=admin, password=admin123).
+
+    Runs once per process (at warm-up or the first login / signup); pass
+    force=True to check again.
+    """
+    global _admin_checked
+    if _admin_checked and not force:
+        return
+    with _admin_lock:
+        if _admin_checked and not force:
+            return
+        _create_default_admin()
+        _admin_checked = True
+
+def _create_default_admin():
     db = SessionLocal()
     try:
         u = db.query(User).filter(User.username == "admin").first()
@@ -405,31 +303,201 @@ def ensure_default_admin():
     finally:
         db.close()
 
-ensure_default_admin()
+async def sweep_tokens():
+    """Background task: drop expired login tokens every TOKEN_SWEEP_SECONDS."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(TOKEN_SWEEP_SECONDS)
+        try:
+            await loop.run_in_executor(db_executor, token_store.sweep)
+        except Exception as e:
+            print(f"Token sweep error: {e}")
+
+async def sync_knowledge():
+    """Background task: replay Knowledge edits made through other workers."""
+    if knowledge_watcher.interval <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(knowledge_watcher.interval)
+        try:
+            await loop.run_in_executor(db_executor, knowledge_watcher.poll)
+        except Exception as e:
+            print(f"Knowledge sync error: {e}")
 
 def verify_admin_token(token: str | None):
-    if not token:
-        return False
-    entry = admin_tokens.get(token)
-    if not entry:
-        return False
-    if entry["expires"] < time.time():
-        del admin_tokens[token]
-        return False
-    return True
+    entry = token_store.get(token)
+    return entry is not None and entry["role"] == "admin"
 
 def require_admin(token: str | None):
     if not verify_admin_token(token):
         raise HTTPException(status_code=401, detail="Invalid or expired admin token")
 
 
+# --------------------
+# Chat admission control (see rate_limit.py)
+# --------------------
+# per-client token buckets: CHAT_RATE_PER_SEC requests/s with bursts of up
+# to CHAT_BURST; a client is its user when X-Token is valid, else its IP
+chat_limiter = TokenBucketLimiter(
+    rate=float(os.getenv("CHAT_RATE_PER_SEC", "5")),
+    burst=float(os.getenv("CHAT_BURST", "30")),
+    max_keys=int(os.getenv("CHAT_RATE_CLIENTS", "100000")),
+)
+# chat requests in progress per worker before new ones get a 503 (0 = no cap)
+chat_gate = ConcurrencyGate(int(os.getenv("CHAT_MAX_INFLIGHT", "64")))
+# behind a reverse proxy, key anonymous clients on the first X-Forwarded-For address
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0") == "1"
+
+# (method, path) -> tokens charged by the middleware; /chat/batch charges per message itself
+CHAT_ROUTES = {("POST", "/chat"): 1, ("POST", "/chat/batch"): 0, ("POST", "/chat/stream"): 1, ("GET", "/chat/stream"): 1}
+
+async def chat_client_key(scope) -> str:
+    """Rate-limit bucket of a request or websocket: "user:<name>" or "ip:<address>"."""
+    headers = dict(scope.get("headers") or [])
+    forwarded = headers.get(b"x-forwarded-for")
+    if TRUST_FORWARDED_FOR and forwarded:
+        ip_key = "ip:" + forwarded.decode("latin-1").split(",")[0].strip()
+    else:
+        client = scope.get("client")
+        ip_key = "ip:" + (client[0] if client else "unknown")
+    token = headers.get(b"x-token", b"").decode("latin-1")
+    if token:
+        entry = token_store.peek(token)
+        # a token this worker has not cached yet is paid for from its IP's
+        # bucket before the store lookup, so a flood of made-up tokens is
+        # throttled like anonymous traffic instead of queueing on db_executor
+        if entry is None and not chat_limiter.acquire(ip_key):
+            entry = await asyncio.get_running_loop().run_in_executor(db_executor, token_store.get, token)
+        if entry is not None:
+            return "user:" + entry["username"]
+    return ip_key
+
+app.add_middleware(ChatAdmission, limiter=chat_limiter, gate=chat_gate, routes=CHAT_ROUTES,
+                   client_key=chat_client_key)
+
+# the middleware added last runs first: CORS answers preflights and decorates
+# every response, including admission control rejections
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
 # --------------------
 # Chat endpoint (fixed)
 # --------------------
+# Bounded pool for the one-off index / model load, which reads SQLite and
+# the pickles; the event loop never waits on it.
+db_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DB_EXECUTOR_WORKERS", "4")), thread_name_prefix="db")
+
+def warm_chat_path():
+    """Load the retrieval indexes and intent model (reads SQLite and the pickles)."""
+    knowledge_watcher.start()  # edits from here on are replayed by sync_knowledge()
+    if RETRIEVAL_MODE == "tfidf":
+        tfidf_index.ensure_loaded()
+    elif RETRIEVAL_MODE != "fts":
+        knowledge_index.ensure_loaded()
+    intent_engine.ensure_loaded()
+    lang_identifier.ensure_loaded()
+
+def warm_up():
+    """Startup warm-up: DB schema, default admin, then the chat path."""
+    start = time.perf_counter()
+    try:
+        init_db()
+        ensure_default_admin()
+        warm_chat_path()
+    except Exception as e:
+        print(f"Warm-up error: {e}")
+        return
+    startup_timings["warm_up_seconds"] = round(time.perf_counter() - start, 3)
+    startup_timings["ready_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    print(f"✓ Ready {startup_timings['ready_seconds']:.2f}s after import "
+          f"(warm-up {startup_timings['warm_up_seconds']:.2f}s)")
+
+def chat_path_ready() -> bool:
+    index = tfidf_index if RETRIEVAL_MODE == "tfidf" else knowledge_index
+    return (index.loaded or RETRIEVAL_MODE == "fts") and intent_engine.mode is not None and lang_identifier.loaded
+
+def resolve_language(msg: str, language: str | None) -> str:
+    """The requested language code, detected from the message for "auto"."""
+    if not language:
+        return "en"
+    if language.lower() == "auto":
+        return auto_lang(msg)
+    return language.lower()
+
+def build_reply(msg: str, language: str | None) -> dict:
+    """Resolve language and intent for a message and generate the reply (in memory)."""
+    lang = resolve_language(msg, language)
+
+    key = cache_key(msg, lang)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    # Detect intent
+    intent = detect_intent(msg)
+
+    # Generate intelligent response
+    reply = generate_smart_response(msg, intent, lang)
+    result = {"reply": reply, "intent": intent, "language": lang}
+    response_cache.put(key, result)
+    return dict(result)
+
+def build_replies(items: list[tuple[str, str | None]]) -> list[dict]:
+    """build_reply() for many (message, language) pairs at once.
+
+    Language detection, intent classification and retrieval each run once
+    over every message that is not already in the response cache.
+    """
+    results: list[dict | None] = [None] * len(items)
+    # an absent language means English, as in build_reply
+    langs = [(language or "en").lower() for _, language in items]
+    auto = [i for i, lang in enumerate(langs) if lang == "auto"]
+    for i, lang in zip(auto, lang_identifier.detect_batch([items[i][0] for i in auto])):
+        langs[i] = lang
+
+    misses = []
+    for i, (msg, _) in enumerate(items):
+        cached = response_cache.get(cache_key(msg, langs[i]))
+        if cached is not None:
+            results[i] = dict(cached)
+        else:
+            misses.append(i)
+
+    if misses:
+        msgs = [items[i][0] for i in misses]
+        try:
+            intents = intent_engine.predict_batch(msgs)
+        except Exception as e:
+            print(f"Intent detection error: {e}")
+            intents = [keyword_intent(m) for m in msgs]
+        answers = search_knowledge_batch(msgs)
+        for i, msg, intent, answer in zip(misses, msgs, intents, answers):
+            reply = generate_smart_response(msg, intent, langs[i], lambda q, a=answer: a)
+            result = {"reply": reply, "intent": intent, "language": langs[i]}
+            response_cache.put(cache_key(msg, langs[i]), result)
+            results[i] = dict(result)
+    return results
+
+def log_chat(msg: str, result: dict):
+    """Queue a chat record for the background log writer (never blocks)."""
+    chat_log_writer.write({
+        "ts": int(time.time()),
+        "message": msg,
+        "lang": result["language"],
+        "reply": result["reply"],
+        "intent": result["intent"]
+    })
 
 @app.post("/chat")
 @app.get("/chat")  # allow browser testing
-def chat(req: ChatRequest | None = None, message: str | None = None):
+async def chat(req: ChatRequest | None = None, message: str | None = None):
     """Handle chat requests from users."""
     try:
         # support both POST JSON and GET query
@@ -442,34 +510,17 @@ def chat(req: ChatRequest | None = None, message: str | None = None):
         if not msg:
             return {"reply": "Please send a message.", "intent": "general", "language": "en"}
 
-        # Determine language
-        lang = "en"
-        if req and hasattr(req, 'language') and req.language:
-            if req.language.lower() == "auto":
-                lang = auto_lang(msg)
-            else:
-                lang = req.language.lower()
-
-        # Detect intent
-        intent = detect_intent(msg)
+        if not chat_path_ready():
+            await asyncio.get_running_loop().run_in_executor(db_executor, warm_chat_path)
 
-        # Generate intelligent response
-        reply = generate_smart_response(msg, intent, lang)
-
-        # Log chat
-        try:
-            with open(CHAT_LOG_FILE, "a", encoding="utf-8") as f:
-                f.write(json.dumps({
-                    "ts": int(time.time()),
-                    "message": msg,
-                    "lang": lang,
-                    "reply": reply,
-                    "intent": intent
-                }, ensure_ascii=False) + "\n")
-        except Exception as log_err:
-            print(f"Chat log error: {log_err}")
-
-        return {"reply": reply, "intent": intent, "language": lang}
+        language = getattr(req, "language", None) if req else None
+        if RETRIEVAL_MODE == "fts":
+            # retrieval queries SQLite per message; keep it off the event loop
+            result = await asyncio.get_running_loop().run_in_executor(db_executor, build_reply, msg, language)
+        else:
+            result = build_reply(msg, language)
+        log_chat(msg, result)
+        return result
     
     except Exception as e:
         print(f"Chat endpoint error: {e}")
@@ -478,14 +529,159 @@ def chat(req: ChatRequest | None = None, message: str | None = None):
         return {"reply": "Sorry, I encountered an error. Please try again.", "error": str(e), "intent": "error", "language": "en"}
 
 
+@app.post("/chat/batch")
+async def chat_batch(reqs: list[ChatRequest], request: Request):
+    """Answer a list of chat messages (e.g. an SMS gateway burst), replies in order."""
+    if len(reqs) > MAX_CHAT_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_CHAT_BATCH} messages per batch")
+    # one token per message; a batch bigger than CHAT_BURST needs a full
+    # bucket and leaves it in debt, so the client's next requests wait
+    wait = chat_limiter.acquire(request.state.client_key, cost=max(1, len(reqs)))
+    if wait:
+        raise HTTPException(status_code=429, detail="Too many requests, please slow down.",
+                            headers={"Retry-After": str(max(1, math.ceil(wait)))})
+    msgs = [(r.message or "").strip() for r in reqs]
+    todo = [i for i, m in enumerate(msgs) if m]
+    out = [{"reply": "Please send a message.", "intent": "general", "language": "en"} for _ in reqs]
+    if not todo:
+        return out
+    try:
+        if not chat_path_ready():
+            await asyncio.get_running_loop().run_in_executor(db_executor, warm_chat_path)
+        # CPU-bound for large batches, so keep it off the event loop
+        results = await asyncio.get_running_loop().run_in_executor(
+            db_executor, build_replies, [(msgs[i], reqs[i].language) for i in todo])
+    except Exception as e:
+        print(f"Chat batch error: {e}")
+        raise HTTPException(status_code=500, detail="Sorry, I encountered an error. Please try again.")
+
+    now = int(time.time())
+    entries = []
+    for i, result in zip(todo, results):
+        out[i] = result
+        entries.append({"ts": now, "message": msgs[i], "lang": result["language"],
+                        "reply": result["reply"], "intent": result["intent"]})
+    chat_log_writer.write_many(entries)
+    return out
+
+
+# --------------------
+# Streaming chat (SSE / WebSocket)
+# --------------------
+# replies are sent in pieces of about this many characters, split at spaces
+STREAM_CHUNK_CHARS = int(os.getenv("STREAM_CHUNK_CHARS", "48"))
+
+def reply_chunks(reply: str, size: int = STREAM_CHUNK_CHARS) -> list[str]:
+    """Split a reply at word boundaries; joining the chunks gives back the reply."""
+    chunks, start = [], 0
+    while start < len(reply):
+        end = start + size
+        if end < len(reply):
+            space = reply.find(" ", end)
+            end = len(reply) if space == -1 else space + 1
+        chunks.append(reply[start:end])
+        start = end
+    return chunks
+
+async def stream_events(msg: str, language: str | None):
+    """Events for one message: metadata first, then the reply in chunks, then done."""
+    msg = (msg or "").strip()
+    if not msg:
+        yield {"type": "error", "detail": "Please send a message."}
+        return
+    if not chat_path_ready():
+        await asyncio.get_running_loop().run_in_executor(db_executor, warm_chat_path)
+
+    lang = resolve_language(msg, language)
+    key = cache_key(msg, lang)
+    result = response_cache.get(key)
+    if result is not None:
+        yield {"type": "meta", "intent": result["intent"], "language": lang}
+    else:
+        intent = detect_intent(msg)
+        # the client can show language/intent before the answer is ready
+        yield {"type": "meta", "intent": intent, "language": lang}
+        if RETRIEVAL_MODE == "fts":
+            reply = await asyncio.get_running_loop().run_in_executor(
+                db_executor, generate_smart_response, msg, intent, lang)
+        else:
+            reply = generate_smart_response(msg, intent, lang)
+        result = {"reply": reply, "intent": intent, "language": lang}
+        response_cache.put(key, result)
+
+    for chunk in reply_chunks(result["reply"]):
+        yield {"type": "chunk", "text": chunk}
+    log_chat(msg, result)
+    yield {"type": "done"}
+
+def sse_response(msg: str, language: str | None) -> StreamingResponse:
+    async def events():
+        try:
+            async for event in stream_events(msg, language):
+                yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            print(f"Chat stream error: {e}")
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'detail': 'Sorry, I encountered an error.'})}\n\n"
+
+    # no-transform / X-Accel-Buffering keep proxies from holding the stream back
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"})
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Server-Sent Events version of /chat: meta, chunk..., done."""
+    return sse_response(req.message, req.language)
+
+@app.get("/chat/stream")
+async def chat_stream_get(message: str = "", language: str = "auto"):
+    """GET variant of /chat/stream for EventSource clients."""
+    return sse_response(message, language)
+
+@app.websocket("/chat/ws")
+async def chat_ws(websocket: WebSocket):
+    """Persistent chat connection: send {"message", "language"}, receive the /chat/stream events as JSON."""
+    await websocket.accept()
+    client_key = await chat_client_key(websocket.scope)
+    try:
+        while True:
+            try:
+                req = await websocket.receive_json()
+                msg, language = req.get("message", ""), req.get("language", "auto")
+            except (ValueError, AttributeError):
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON object with a message"})
+                continue
+            # same admission as the HTTP chat routes, per message
+            wait = chat_limiter.acquire(client_key)
+            if wait:
+                await websocket.send_json({"type": "error", "detail": "Too many requests, please slow down.",
+                                           "retry_after": max(1, math.ceil(wait))})
+                continue
+            if not chat_gate.try_enter():
+                await websocket.send_json({"type": "error", "detail": "Server busy, please try again shortly.",
+                                           "retry_after": 1})
+                continue
+            try:
+                async for event in stream_events(str(msg), language):
+                    await websocket.send_json(event)
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                print(f"Chat websocket error: {e}")
+                await websocket.send_json({"type": "error", "detail": "Sorry, I encountered an error."})
+            finally:
+                chat_gate.leave()
+    except WebSocketDisconnect:
+        pass
+
+
 # --------------------
 # Admin: login / logout
 # --------------------
 @app.post("/admin/login")
-def admin_login(creds: LoginRequest):
+def admin_login(creds: LoginRequest, db: Session = Depends(get_db)):
     """Authenticate admin user and issue token."""
-    db = SessionLocal()
     try:
+        ensure_default_admin()
         user = db.query(User).filter(User.username == creds.username).first()
         if not user or user.password != hash_password(creds.password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -493,21 +689,17 @@ def admin_login(creds: LoginRequest):
         if getattr(user, "role", "farmer") != "admin":
             raise HTTPException(status_code=403, detail="Not an admin user")
         # generate token
-        token = str(uuid.uuid4())
-        admin_tokens[token] = {"username": creds.username, "expires": time.time() + ADMIN_TOKEN_EXP_SECONDS}
+        token = token_store.issue(creds.username, "admin", ADMIN_TOKEN_EXP_SECONDS)
         return {"token": token, "expires_in": ADMIN_TOKEN_EXP_SECONDS, "username": creds.username}
     except HTTPException:
         raise
     except Exception as e:
         print(f"Admin login error: {e}")
         raise HTTPException(status_code=500, detail="Login failed")
-    finally:
-        db.close()
 
 @app.post("/admin/logout")
 def admin_logout(x_token: str | None = Header(None)):
-    if x_token and x_token in admin_tokens:
-        del admin_tokens[x_token]
+    token_store.revoke(x_token)
     return {"ok": True}
 
 
@@ -515,29 +707,25 @@ def admin_logout(x_token: str | None = Header(None)):
 # User: login / logout
 # --------------------
 @app.post("/user/login")
-def user_login(creds: LoginRequest):
+def user_login(creds: LoginRequest, db: Session = Depends(get_db)):
     """Authenticate user (not admin) and issue token."""
-    db = SessionLocal()
     try:
+        ensure_default_admin()
         user = db.query(User).filter(User.username == creds.username).first()
         if not user or user.password != hash_password(creds.password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         # generate token
-        token = str(uuid.uuid4())
-        admin_tokens[token] = {"username": creds.username, "expires": time.time() + ADMIN_TOKEN_EXP_SECONDS}
+        token = token_store.issue(creds.username, user.role or "farmer", ADMIN_TOKEN_EXP_SECONDS)
         return {"token": token, "expires_in": ADMIN_TOKEN_EXP_SECONDS, "username": creds.username, "role": user.role}
     except HTTPException:
         raise
     except Exception as e:
         print(f"User login error: {e}")
         raise HTTPException(status_code=500, detail="Login failed")
-    finally:
-        db.close()
 
 @app.post("/user/logout")
 def user_logout(x_token: str | None = Header(None)):
-    if x_token and x_token in admin_tokens:
-        del admin_tokens[x_token]
+    token_store.revoke(x_token)
     return {"ok": True}
 
 
@@ -545,9 +733,8 @@ def user_logout(x_token: str | None = Header(None)):
 # Signup endpoint (stores optional email)
 # --------------------
 @app.post("/signup")
-def signup(req: SignupRequest):
+def signup(req: SignupRequest, db: Session = Depends(get_db)):
     """Register a new user account."""
-    db = SessionLocal()
     try:
         # Validate input
         if not req.username or len(req.username) < 3:
@@ -555,7 +742,9 @@ def signup(req: SignupRequest):
         if not req.password or len(req.password) < 6:
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
         
-        # check username/email collisions
+        # check username/email collisions (the default admin is created first
+        # so nobody can sign up as "admin" before it exists)
+        ensure_default_admin()
         if db.query(User).filter(User.username == req.username).first():
             raise HTTPException(status_code=400, detail="Username already exists")
         if req.email and db.query(User).filter(User.email == req.email).first():
@@ -576,44 +765,43 @@ def signup(req: SignupRequest):
         print(f"Signup error: {e}")
         db.rollback()
         raise HTTPException(status_code=500, detail="Signup failed")
-    finally:
-        db.close()
 
 
 # --------------------
 # Admin: Knowledge CRUD
 # --------------------
 @app.get("/admin/knowledge")
-def list_knowledge(x_token: str | None = Header(None), q: str | None = None):
+def list_knowledge(x_token: str | None = Header(None), q: str | None = None, db: Session = Depends(get_db)):
     """List all knowledge base entries (admin only)."""
     try:
         require_admin(x_token)
     except HTTPException:
         raise
     
-    db = SessionLocal()
     try:
         query = db.query(Knowledge)
-        if q:
-            qclean = f"%{q.lower()}%"
-            query = query.filter(Knowledge.question.ilike(qclean))
-        rows = query.order_by(Knowledge.id.desc()).limit(1000).all()
+        if q and knowledge_fts.match_expression(q) and db.get_bind().dialect.name == "sqlite":
+            # rows with every word (as a prefix) in question/answer/crop/topic, best BM25 first
+            ids = [hit[0] for hit in knowledge_fts.search(db, q, limit=1000, require_all=True, prefix=True)]
+            by_id = {r.id: r for r in query.filter(Knowledge.id.in_(ids))} if ids else {}
+            rows = [by_id[i] for i in ids if i in by_id]
+        else:
+            if q:
+                query = query.filter(Knowledge.question.ilike(f"%{q.lower()}%"))
+            rows = query.order_by(Knowledge.id.desc()).limit(1000).all()
         return [{"id": r.id, "question": r.question, "answer": r.answer, "intent": r.intent, "crop": r.crop, "language": r.language, "topic": r.topic} for r in rows]
     except Exception as e:
         print(f"List knowledge error: {e}")
         raise HTTPException(status_code=500, detail="Failed to list knowledge")
-    finally:
-        db.close()
 
 @app.post("/admin/knowledge")
-def create_knowledge(item: KnowledgeIn, x_token: str | None = Header(None)):
+def create_knowledge(item: KnowledgeIn, x_token: str | None = Header(None), db: Session = Depends(get_db)):
     """Create a new knowledge base entry (admin only)."""
     try:
         require_admin(x_token)
     except HTTPException:
         raise
     
-    db = SessionLocal()
     try:
         if not item.question or not item.answer:
             raise HTTPException(status_code=400, detail="Question and answer are required")
@@ -629,6 +817,7 @@ def create_knowledge(item: KnowledgeIn, x_token: str | None = Header(None)):
         db.add(k)
         db.commit()
         db.refresh(k)
+        index_upsert(k.id, k.question, k.answer)
         return {"ok": True, "id": k.id, "message": "Knowledge entry created"}
     except HTTPException:
         raise
@@ -636,18 +825,16 @@ def create_knowledge(item: KnowledgeIn, x_token: str | None = Header(None)):
         print(f"Create knowledge error: {e}")
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to create knowledge")
-    finally:
-        db.close()
 
 @app.put("/admin/knowledge/{kid}")
-def update_knowledge(kid: int, item: KnowledgeIn, x_token: str | None = Header(None)):
+def update_knowledge(kid: int, item: KnowledgeIn, x_token: str | None = Header(None),
+                     db: Session = Depends(get_db)):
     """Update a knowledge base entry (admin only)."""
     try:
         require_admin(x_token)
     except HTTPException:
         raise
     
-    db = SessionLocal()
     try:
         r = db.query(Knowledge).filter(Knowledge.id == kid).first()
         if not r:
@@ -663,6 +850,7 @@ def update_knowledge(kid: int, item: KnowledgeIn, x_token: str | None = Header(N
         r.language = (item.language or "english").strip()
         r.topic = (item.topic or "").strip() or None
         db.commit()
+        index_upsert(kid, item.question.strip(), item.answer.strip())
         return {"ok": True, "message": "Knowledge entry updated"}
     except HTTPException:
         raise
@@ -670,24 +858,22 @@ def update_knowledge(kid: int, item: KnowledgeIn, x_token: str | None = Header(N
         print(f"Update knowledge error: {e}")
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to update knowledge")
-    finally:
-        db.close()
 
 @app.delete("/admin/knowledge/{kid}")
-def delete_knowledge(kid: int, x_token: str | None = Header(None)):
+def delete_knowledge(kid: int, x_token: str | None = Header(None), db: Session = Depends(get_db)):
     """Delete a knowledge base entry (admin only)."""
     try:
         require_admin(x_token)
     except HTTPException:
         raise
     
-    db = SessionLocal()
     try:
         r = db.query(Knowledge).filter(Knowledge.id == kid).first()
         if not r:
             raise HTTPException(status_code=404, detail="Knowledge entry not found")
         db.delete(r)
         db.commit()
+        index_remove(kid)
         return {"ok": True, "message": "Knowledge entry deleted"}
     except HTTPException:
         raise
@@ -695,81 +881,124 @@ def delete_knowledge(kid: int, x_token: str | None = Header(None)):
         print(f"Delete knowledge error: {e}")
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to delete knowledge")
-    finally:
-        db.close()
+
+@app.get("/admin/knowledge/duplicates")
+def list_duplicates(x_token: str | None = Header(None), threshold: float = DEFAULT_THRESHOLD, limit: int = 100,
+                    db: Session = Depends(get_db)):
+    """Clusters of near-duplicate questions (admin only), suggested keeper first."""
+    require_admin(x_token)
+    try:
+        threshold = min(max(threshold, 0.3), 1.0)
+        start = time.perf_counter()
+        clusters = load_clusters(db, threshold, limit=max(1, min(limit, 1000)))
+        return {"clusters": clusters, "threshold": threshold, "seconds": round(time.perf_counter() - start, 3)}
+    except Exception as e:
+        print(f"Near-duplicate scan error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to find duplicates")
+
+@app.post("/admin/knowledge/duplicates/merge")
+def merge_duplicates(item: DuplicateMergeIn, x_token: str | None = Header(None), db: Session = Depends(get_db)):
+    """Keep one entry of a cluster and delete the others (admin only).
+
+    Refused (400) if an entry to remove is not a near-duplicate of the keeper.
+    """
+    require_admin(x_token)
+    try:
+        removed = merge_entries(db, item.keep, item.remove, min(max(item.threshold, 0.3), 1.0))
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Knowledge entry not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Merge duplicates error: {e}")
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to merge duplicates")
+    for kid in removed:
+        index_remove(kid)
+    return {"ok": True, "kept": item.keep, "removed": removed}
 
 
 # --------------------
 # Admin: Chats (view & export)
 # --------------------
 @app.get("/admin/chats")
-def get_chats(x_token: str | None = Header(None), limit: int = 100):
-    """Get recent chat logs (admin only)."""
+def get_chats(x_token: str | None = Header(None), limit: int = 100, since: int | None = None,
+              until: int | None = None, lang: str | None = None, intent: str | None = None):
+    """Get recent chat logs (admin only), optionally filtered by time range, language and intent."""
     try:
         require_admin(x_token)
     except HTTPException:
         raise
     
     try:
-        if not os.path.exists(CHAT_LOG_FILE):
-            return []
-        
         limit = max(1, min(limit, 1000))  # Between 1 and 1000
-        out = []
-        with open(CHAT_LOG_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()[-limit:]
-        
-        for ln in lines:
-            try:
-                out.append(json.loads(ln))
-            except:
-                continue
-        
-        return out
+        return chat_log_store.latest(limit, since=since, until=until, lang=lang, intent=intent)
     except Exception as e:
         print(f"Get chats error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve chats")
 
 @app.get("/admin/chats/export")
-def export_chats_csv(x_token: str | None = Header(None)):
-    """Export chat logs as CSV (admin only)."""
+def export_chats_csv(x_token: str | None = Header(None), since: int | None = None, until: int | None = None,
+                     lang: str | None = None, intent: str | None = None):
+    """Stream chat logs as CSV (admin only), optionally filtered like /admin/chats."""
     try:
         require_admin(x_token)
     except HTTPException:
         raise
     
     try:
-        if not os.path.exists(CHAT_LOG_FILE):
+        if chat_log_store.is_empty():
             raise HTTPException(status_code=404, detail="No chat logs found")
         
-        csv_file = "chat_export.csv"
-        rows = []
-        
-        with open(CHAT_LOG_FILE, "r", encoding="utf-8") as f:
-            for ln in f:
-                try:
-                    j = json.loads(ln)
-                    rows.append(j)
-                except:
-                    continue
-        
-        if not rows:
-            raise HTTPException(status_code=404, detail="No chat data to export")
-        
-        # write CSV
-        with open(csv_file, "w", newline="", encoding="utf-8") as csvf:
-            writer = csv.writer(csvf)
-            writer.writerow(["timestamp", "message", "language", "reply"])
-            for r in rows:
-                ts = r.get("ts", "")
-                msg = r.get("message", "")
-                lang = r.get("lang", "")
-                reply = r.get("reply", "")
-                writer.writerow([ts, msg, lang, reply])
-        
-        return FileResponse(csv_file, media_type="text/csv", filename=csv_file)
+        return StreamingResponse(
+            iter_csv(chat_log_store.iter_records(since, until, lang=lang, intent=intent)),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="chat_export.csv"'},
+        )
     except HTTPException:
         raise
     except Exception as e:
         print(f"Export chats error: {e}")
         raise HTTPException(status_code=500, detail="Failed to export chats")
+
+
+# --------------------
+# Readiness probe
+# --------------------
+@app.get("/ready")
+def ready():
+    """200 once the chat path is loaded, 503 while the warm-up is still running."""
+    body = dict(startup_timings, warm_up=WARMUP, ready=chat_path_ready())
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+
+# --------------------
+# Admin: runtime metrics
+# --------------------
+@app.get("/admin/metrics")
+def get_metrics(x_token: str | None = Header(None)):
+    """Counters for the in-process caches and queues (admin only)."""
+    require_admin(x_token)
+    return {
+        "response_cache": response_cache.stats(),
+        "chat_log": {
+            "written": chat_log_writer.written,
+            "batches": chat_log_writer.batches,
+            "dropped": chat_log_writer.dropped,
+        },
+        "response_rules": {
+            "rules": len(response_rules.current().rules),
+            "reloads": response_rules.reloads,
+        },
+        "tokens": token_store.stats(),
+        "knowledge_sync": knowledge_watcher.stats(),
+        "chat_admission": {
+            "rate_limit": chat_limiter.stats(),
+            "concurrency": chat_gate.stats(),
+        },
+        "startup": dict(startup_timings, warm_up=WARMUP, ready=chat_path_ready()),
+    }
+
+
+# end of module import; lifespan() reports IMPORT_STARTED -> here as import_seconds
+APP_IMPORTED = time.perf_counter()
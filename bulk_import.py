@@ -0,0 +1,305 @@
+# bulk_import.py
+"""
+Streaming bulk import of Q&A rows into the Knowledge table.
+
+The CSV is read row by row and never held in memory. Duplicates are found
+in a set of normalized questions, loaded once from the table and extended
+as rows are accepted, so there is no SELECT per row. New rows are written
+with bulk_insert_mappings (one executemany per chunk) and each chunk is
+committed in its own transaction. Once an import grows past one chunk, the
+full-text index triggers are dropped and the index is rebuilt in one pass
+at the end. If the process dies before that, init_db() puts the triggers
+back and re-indexes on the next start.
+
+read_knowledge_file() understands the three dataset layouts (see
+detect_schema) and, for large files, parses blocks of rows in a process
+pool. With update=True, bulk_import() upserts on the normalized question.
+"""
+import csv
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select
+import knowledge_fts
+import knowledge_revision
+from models import Knowledge, SessionLocal
+
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+# parser processes for large files; smaller files are parsed in-process
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", str(min(os.cpu_count() or 1, 8))))
+POOL_MIN_BYTES = int(os.getenv("IMPORT_POOL_MIN_BYTES", str(4 * 1024 * 1024)))
+BLOCK_ROWS = 20000
+
+# values for the Knowledge columns a CSV does not provide
+DEFAULTS = {"intent": "general", "crop": None, "language": "english", "topic": None}
+METADATA = ("intent", "crop", "language", "topic")
+
+# question_en, question_lg, answer_en, answer_lg, crop, animal, intent - the
+# headerless bilingual blocks of agriculture_ai_dataset.csv
+BILINGUAL_COLUMNS = ("question", "question_lg", "answer", "answer_lg", "crop", "animal", "intent")
+
+
+def normalize_question(question: str) -> str:
+    """Dedupe key: case, extra whitespace and trailing ?!. are ignored."""
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+
+def normalize_record(row: dict) -> dict:
+    """Clean one {question, answer, intent, ...} row and add its dedupe "key".
+
+    Metadata the row does not provide is None, not the default, so an
+    upsert never overwrites a stored label with a default.
+    """
+    question = " ".join((row.get("question") or "").lower().split())
+    record = {"key": question.rstrip("?!. "), "question": question,
+              "answer": (row.get("answer") or "").strip()}
+    for col in METADATA:
+        value = row.get(col)
+        record[col] = " ".join(value.lower().split()) or None if value else None
+    if record["intent"]:
+        record["intent"] = record["intent"].replace(" ", "_")
+    return record
+
+
+def read_csv(csv_file: str):
+    """Yield each CSV row as a dict with lower-cased column names."""
+    with open(csv_file, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            raise ValueError("CSV file is empty or malformed")
+        keys = [h.strip().lower() for h in header]
+        for values in reader:
+            yield dict(zip(keys, values))
+
+
+# --------------------
+# Dataset layouts
+# --------------------
+def detect_schema(header: list[str]) -> str:
+    """Layout of a dataset from its first row.
+
+    "faq"       - Question,Answer (FAQ and professional datasets)
+    "labelled"  - question,answer plus intent/crop/language/topic columns
+    "bilingual" - no header; English and Luganda question/answer pairs
+    """
+    cols = {h.strip().lower() for h in header}
+    if {"question", "answer"} <= cols:
+        return "labelled" if cols & set(METADATA) else "faq"
+    if len(header) == len(BILINGUAL_COLUMNS):
+        return "bilingual"
+    raise ValueError(f"Unrecognised CSV header: {','.join(header)}")
+
+
+def bilingual_records(values: list[str]) -> list[dict]:
+    """One English and one Luganda entry from a bilingual row."""
+    row = dict(zip(BILINGUAL_COLUMNS, values))
+    crop = row["crop"] if row["crop"].strip().lower() not in ("", "general") else row["animal"]
+    meta = {"intent": row["intent"], "crop": crop}
+    return [normalize_record({**meta, "question": row["question"], "answer": row["answer"], "language": "english"}),
+            normalize_record({**meta, "question": row["question_lg"], "answer": row["answer_lg"], "language": "luganda"})]
+
+
+def parse_block(lines: list[str], keys: list[str], schema: str) -> list[dict]:
+    """Normalized records from complete CSV lines (runs in the parser pool).
+
+    agriculture_ai_dataset.csv appends headerless bilingual rows to a
+    labelled section, so rows are matched on their width too.
+    """
+    records = []
+    for values in csv.reader(lines):
+        if not any(v.strip() for v in values):
+            continue
+        if len(values) == len(BILINGUAL_COLUMNS) and (schema == "bilingual" or len(values) != len(keys)):
+            records.extend(bilingual_records(values))
+        else:
+            records.append(normalize_record(dict(zip(keys, values))))
+    return records
+
+
+def _line_blocks(f, block_rows: int):
+    """Lists of raw lines holding `block_rows` complete CSV records each.
+
+    A record ends on a line that leaves an even number of quotes, so quoted
+    answers spanning several lines are never split between blocks.
+    """
+    block, rows, quotes = [], 0, 0
+    for line in f:
+        block.append(line)
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            rows += 1
+            if rows >= block_rows:
+                yield block
+                block, rows, quotes = [], 0, 0
+    if block:
+        yield block
+
+
+def _open_dataset(f):
+    """Read the first record of an open dataset: (first lines, schema, column keys)."""
+    first = next(_line_blocks(f, 1), None)
+    if not first:
+        raise ValueError("CSV file is empty or malformed")
+    header = next(csv.reader(first))
+    schema = detect_schema(header)
+    keys = list(BILINGUAL_COLUMNS) if schema == "bilingual" else [h.strip().lower() for h in header]
+    return first, schema, keys
+
+
+def sniff_schema(path: str) -> str:
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        return _open_dataset(f)[1]
+
+
+def read_knowledge_file(path: str, workers: int = IMPORT_WORKERS, block_rows: int = BLOCK_ROWS):
+    """Yield normalized records from a dataset CSV of any supported layout.
+
+    Files of at least POOL_MIN_BYTES are parsed by `workers` processes,
+    a block of rows at a time; records still come out in file order.
+    """
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        first, schema, keys = _open_dataset(f)
+        if schema == "bilingual":
+            # no header: the first line is already data
+            yield from parse_block(first, keys, schema)
+
+        blocks = _line_blocks(f, block_rows)
+        if workers <= 1 or os.path.getsize(path) < POOL_MIN_BYTES:
+            for block in blocks:
+                yield from parse_block(block, keys, schema)
+            return
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for block in blocks:
+                pending.append(pool.submit(parse_block, block, keys, schema))
+                if len(pending) >= workers * 2:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+
+# --------------------
+# Insert / upsert
+# --------------------
+def load_existing(db) -> set[str]:
+    """Normalized questions already in the table."""
+    rows = db.execute(select(Knowledge.question).execution_options(yield_per=10000))
+    return {normalize_question(q) for (q,) in rows if q}
+
+
+def load_existing_rows(db) -> dict[str, tuple]:
+    """Normalized question -> (id, hash of answer, intent, crop, language, topic)."""
+    rows = db.execute(select(Knowledge.id, Knowledge.question, Knowledge.answer, *(
+        getattr(Knowledge, col) for col in METADATA)).execution_options(yield_per=10000))
+    existing = {}
+    for kid, question, answer, *meta in rows:
+        if question:
+            existing.setdefault(normalize_question(question), (kid, hash(answer or ""), *meta))
+    return existing
+
+
+def bulk_import(rows, session_factory=SessionLocal, chunk_size: int = CHUNK_SIZE,
+                defaults: dict | None = None, verbose: bool = True, update: bool = False,
+                seen: set | None = None) -> dict:
+    """Insert the new rows of an iterable of {question, answer, ...} dicts.
+
+    With update=True a row whose question is already stored updates that
+    entry's answer and any metadata the row provides (upsert); otherwise it
+    is skipped as a duplicate. Within one import the first occurrence of a
+    question wins; pass the same `seen` set to the imports of several files
+    so that this holds across them too.
+
+    Returns counts (read, added, updated, duplicates, skipped), the elapsed
+    seconds and rows_per_sec (rows read per second).
+    """
+    defaults = {**DEFAULTS, **(defaults or {})}
+    stats = {"read": 0, "added": 0, "updated": 0, "duplicates": 0, "skipped": 0}
+    start = time.perf_counter()
+
+    with session_factory() as db:
+        engine = db.get_bind()
+        existing = load_existing_rows(db) if update else {}
+        if not update:
+            seen = load_existing(db)
+        elif seen is None:
+            seen = set()
+        chunk, changes = [], []
+        fts_suspended = False
+
+        def flush():
+            nonlocal fts_suspended
+            if (stats["added"] or stats["updated"]) and not fts_suspended:
+                fts_suspended = knowledge_fts.suspend_triggers(engine)
+                knowledge_revision.suspend_triggers(engine)
+            try:
+                if chunk:
+                    db.bulk_insert_mappings(Knowledge, chunk)
+                if changes:
+                    db.bulk_update_mappings(Knowledge, changes)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            stats["added"] += len(chunk)
+            stats["updated"] += len(changes)
+            chunk.clear()
+            changes.clear()
+            if verbose:
+                rate = stats["read"] / (time.perf_counter() - start)
+                print(f"  Processing... {stats['added']} added, {stats['updated']} updated ({rate:,.0f} rows/s)")
+
+        try:
+            for row in rows:
+                stats["read"] += 1
+                record = row if "key" in row else normalize_record(row)
+                key, question, answer = record["key"], record["question"], record["answer"]
+                if not question or not answer:
+                    stats["skipped"] += 1
+                    continue
+                if key in seen:
+                    stats["duplicates"] += 1
+                    continue
+                seen.add(key)
+
+                stored = existing.get(key)
+                if stored is not None:
+                    kid, answer_hash, *meta = stored
+                    change = {col: record[col] for col, old in zip(METADATA, meta)
+                              if record[col] is not None and record[col] != old}
+                    if hash(answer) != answer_hash:
+                        change["answer"] = answer
+                    if change:
+                        changes.append({"id": kid, **change})
+                    else:
+                        stats["duplicates"] += 1
+                else:
+                    entry = {col: record.get(col) or value for col, value in defaults.items()}
+                    entry.update(question=question, answer=answer)
+                    chunk.append(entry)
+                if len(chunk) + len(changes) >= chunk_size:
+                    flush()
+            if chunk or changes:
+                flush()
+        finally:
+            if fts_suspended:
+                knowledge_fts.resume_triggers(engine)
+                knowledge_revision.resume_triggers(engine)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_sec"] = stats["read"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def import_csv(csv_file: str, **kwargs) -> dict:
+    """bulk_import() over a CSV file with Question/Answer (+ optional Knowledge) columns."""
+    return bulk_import(read_csv(csv_file), **kwargs)
+
+
+def print_summary(stats: dict):
+    print(f"  Added: {stats['added']} new entries")
+    if stats.get("updated"):
+        print(f"  Updated: {stats['updated']} existing entries")
+    print(f"  Duplicates skipped: {stats['duplicates']}, incomplete rows skipped: {stats['skipped']}")
+    print(f"  {stats['read']} rows in {stats['seconds']:.2f}s ({stats['rows_per_sec']:,.0f} rows/s)")
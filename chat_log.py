@@ -0,0 +1,477 @@
+# chat_log.py
+"""
+Chat log storage.
+
+ChatLogWriter takes JSON-lines records off the request path: /chat puts a
+record on a queue and a background thread appends them in batches, flushing
+when a batch fills up or a time limit passes. Each batch goes out as one
+write() on an O_APPEND descriptor, so several uvicorn workers sharing the
+same file never interleave partial lines.
+
+Records land in a ChatLogStore: one segment per UTC day
+(chat-YYYY-MM-DD.jsonl, optionally gzipped once the day is over) plus a
+sidecar .idx file of "timestamp offset" pairs, so time-range queries only
+open the days they cover and seek straight to the right place in each.
+A single JSONL file (JsonlFile) is still supported as a writer target.
+
+tail_lines() reads a file backwards from EOF in blocks, so showing the
+last N chats costs O(N) no matter how large the log has grown.
+
+iter_csv() turns records into CSV text chunk by chunk for streaming exports.
+"""
+import atexit
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+
+TAIL_BLOCK_SIZE = 64 * 1024
+CSV_CHUNK_ROWS = 500
+CSV_COLUMNS = ["timestamp", "message", "language", "reply"]
+
+# a sidecar index entry is written at most once per this many segment bytes
+INDEX_STRIDE_BYTES = 64 * 1024
+# records from concurrent workers can land slightly out of timestamp order;
+# range lookups widen the seek window by this much to stay exact
+INDEX_SLACK_SECONDS = 60
+
+SEGMENT_RE = re.compile(r"^chat-(\d{4}-\d{2}-\d{2})\.jsonl(\.gz)?$")
+
+# "fsync": fsync after every batch; "none": leave flushing to the OS
+DURABILITY_MODES = ("fsync", "none")
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+
+def _encode(batch: list[dict]) -> bytes:
+    return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch).encode("utf-8")
+
+
+def _day_of(ts) -> str:
+    try:
+        return datetime.datetime.fromtimestamp(int(ts), datetime.timezone.utc).strftime("%Y-%m-%d")
+    except (TypeError, ValueError, OverflowError, OSError):
+        return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+def _matches(rec: dict, since, until, lang, intent) -> bool:
+    ts = rec.get("ts")
+    if since is not None and (not isinstance(ts, (int, float)) or ts < since):
+        return False
+    if until is not None and (not isinstance(ts, (int, float)) or ts > until):
+        return False
+    if lang is not None and rec.get("lang") != lang:
+        return False
+    if intent is not None and rec.get("intent") != intent:
+        return False
+    return True
+
+
+# --------------------
+# Storage targets
+# --------------------
+class JsonlFile:
+    """A single, unrotated JSON-lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def append_batch(self, batch: list[dict], fsync: bool = False):
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        _write_all(self._fd, _encode(batch))
+        if fsync:
+            os.fsync(self._fd)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class ChatLogStore:
+    """Daily chat log segments with a sparse timestamp -> byte offset index."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._fds: dict[str, tuple[int, int]] = {}  # day -> (segment fd, index fd)
+        self._last_indexed: dict[str, int] = {}
+
+    # --------------------
+    # Layout
+    # --------------------
+    def segment_path(self, day: str, compressed: bool = False) -> str:
+        return os.path.join(self.directory, f"chat-{day}.jsonl" + (".gz" if compressed else ""))
+
+    def index_path(self, day: str) -> str:
+        return os.path.join(self.directory, f"chat-{day}.idx")
+
+    def segments(self) -> list[tuple[str, str]]:
+        """(day, path) for every segment, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        found = {}
+        for name in os.listdir(self.directory):
+            m = SEGMENT_RE.match(name)
+            if m:
+                # a plain file wins over a .gz of the same day (compression in progress)
+                if m.group(1) not in found or not m.group(2):
+                    found[m.group(1)] = os.path.join(self.directory, name)
+        return sorted(found.items())
+
+    def is_empty(self) -> bool:
+        return not self.segments()
+
+    # --------------------
+    # Writing
+    # --------------------
+    def append_batch(self, batch: list[dict], fsync: bool = False):
+        """Append records to their day's segment, one write() per segment."""
+        by_day: dict[str, list[dict]] = {}
+        for rec in batch:
+            by_day.setdefault(_day_of(rec.get("ts")), []).append(rec)
+        for day, records in by_day.items():
+            seg_fd, idx_fd = self._open(day)
+            data = _encode(records)
+            _write_all(seg_fd, data)
+            # with O_APPEND the position after our write is exact even with other writers
+            start = os.lseek(seg_fd, 0, os.SEEK_CUR) - len(data)
+            if start - self._last_indexed.get(day, -INDEX_STRIDE_BYTES) >= INDEX_STRIDE_BYTES:
+                first_ts = min(int(r.get("ts") or 0) for r in records)
+                _write_all(idx_fd, f"{first_ts} {start}\n".encode())
+                self._last_indexed[day] = start
+            if fsync:
+                os.fsync(seg_fd)
+        self._close_stale(set(by_day))
+
+    def _open(self, day: str) -> tuple[int, int]:
+        fds = self._fds.get(day)
+        if fds is None:
+            os.makedirs(self.directory, exist_ok=True)
+            flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+            fds = (os.open(self.segment_path(day), flags, 0o644), os.open(self.index_path(day), flags, 0o644))
+            self._fds[day] = fds
+        return fds
+
+    def _close_stale(self, keep: set):
+        # keep at most today's and yesterday's segment open
+        if len(self._fds) <= 2:
+            return
+        for day in sorted(self._fds)[:-2]:
+            if day not in keep:
+                for fd in self._fds.pop(day):
+                    os.close(fd)
+                self._last_indexed.pop(day, None)
+
+    def close(self):
+        for seg_fd, idx_fd in self._fds.values():
+            os.close(seg_fd)
+            os.close(idx_fd)
+        self._fds = {}
+        self._last_indexed = {}
+
+    def compress(self, older_than_days: int = 1) -> list[str]:
+        """Gzip finished segments at least `older_than_days` old; returns the days compressed."""
+        cutoff = (datetime.datetime.now(datetime.timezone.utc)
+                  - datetime.timedelta(days=older_than_days)).strftime("%Y-%m-%d")
+        done = []
+        for day, path in self.segments():
+            if day >= cutoff or path.endswith(".gz"):
+                continue
+            tmp = self.segment_path(day, compressed=True) + ".tmp"
+            with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(tmp, self.segment_path(day, compressed=True))
+            os.remove(path)  # .idx offsets stay valid: they refer to uncompressed bytes
+            done.append(day)
+        return done
+
+    # --------------------
+    # Reading
+    # --------------------
+    def _seek_offset(self, day: str, since) -> int:
+        """Byte offset in a segment before which no record has ts >= since."""
+        if since is None:
+            return 0
+        target = since - INDEX_SLACK_SECONDS
+        best = 0
+        try:
+            with open(self.index_path(day), "r", encoding="ascii") as f:
+                for ln in f:
+                    try:
+                        ts, off = ln.split()
+                        ts, off = int(ts), int(off)
+                    except ValueError:
+                        continue
+                    if ts <= target and off > best:
+                        best = off
+        except FileNotFoundError:
+            pass
+        return best
+
+    def _iter_segment(self, day: str, path: str, since, until):
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rb") as f:
+            f.seek(self._seek_offset(day, since))
+            for ln in f:
+                try:
+                    rec = json.loads(ln)
+                except ValueError:
+                    continue
+                ts = rec.get("ts")
+                if until is not None and isinstance(ts, (int, float)) and ts > until + INDEX_SLACK_SECONDS:
+                    break
+                yield rec
+
+    def _days_in_range(self, since, until) -> list[tuple[str, str]]:
+        first = _day_of(since) if since is not None else None
+        last = _day_of(until) if until is not None else None
+        return [(day, path) for day, path in self.segments()
+                if (first is None or day >= first) and (last is None or day <= last)]
+
+    def iter_records(self, since: int | None = None, until: int | None = None,
+                     lang: str | None = None, intent: str | None = None):
+        """Yield records in time order, filtered by range, language and intent."""
+        for day, path in self._days_in_range(since, until):
+            for rec in self._iter_segment(day, path, since, until):
+                if _matches(rec, since, until, lang, intent):
+                    yield rec
+
+    def latest(self, limit: int, since: int | None = None, until: int | None = None,
+               lang: str | None = None, intent: str | None = None) -> list[dict]:
+        """The last `limit` matching records, oldest first, reading newest days first."""
+        if limit <= 0:
+            return []
+        plain = since is None and until is None and lang is None and intent is None
+        collected: list[list[dict]] = []
+        found = 0
+        for day, path in reversed(self._days_in_range(since, until)):
+            if plain and not path.endswith(".gz"):
+                recs = []
+                for ln in tail_lines(path, limit - found):
+                    try:
+                        recs.append(json.loads(ln))
+                    except ValueError:
+                        continue
+            else:
+                window = deque(maxlen=limit - found)
+                for rec in self._iter_segment(day, path, since, until):
+                    if _matches(rec, since, until, lang, intent):
+                        window.append(rec)
+                recs = list(window)
+            collected.append(recs)
+            found += len(recs)
+            if found >= limit:
+                break
+        return [rec for recs in reversed(collected) for rec in recs]
+
+    def migrate(self, legacy_path: str, batch_size: int = 10_000) -> int:
+        """Copy an old single-file chat log into daily segments; returns records copied."""
+        copied = 0
+        batch = []
+        with open(legacy_path, "r", encoding="utf-8", errors="replace") as f:
+            for ln in f:
+                try:
+                    batch.append(json.loads(ln))
+                except ValueError:
+                    continue
+                if len(batch) >= batch_size:
+                    self.append_batch(batch)
+                    copied += len(batch)
+                    batch = []
+        if batch:
+            self.append_batch(batch)
+            copied += len(batch)
+        self.close()
+        return copied
+
+
+# --------------------
+# Background writer
+# --------------------
+class ChatLogWriter:
+    """Background, batched appender for the chat log."""
+
+    def __init__(self, target, max_batch: int = 256, flush_interval: float = 0.5,
+                 durability: str = "none", max_queue: int = 100_000):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, got {durability!r}")
+        # a plain path means a single JSONL file
+        self.target = JsonlFile(target) if isinstance(target, str) else target
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    # --------------------
+    # Producer side
+    # --------------------
+    def write(self, entry: dict):
+        """Queue one record; never blocks the caller."""
+        if self._closed:
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"Chat log queue full, dropped {self.dropped} records so far")
+
+    def write_many(self, entries: list[dict]):
+        """Queue several records as one item, so they land in the same batch."""
+        if self._closed or not entries:
+            return
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(list(entries))
+        except queue.Full:
+            self.dropped += len(entries)
+            print(f"Chat log queue full, dropped {self.dropped} records so far")
+
+    def close(self, timeout: float = 5.0):
+        """Flush everything queued so far and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    # --------------------
+    # Writer thread
+    # --------------------
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get()
+                deadline = time.monotonic() + self.flush_interval
+                while item is not None:
+                    if isinstance(item, list):
+                        batch.extend(item)
+                    else:
+                        batch.append(item)
+                    if len(batch) >= self.max_batch:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                stopping = item is None
+                if batch:
+                    self.target.append_batch(batch, fsync=self.durability == "fsync")
+                    self.written += len(batch)
+                    self.batches += 1
+            except Exception as e:
+                print(f"Chat log error: {e}")
+        try:
+            self.target.close()
+        except Exception as e:
+            print(f"Chat log error: {e}")
+
+
+# --------------------
+# Readers
+# --------------------
+def tail_lines(path: str, limit: int, block_size: int = TAIL_BLOCK_SIZE) -> list[str]:
+    """Return the last `limit` lines of a file, oldest first, reading backwards from EOF."""
+    if limit <= 0:
+        return []
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        chunks = []
+        newlines = 0
+        # one extra newline marks the start of the oldest wanted line
+        while pos > 0 and newlines <= limit:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            chunk = f.read(step)
+            chunks.append(chunk)
+            newlines += chunk.count(b"\n")
+    data = b"".join(reversed(chunks))
+    lines = data.split(b"\n")
+    if pos > 0:
+        lines = lines[1:]  # first piece may be the tail of an older line
+    lines = [ln for ln in lines if ln.strip()]
+    return [ln.decode("utf-8", errors="replace") for ln in lines[-limit:]]
+
+
+def iter_records(path: str, since: int | None = None, until: int | None = None):
+    """Yield parsed records from a single JSONL file with since <= ts <= until."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for ln in f:
+            try:
+                rec = json.loads(ln)
+            except ValueError:
+                continue
+            if _matches(rec, since, until, None, None):
+                yield rec
+
+
+def iter_csv(records, chunk_rows: int = CSV_CHUNK_ROWS):
+    """Yield CSV text for `records` in chunks of `chunk_rows` rows, header first."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    for r in records:
+        writer.writerow([r.get("ts", ""), r.get("message", ""), r.get("lang", ""), r.get("reply", "")])
+        rows += 1
+        if rows % chunk_rows == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+if __name__ == "__main__":
+    usage = ("usage: python chat_log.py migrate [chat_logs.txt] [log_dir]\n"
+             "       python chat_log.py compress [days] [log_dir]")
+    if len(sys.argv) < 2 or sys.argv[1] not in ("migrate", "compress"):
+        print(usage)
+        sys.exit(1)
+    if sys.argv[1] == "migrate":
+        legacy = sys.argv[2] if len(sys.argv) > 2 else "chat_logs.txt"
+        store = ChatLogStore(sys.argv[3] if len(sys.argv) > 3 else os.getenv("CHAT_LOG_DIR", "chat_logs"))
+        print(f"✓ Migrated {store.migrate(legacy)} records from {legacy} into {store.directory}/")
+    else:
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+        store = ChatLogStore(sys.argv[3] if len(sys.argv) > 3 else os.getenv("CHAT_LOG_DIR", "chat_logs"))
+        print(f"✓ Compressed segments: {', '.join(store.compress(days)) or 'none'}")
@@ -0,0 +1,20 @@
+# conftest.py
+"""
+Shared setup for the test_*.py checks.
+
+Points the app's database, chat log directory and knowledge snapshot at a
+throwaway directory before anything imports models or app, so running the
+checks never writes to ./database or ./chat_logs. pytest loads this file
+first; the scripts that import app `import conftest` themselves so that
+`python test_x.py` gets the same setup.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="farm-chat-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(TEST_DIR, 'farming.db')}"
+os.environ["CHAT_LOG_DIR"] = os.path.join(TEST_DIR, "chat_logs")
+os.environ["KNOWLEDGE_SNAPSHOT"] = os.path.join(TEST_DIR, "knowledge_snapshot")
+atexit.register(shutil.rmtree, TEST_DIR, True)
@@ -58,6 +58,7 @@ TESTING & DIAGNOSTICS:
   python test_app.py            Original test script
 
 DATA MANAGEMENT:
+  python import_knowledge.py    Import all datasets (any CSV layout)
   python import_dataset.py      Import FAQ dataset from CSV
   python train_intent.py        Train ML intent classifier
 
@@ -188,6 +189,8 @@ SETUP & TESTING:
   test_app.py               Original tests
 
 DATA & ML:
+  import_knowledge.py       Import datasets (schema detection, upsert)
+  bulk_import.py            Streaming import pipeline
   import_dataset.py         Import FAQ dataset from CSV
   train_intent.py           Train intent classifier
   requirements.txt          Python dependencies
@@ -205,7 +208,7 @@ FRONTEND:
 
 DATABASE:
   database/farming.db       SQLite database (created on first run)
-  chat_logs.txt             Chat history (JSON lines)
+  chat_logs/                Chat history (daily JSON-lines segments + .idx)
 
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 """
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Import knowledge datasets into the database, whatever their layout.
+
+Detects each file's schema (Question,Answer FAQ files, the labelled
+question,answer,intent,crop,language,topic layout, and the bilingual
+English/Luganda rows of agriculture_ai_dataset.csv), parses large files in
+a process pool, and upserts on the normalized question so intent, crop,
+language and topic labels reach the Knowledge table.
+
+    python import_knowledge.py                       # the bundled datasets
+    python import_knowledge.py data.csv more.csv --workers 4
+    python import_knowledge.py data.csv --no-update  # skip known questions
+"""
+import argparse
+import os
+import sys
+from bulk_import import CHUNK_SIZE, IMPORT_WORKERS, bulk_import, print_summary, read_knowledge_file, sniff_schema
+
+DATASETS = [
+    "agriculture_ai_dataset.csv",
+    "professional_farming_dataset.csv",
+    "a sample_Farming_FAQ_Assistant_Dataset.csv",
+]
+
+
+def import_files(paths: list[str], workers: int = IMPORT_WORKERS, chunk_size: int = CHUNK_SIZE,
+                 update: bool = True, **kwargs) -> bool:
+    """Import each file in turn; returns False if any file failed.
+
+    A question found in several files is taken from the first one, so
+    running the same import again changes nothing.
+    """
+    ok = True
+    seen = set()  # normalized questions imported by earlier files of this run
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Error: File '{path}' not found")
+            ok = False
+            continue
+        try:
+            print(f"\n📥 {path} ({sniff_schema(path)})")
+            stats = bulk_import(read_knowledge_file(path, workers), chunk_size=chunk_size,
+                                update=update, seen=seen, **kwargs)
+            print_summary(stats)
+        except Exception as e:
+            print(f"✗ Import of {path} failed: {e}")
+            ok = False
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Import Q&A datasets into the knowledge base.")
+    parser.add_argument("files", nargs="*", help="CSV files (default: the bundled datasets)")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS, help="parser processes for large files")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per insert/commit")
+    parser.add_argument("--no-update", action="store_true", help="skip questions that already exist")
+    args = parser.parse_args(argv)
+
+    paths = args.files or [p for p in DATASETS if os.path.exists(p)]
+    ok = import_files(paths, workers=args.workers, chunk_size=args.chunk_size, update=not args.no_update)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+# intent_engine.py
+"""
+Intent classification for chat messages.
+
+Loads the pickles written by train_intent.py / train_model_safe.py once and
+classifies with the sparse TF-IDF vectorizer + LogisticRegression model.
+Explicit keywords (INTENT_RULES) always win; the model only labels messages
+that match none of them. When the sklearn pickles are missing or cannot be used with the installed
+scikit-learn, the keyword-dict format written by
+train_model_safe.train_and_save_simple is used instead, and the built-in
+keyword rules are the last resort.
+"""
+import os
+import pickle
+import sys
+import threading
+import warnings
+from collections import Counter, defaultdict
+import numpy as np
+from text_utils import KeywordMatcher, tokenize
+
+MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "intent_model.pkl")
+VECTORIZER_PATH = os.getenv("INTENT_VECTORIZER_PATH", "intent_vectorizer.pkl")
+# for messages without a rule keyword, the model's guess is used when its
+# probability is at least this many times chance (1 / number of classes) and
+# beats the runner-up by MIN_MARGIN; otherwise the message is "general"
+MIN_LIFT = float(os.getenv("INTENT_MIN_LIFT", "1.05"))
+MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.1"))
+
+# Built-in keyword rules, checked in order
+INTENT_RULES = [
+    ("disease", ["disease", "pest", "illness", "sick", "damage"]),
+    ("fertilizer", ["fertilizer", "nutrient", "soil", "pH", "compost"]),
+    ("irrigation", ["water", "irrigation", "rain", "drought"]),
+    ("weather", ["weather", "temperature", "climate", "season"]),
+    ("harvest", ["harvest", "mature", "ready", "pick", "crop"]),
+]
+
+
+_intent_matcher = KeywordMatcher(dict(INTENT_RULES))
+
+
+def keyword_intent(msg: str) -> str:
+    """Simple intent detection based on keywords."""
+    found = _intent_matcher.match(msg)
+    for intent, _ in INTENT_RULES:
+        if intent in found:
+            return intent
+    return "general"
+
+
+class IntentEngine:
+    """Classifies messages by keyword rules, asking the trained model when none match."""
+
+    def __init__(self, model_path: str = MODEL_PATH, vect_path: str = VECTORIZER_PATH,
+                 min_lift: float = MIN_LIFT, min_margin: float = MIN_MARGIN):
+        self.model_path = model_path
+        self.vect_path = vect_path
+        self.min_lift = min_lift
+        self.min_margin = min_margin
+        self.min_confidence = 0.0  # min_lift / number of classes, set when the model loads
+        self.mode = None  # "sklearn", "keywords" or "rules"
+        self.model = None
+        self.vectorizer = None
+        self.classes = None
+        # word -> {intent: weight} for the keyword-dict fallback
+        self.word_weights: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    # --------------------
+    # Loading
+    # --------------------
+    def load(self):
+        """Load the pickles, choosing the best usable classifier."""
+        model = vect = None
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                with open(self.model_path, "rb") as f:
+                    model = pickle.load(f)
+                with open(self.vect_path, "rb") as f:
+                    vect = pickle.load(f)
+        except Exception as e:
+            print(f"Intent model not loaded ({type(e).__name__}: {e}); using keyword rules")
+
+        if self._try_sklearn(model, vect):
+            self.mode = "sklearn"
+        elif self._try_keywords(vect):
+            self.mode = "keywords"
+        else:
+            self.mode = "rules"
+        return self.mode
+
+    def ensure_loaded(self):
+        if self.mode is not None:
+            return
+        with self._lock:
+            if self.mode is None:
+                self.load()
+
+    def _try_sklearn(self, model, vect) -> bool:
+        if not (hasattr(model, "predict_proba") and hasattr(vect, "transform")):
+            return False
+        try:
+            # a pickle from an incompatible scikit-learn usually fails here
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                model.predict_proba(vect.transform(["probe"]))
+        except Exception as e:
+            print(f"Intent model incompatible ({type(e).__name__}: {e}); falling back")
+            return False
+        self.model = model
+        self.vectorizer = vect
+        self.classes = list(model.classes_)
+        self.min_confidence = self.min_lift / len(self.classes)
+        return True
+
+    def _try_keywords(self, vect) -> bool:
+        if not isinstance(vect, dict) or vect.get("type") != "intent_keywords":
+            return False
+        counts: dict[str, Counter] = defaultdict(Counter)
+        for intent, words in vect.get("intent_keywords", {}).items():
+            for w in words:
+                for tok in tokenize(w):
+                    counts[tok][intent] += 1
+        # each word votes with its intent distribution, so words that are
+        # spread evenly across intents carry little signal
+        self.word_weights = {
+            w: {intent: n / sum(c.values()) for intent, n in c.items()}
+            for w, c in counts.items()
+        }
+        return bool(self.word_weights)
+
+    # --------------------
+    # Prediction
+    # --------------------
+    def predict(self, msg: str) -> str:
+        """Classify a single message."""
+        return self.predict_batch([msg])[0]
+
+    def predict_batch(self, messages: list[str]) -> list[str]:
+        """Classify many messages with one transform + predict_proba call."""
+        self.ensure_loaded()
+        if not messages:
+            return []
+        if self.mode == "sklearn":
+            return self._predict_sklearn(messages)
+        if self.mode == "keywords":
+            return [self._predict_keywords(m) for m in messages]
+        return [keyword_intent(m) for m in messages]
+
+    def _predict_sklearn(self, messages: list[str]) -> list[str]:
+        out = [keyword_intent(m) for m in messages]
+        todo = [i for i, intent in enumerate(out) if intent == "general"]
+        if not todo:
+            return out
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            proba = self.model.predict_proba(self.vectorizer.transform([messages[i] for i in todo]))
+        top2 = np.sort(proba, axis=1)[:, -2:]
+        best = proba.argmax(axis=1)
+        for row, i in enumerate(todo):
+            p, runner_up = top2[row, 1], top2[row, 0]
+            if p >= self.min_confidence and p - runner_up >= self.min_margin:
+                out[i] = self.classes[best[row]]
+        return out
+
+    def _predict_keywords(self, msg: str) -> str:
+        intent = keyword_intent(msg)
+        if intent != "general":
+            return intent
+        scores: dict[str, float] = defaultdict(float)
+        for tok in tokenize(msg):
+            for intent, weight in self.word_weights.get(tok, {}).items():
+                scores[intent] += weight
+        return max(scores, key=scores.get) if scores else "general"
+
+
+def relabel_chat_log(log_path: str, batch_size: int = 5000) -> Counter:
+    """Re-classify every message in a chat log (segment directory or JSONL file)."""
+    from chat_log import ChatLogStore, iter_records
+    if os.path.isdir(log_path):
+        records = ChatLogStore(log_path).iter_records()
+    else:
+        records = iter_records(log_path)
+    engine = IntentEngine()
+    totals = Counter()
+    batch = []
+    for rec in records:
+        batch.append(rec.get("message", ""))
+        if len(batch) >= batch_size:
+            totals.update(engine.predict_batch(batch))
+            batch = []
+    totals.update(engine.predict_batch(batch))
+    return totals
+
+
+if __name__ == "__main__":
+    import time
+    log_path = sys.argv[1] if len(sys.argv) > 1 else "chat_logs"
+    start = time.perf_counter()
+    counts = relabel_chat_log(log_path)
+    elapsed = time.perf_counter() - start
+    print(f"✓ Re-labelled {sum(counts.values())} messages in {elapsed:.2f}s")
+    for intent, n in counts.most_common():
+        print(f"  {intent:15} {n}")
@@ -0,0 +1,172 @@
+# knowledge_fts.py
+"""
+SQLite FTS5 full-text index over the Knowledge table.
+
+knowledge_fts is an external-content FTS5 table (it stores only the index,
+the text stays in `knowledge`) over question, answer, crop and topic, kept in
+sync by insert/update/delete triggers. Its rank is BM25 with the question
+weighted highest, so both the chat retrieval path (RETRIEVAL_MODE=fts) and the
+admin search box get ranked matches from an index lookup instead of an
+ILIKE '%...%' table scan.
+
+    python knowledge_fts.py rebuild   # re-index every row
+    python knowledge_fts.py check     # FTS5 integrity check
+"""
+import re
+import sys
+import time
+from sqlalchemy import text
+
+FTS_TABLE = "knowledge_fts"
+FTS_COLUMNS = ("question", "answer", "crop", "topic")
+# BM25 column weights, in FTS_COLUMNS order
+FTS_WEIGHTS = (10.0, 1.0, 4.0, 2.0)
+
+# holds a row while a bulk import has the sync triggers dropped; if the
+# import dies before putting them back, the next ensure_fts() (init_db) does
+# it and re-indexes
+SUSPENDED_TABLE = "knowledge_fts_suspended"
+
+_TOKEN = re.compile(r"\w+")
+
+_SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS {SUSPENDED_TABLE} (since REAL)",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        question, answer, crop, topic,
+        content='knowledge', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS knowledge_fts_ai AFTER INSERT ON knowledge BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, question, answer, crop, topic)
+        VALUES (new.id, new.question, new.answer, new.crop, new.topic);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS knowledge_fts_ad AFTER DELETE ON knowledge BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question, answer, crop, topic)
+        VALUES ('delete', old.id, old.question, old.answer, old.crop, old.topic);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS knowledge_fts_au AFTER UPDATE ON knowledge BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, question, answer, crop, topic)
+        VALUES ('delete', old.id, old.question, old.answer, old.crop, old.topic);
+        INSERT INTO {FTS_TABLE}(rowid, question, answer, crop, topic)
+        VALUES (new.id, new.question, new.answer, new.crop, new.topic);
+    END""",
+]
+
+
+def ensure_fts(engine) -> bool:
+    """Create the FTS table and triggers if missing, indexing existing rows once.
+
+    Also finishes a suspend_triggers() that was never resumed: the triggers
+    are recreated and every row is re-indexed. Returns False (and does
+    nothing) for databases other than SQLite.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        ).first()
+        for stmt in _SCHEMA:
+            conn.execute(text(stmt))
+        suspended = conn.execute(text(f"SELECT 1 FROM {SUSPENDED_TABLE}")).first()
+        if not exists:
+            weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({weights})')"))
+        if not exists or suspended:
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            conn.execute(text(f"DELETE FROM {SUSPENDED_TABLE}"))
+    return True
+
+
+def rebuild(engine):
+    """Re-index every Knowledge row (after bulk edits made with triggers off)."""
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def suspend_triggers(engine) -> bool:
+    """Drop the sync triggers before a large bulk insert; True if they were dropped.
+
+    Re-indexing everything once with resume_triggers() afterwards is several
+    times faster than updating the index row by row. Rows written in the
+    meantime are picked up by that rebuild. The suspension is recorded in
+    the database, so a process killed before resuming is repaired by the
+    next ensure_fts().
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {SUSPENDED_TABLE} (since REAL)"))
+        conn.execute(text(f"INSERT INTO {SUSPENDED_TABLE} (since) VALUES (:now)"), {"now": time.time()})
+        for name in ("knowledge_fts_ai", "knowledge_fts_ad", "knowledge_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    return True
+
+
+def resume_triggers(engine):
+    """Recreate the sync triggers and re-index after suspend_triggers()."""
+    ensure_fts(engine)  # sees the suspension and rebuilds
+
+
+def match_expression(query: str, require_all: bool = False, prefix: bool = False) -> str:
+    """Turn free text into a safe FTS5 MATCH expression ("" if it has no words).
+
+    Every word is quoted, so user input can never inject FTS5 operators.
+    """
+    words = _TOKEN.findall(query.lower())
+    terms = [f'"{w}"*' if prefix else f'"{w}"' for w in dict.fromkeys(words)]
+    return (" AND " if require_all else " OR ").join(terms)
+
+
+def search(db, query: str, limit: int = 10, require_all: bool = False, prefix: bool = False):
+    """BM25-ranked Knowledge rows matching `query`, best first.
+
+    Returns a list of (id, question, answer, rank); lower rank is better.
+    """
+    expr = match_expression(query, require_all, prefix)
+    if not expr:
+        return []
+    rows = db.execute(text(f"""
+        SELECT k.id, k.question, k.answer, f.rank
+        FROM (SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :expr
+              ORDER BY rank LIMIT :limit) AS f
+        JOIN knowledge AS k ON k.id = f.rowid
+        ORDER BY f.rank, k.id
+    """), {"expr": expr, "limit": limit})
+    return [tuple(r) for r in rows]
+
+
+def best(db, question: str) -> tuple[str | None, float]:
+    """Best (answer, score) for a chat question, or (None, 0.0).
+
+    BM25 picks the row; the score is the share of the question's words found
+    in that row's question (0..1), so MIN_RETRIEVAL_SCORE means the same
+    thing as in the other retrieval modes.
+    """
+    hits = search(db, question, limit=1)
+    if not hits:
+        return None, 0.0
+    words = set(_TOKEN.findall(question.lower()))
+    found = words & set(_TOKEN.findall((hits[0][1] or "").lower()))
+    return hits[0][2], len(found) / len(words)
+
+
+def integrity_check(engine):
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('integrity-check')"))
+
+
+if __name__ == "__main__":
+    from models import engine, init_db
+    init_db()
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "rebuild"
+    if cmd == "rebuild":
+        rebuild(engine)
+        print("✓ Full-text index rebuilt")
+    elif cmd == "check":
+        integrity_check(engine)
+        print("✓ Full-text index is consistent")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,756 @@
+# knowledge_index.py
+"""
+In-memory retrieval indexes over the Knowledge table.
+
+Both indexes are built once from the database and then answer chat lookups
+without touching SQLite: every question is normalized with `preprocess()`
+a single time.
+
+- KnowledgeIndex: inverted index; a query only scores the rows that appear
+  in the posting lists of its own tokens.
+- TfidfIndex: L2-normalized sparse TF-IDF matrix over stemmed words without
+  stop words (terms()); a query is one sparse dot product plus top-k
+  selection and comes back with a cosine score.
+
+The TF-IDF index can also be written to a snapshot directory of .npy files
+(`python knowledge_index.py snapshot`). Workers memory-map it read-only, so
+they start without reading SQLite or tokenizing a single question, and all
+workers on a host share one copy of it through the page cache. The snapshot
+records the table's revision (knowledge_revision.py) and is ignored once any
+row has been written since.
+"""
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import NamedTuple
+import numpy as np
+from sqlalchemy import func
+import knowledge_revision
+from models import SessionLocal, Knowledge
+from text_utils import content_words, preprocess, tokenize
+
+# tokens found in more rows than this share of the index only contribute to
+# scoring, not to candidate generation, so common words keep lookups flat
+COMMON_TOKEN_RATIO = 0.05
+COMMON_TOKEN_MIN_ROWS = 50
+
+# admin edits are scored from a small side table until this many pile up,
+# then the TF-IDF matrix is recompiled from memory (outside the lock, so
+# lookups keep being answered meanwhile)
+MAX_OVERLAY_ROWS = 500
+
+# a retrieved answer is only used from this score on; calibrated on the bundled
+# datasets (test_knowledge_index.py), where right answers to reworded questions
+# mostly score 0.5-1.0 and off-topic questions up to ~0.45
+MIN_RETRIEVAL_SCORE = float(os.getenv("MIN_RETRIEVAL_SCORE", "0.5"))
+
+# precompiled TF-IDF snapshot (a directory); used when present and current
+SNAPSHOT_PATH = os.getenv("KNOWLEDGE_SNAPSHOT", "./database/knowledge_snapshot")
+SNAPSHOT_VERSION = 3
+
+
+def load_rows(build):
+    """Stream (id, question, answer) rows from the Knowledge table into `build`."""
+    db = SessionLocal()
+    try:
+        rows = db.query(Knowledge.id, Knowledge.question, Knowledge.answer).yield_per(1000)
+        build(rows)
+    finally:
+        db.close()
+
+
+def knowledge_stamp(db=None) -> tuple[int, int, int | None]:
+    """(row count, highest id, revision) of the Knowledge table, to tell if a snapshot is current."""
+    own = db is None
+    db = db or SessionLocal()
+    try:
+        count, max_id = db.query(func.count(Knowledge.id), func.max(Knowledge.id)).one()
+        return int(count), int(max_id or 0), knowledge_revision.current(db)
+    finally:
+        if own:
+            db.close()
+
+
+def terms(text: str | None) -> list[str]:
+    """TF-IDF terms of a question: normalized, stemmed words without stop words."""
+    return content_words(tokenize(text or ""))
+
+
+class KnowledgeIndex:
+    """Token -> row id posting lists plus the normalized rows they point to."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._building = 0  # builds in progress
+        # id -> (question, answer), or None if deleted, for edits made during a build
+        self._pending: dict[int, tuple | None] = {}
+        self.postings: dict[str, set[int]] = defaultdict(set)
+        # id -> (normalized question, answer, unique tokens)
+        self.entries: dict[int, tuple[str, str, frozenset]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    # --------------------
+    # Building
+    # --------------------
+    def build(self, rows):
+        """(Re)build the index from an iterable of (id, question, answer).
+
+        The rows are read and indexed without the lock, so lookups keep
+        using the old index until the swap; edits made meanwhile are
+        applied again on top of the new one.
+        """
+        with self._lock:
+            self._building += 1
+        try:
+            postings, entries = defaultdict(set), {}
+            for kid, question, answer in rows:
+                self._index_row(postings, entries, kid, question, answer)
+            with self._lock:
+                self.postings, self.entries = postings, entries
+                self._loaded = True
+                for kid, row in self._pending.items():
+                    self._remove(kid)
+                    if row is not None:
+                        self._add(kid, *row)
+        finally:
+            with self._lock:
+                self._building -= 1
+                if not self._building:
+                    self._pending = {}
+
+    def load_from_db(self):
+        """Build the index from every row of the Knowledge table."""
+        load_rows(self.build)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self):
+        """Build the index from the database on first use."""
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                self.load_from_db()
+
+    @staticmethod
+    def _index_row(postings: dict, entries: dict, kid: int, question: str | None, answer: str | None):
+        clean = preprocess(question or "")
+        tokens = frozenset(clean.split())
+        entries[kid] = (clean, answer or "", tokens)
+        for tok in tokens:
+            postings[tok].add(kid)
+
+    def _add(self, kid: int, question: str | None, answer: str | None):
+        self._index_row(self.postings, self.entries, kid, question, answer)
+
+    # --------------------
+    # Incremental updates
+    # --------------------
+    def add(self, kid: int, question: str | None, answer: str | None):
+        """Add a newly created row, or replace the stored copy of an existing one."""
+        with self._lock:
+            if self._building:
+                self._pending[kid] = (question, answer)
+            if not self._loaded:
+                return  # the first lookup builds from the database anyway
+            self._remove(kid)
+            self._add(kid, question, answer)
+
+    def remove(self, kid: int):
+        """Drop a deleted row from the index."""
+        with self._lock:
+            if self._building:
+                self._pending[kid] = None
+            if self._loaded:
+                self._remove(kid)
+
+    def _remove(self, kid: int):
+        entry = self.entries.pop(kid, None)
+        if entry is None:
+            return
+        for tok in entry[2]:
+            ids = self.postings.get(tok)
+            if ids is None:
+                continue
+            ids.discard(kid)
+            if not ids:
+                del self.postings[tok]
+
+    # --------------------
+    # Lookup
+    # --------------------
+    def search(self, question: str) -> str | None:
+        """Return the best answer for `question`, or None if nothing matches.
+
+        A row whose normalized question contains the whole normalized query
+        wins first; otherwise rows are ranked by how many query words they
+        contain, ties going to the oldest entry.
+        """
+        self.ensure_loaded()
+        clean_q = preprocess(question)
+        keywords = clean_q.split()
+        if not keywords:
+            return None
+
+        with self._lock:
+            lists = [self.postings.get(kw) for kw in set(keywords)]
+            if all(lists):
+                # phrase match: only rows holding every query token can contain the phrase
+                lists.sort(key=len)
+                candidates = set.intersection(*lists)
+                for kid in sorted(candidates):
+                    if clean_q in self.entries[kid][0]:
+                        return self.entries[kid][1]
+
+            # Score only rows reached through selective tokens; words that
+            # appear in a large share of rows ("how", "to") still count
+            # towards a candidate's score but do not generate candidates.
+            present = [kw for kw in set(keywords) if kw in self.postings]
+            if not present:
+                return None
+            cap = max(COMMON_TOKEN_MIN_ROWS, int(len(self.entries) * COMMON_TOKEN_RATIO))
+            selective = [kw for kw in present if len(self.postings[kw]) <= cap]
+            sources = selective or present
+            candidates = set().union(*(self.postings[kw] for kw in sources))
+            scores = {
+                kid: sum(1 for kw in keywords if kw in self.entries[kid][2])
+                for kid in candidates
+            }
+            best = min(scores, key=lambda kid: (-scores[kid], kid))
+            return self.entries[best][1]
+
+
+# --------------------
+# Snapshot storage
+# --------------------
+class _CscArrays(NamedTuple):
+    """The arrays of a CSC matrix, memory-mapped; search() needs nothing more."""
+    data: np.ndarray
+    indices: np.ndarray
+    indptr: np.ndarray
+    shape: tuple[int, int]
+
+
+class _SortedVocab:
+    """Read-only token -> column map over a sorted array of UTF-8 tokens.
+
+    Tokens are binary-searched once, then remembered, so only the words
+    users actually type end up in a per-process dict.
+    """
+
+    def __init__(self, tokens: np.ndarray):
+        self.tokens = tokens
+        self._seen: dict[str, int | None] = {}
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def get(self, tok: str, default=None):
+        try:
+            i = self._seen[tok]
+        except KeyError:
+            key = tok.encode()
+            i = int(np.searchsorted(self.tokens, key))
+            if i >= len(self.tokens) or self.tokens[i] != key:
+                i = None
+            if len(self._seen) > 100_000:
+                self._seen.clear()
+            self._seen[tok] = i
+        return default if i is None else i
+
+    def __contains__(self, tok: str) -> bool:
+        return self.get(tok) is not None
+
+    def __getitem__(self, tok: str) -> int:
+        i = self.get(tok)
+        if i is None:
+            raise KeyError(tok)
+        return i
+
+
+class _StringTable:
+    """Strings stored as one UTF-8 byte array plus offsets, decoded on access."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode()
+
+    @staticmethod
+    def pack(strings) -> tuple[np.ndarray, np.ndarray]:
+        encoded = [x.encode() for x in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class TfidfIndex:
+    """Cosine-similarity retrieval over a normalized sparse TF-IDF matrix."""
+
+    def __init__(self, max_overlay: int = MAX_OVERLAY_ROWS, snapshot: str | None = None):
+        self._lock = threading.RLock()
+        self._rows_lock = threading.Lock()  # one thread rebuilds a snapshot's row table
+        self._loaded = False
+        self._generation = 0  # bumped whenever the compiled state is replaced
+        self._compiling = False
+        self._dirty: set[int] = set()  # ids edited while a recompile is running
+        self.max_overlay = max_overlay
+        self.snapshot = snapshot  # directory tried before the database, if set
+        # knowledge_stamp() of the table the index was built from; None once edited in memory
+        self.stamp: tuple | None = None
+        # id -> (tokens, answer); kept so the matrix can be recompiled without the DB.
+        # None while serving from a snapshot, until the first edit needs it.
+        self.rows: dict[int, tuple[tuple, str]] | None = {}
+        self.questions = None  # snapshot only: space-joined terms() of the question per position
+        self.vocab: dict[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.default_idf = 1.0
+        self.matrix = None  # scipy CSC matrix, built by _compile_rows()
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.answers: list[str] = []
+        self.alive = np.zeros(0, dtype=bool)
+        # id -> ({token: weight}, answer) for rows added or edited since the last compile
+        self.overlay: dict[int, tuple[dict, str]] = {}
+        self.overlay_postings: dict[str, set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.ids) if self.rows is None else len(self.rows)
+
+    # --------------------
+    # Building
+    # --------------------
+    def build(self, rows, stamp: tuple | None = None):
+        """(Re)build the matrix from an iterable of (id, question, answer) read at `stamp`."""
+        # tokenized and compiled without the lock; lookups see the old state until the swap
+        rows = {kid: (tuple(terms(q)), a or "") for kid, q, a in rows}
+        compiled = self._compile_rows(rows)
+        with self._lock:
+            self.rows = rows
+            self._install(compiled)
+            self.stamp = tuple(stamp) if stamp else None
+            self._loaded = True
+
+    def load_from_db(self):
+        """Build the matrix from every row of the Knowledge table."""
+        def build(rows):
+            # stamped before the rows are read: a write in between leaves the
+            # stamp behind the table, which only makes a snapshot look stale
+            self.build(rows, stamp=knowledge_stamp())
+        load_rows(build)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self):
+        """Map the snapshot, or build the matrix from the database, on first use."""
+        if self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                if not (self.snapshot and self.load_snapshot(self.snapshot)):
+                    self.load_from_db()
+
+    def _compile(self):
+        """Recompile in place from self.rows (the caller holds the lock)."""
+        self._materialize_rows()
+        self._install(self._compile_rows(self.rows))
+
+    @staticmethod
+    def _compile_rows(rows: dict) -> dict:
+        """The compiled matrix state for id -> (tokens, answer) `rows`; touches no index state."""
+        from scipy import sparse  # imported on first build: scipy is slow to import
+        ids = sorted(rows)
+        vocab: dict[str, int] = {}
+        indptr, indices, data = [0], [], []
+        for kid in ids:
+            for tok, count in Counter(rows[kid][0]).items():
+                indices.append(vocab.setdefault(tok, len(vocab)))
+                data.append(count)
+            indptr.append(len(indices))
+
+        n = len(ids)
+        indices = np.asarray(indices, dtype=np.int32)
+        data = np.asarray(data, dtype=np.float32)
+        df = np.bincount(indices, minlength=len(vocab))
+        idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        data *= idf[indices]
+        matrix = sparse.csr_matrix((data, indices, np.asarray(indptr)), shape=(n, len(vocab)))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        matrix = sparse.diags(1.0 / norms).dot(matrix).astype(np.float32)
+        return {
+            "vocab": vocab,
+            "idf": idf,
+            "default_idf": float(np.log(1 + n) + 1),  # idf of a token no compiled row has
+            "matrix": matrix.tocsc(),
+            "ids": np.asarray(ids, dtype=np.int64),
+            "answers": [rows[kid][1] for kid in ids],
+        }
+
+    def _install(self, compiled: dict):
+        """Swap in the output of _compile_rows() (the caller holds the lock)."""
+        for name, value in compiled.items():
+            setattr(self, name, value)
+        self.questions = None
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        self.overlay = {}
+        self.overlay_postings = defaultdict(set)
+        self._generation += 1
+
+    # --------------------
+    # Snapshot
+    # --------------------
+    def save_snapshot(self, path: str = SNAPSHOT_PATH):
+        """Write the compiled index to directory `path` (replaced atomically)."""
+        from scipy import sparse
+        self._ensure_rows()
+        with self._lock:
+            self._compile()  # folds in pending edits; vocab/matrix are in-memory again
+            tokens = sorted(self.vocab)  # code point order == UTF-8 byte order
+            cols = [self.vocab[t] for t in tokens]
+            matrix = sparse.csc_matrix(self.matrix[:, cols])
+            index_dtype = np.int32 if matrix.nnz < 2 ** 31 else np.int64
+            width = max((len(t.encode()) for t in tokens), default=1)
+            q_blob, q_offsets = _StringTable.pack(" ".join(self.rows[int(kid)][0]) for kid in self.ids)
+            a_blob, a_offsets = _StringTable.pack(self.answers)
+            arrays = {
+                "ids": self.ids,
+                "vocab": np.array([t.encode() for t in tokens], dtype=f"S{width}"),
+                "idf": self.idf[cols],
+                "data": matrix.data.astype(np.float32),
+                "indices": matrix.indices.astype(index_dtype),
+                "indptr": matrix.indptr.astype(index_dtype),
+                "questions": q_blob, "question_offsets": q_offsets,
+                "answers": a_blob, "answer_offsets": a_offsets,
+            }
+            manifest = {
+                "version": SNAPSHOT_VERSION,
+                "rows": len(self.ids),
+                "max_id": int(self.ids[-1]) if len(self.ids) else 0,
+                "revision": self.stamp[2] if self.stamp else None,
+                "vocab": len(tokens),
+                "nnz": int(matrix.nnz),
+                "default_idf": self.default_idf,
+                "built_at": time.time(),
+            }
+
+        tmp = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), arr)
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        # workers still mapping the old files keep them until they reload
+        old = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.rename(path, old)
+        os.rename(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+        return manifest
+
+    def load_snapshot(self, path: str = SNAPSHOT_PATH, stamp: tuple | None = None) -> bool:
+        """Memory-map a snapshot written by save_snapshot().
+
+        Returns False (leaving the index untouched) if there is no snapshot,
+        it has another format version, or its (rows, highest id, revision)
+        differ from `stamp`, which is read from the Knowledge table by default.
+        A snapshot without a revision (written from an edited index, or from
+        a database that does not track one) is never current.
+        """
+        try:
+            with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return False
+        try:
+            if manifest.get("version") != SNAPSHOT_VERSION:
+                print(f"Knowledge snapshot {path} has format {manifest.get('version')}, "
+                      f"expected {SNAPSHOT_VERSION}; building from the database")
+                return False
+            stamp = tuple(stamp or knowledge_stamp())
+            written = (manifest["rows"], manifest["max_id"], manifest["revision"])
+            if written[2] is None or written != stamp:
+                print(f"Knowledge snapshot {path} is out of date; building from the database "
+                      "(rebuild it with `python knowledge_index.py snapshot`)")
+                return False
+
+            def load(name):
+                # a plain ndarray view of the mapping skips np.memmap's per-operation overhead
+                return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r").view(np.ndarray)
+
+            ids = load("ids")
+            with self._lock:
+                self.ids = ids
+                self.vocab = _SortedVocab(load("vocab"))
+                self.idf = load("idf")
+                self.default_idf = float(manifest["default_idf"])
+                self.matrix = _CscArrays(load("data"), load("indices"), load("indptr"),
+                                         (len(ids), manifest["vocab"]))
+                self.questions = _StringTable(load("questions"), load("question_offsets"))
+                self.answers = _StringTable(load("answers"), load("answer_offsets"))
+                self.alive = np.ones(len(ids), dtype=bool)
+                self.rows = None
+                self.stamp = stamp
+                self.overlay = {}
+                self.overlay_postings = defaultdict(set)
+                self._generation += 1
+                self._loaded = True
+            return True
+        except Exception as e:
+            print(f"Knowledge snapshot not loaded ({type(e).__name__}: {e}); building from the database")
+            return False
+
+    def _weights(self, tokens) -> dict[str, float]:
+        """L2-normalized TF-IDF weights for a token list under the compiled idf."""
+        weights = {
+            tok: count * (float(self.idf[self.vocab[tok]]) if tok in self.vocab else self.default_idf)
+            for tok, count in Counter(tokens).items()
+        }
+        norm = sum(w * w for w in weights.values()) ** 0.5
+        return {tok: w / norm for tok, w in weights.items()} if norm else {}
+
+    # --------------------
+    # Incremental updates
+    # --------------------
+    def add(self, kid: int, question: str | None, answer: str | None):
+        """Add a newly created row, or replace the stored copy of an existing one."""
+        if not self._loaded:
+            return
+        tokens = tuple(terms(question))
+        self._ensure_rows()
+        with self._lock:
+            self._materialize_rows()
+            self.rows[kid] = (tokens, answer or "")
+            self.stamp = None
+            pos = self._position(kid)
+            if pos is not None:
+                self.alive[pos] = False
+            self._add_overlay(kid, tokens, answer or "")
+            if self._compiling:
+                self._dirty.add(kid)
+            recompile = len(self.overlay) > self.max_overlay and not self._compiling
+            if recompile:
+                self._compiling = True
+                rows, generation = dict(self.rows), self._generation
+        if recompile:
+            self._recompile(rows, generation)
+
+    def remove(self, kid: int):
+        """Drop a deleted row."""
+        if not self._loaded:
+            return
+        self._ensure_rows()
+        with self._lock:
+            self._materialize_rows()
+            self.rows.pop(kid, None)
+            self.stamp = None
+            self._drop_overlay(kid)
+            pos = self._position(kid)
+            if pos is not None:
+                self.alive[pos] = False
+            if self._compiling:
+                self._dirty.add(kid)
+
+    def _recompile(self, rows: dict, generation: int):
+        """Fold the overlay into a new matrix built from `rows` while lookups go on.
+
+        Rows edited during the build are masked out of the new matrix and
+        put back into the overlay when it is swapped in.
+        """
+        try:
+            compiled = self._compile_rows(rows)
+            with self._lock:
+                if self._generation != generation:
+                    return  # rebuilt or reloaded meanwhile
+                self._install(compiled)
+                for kid in self._dirty:
+                    pos = self._position(kid)
+                    if pos is not None:
+                        self.alive[pos] = False
+                    if kid in self.rows:
+                        self._add_overlay(kid, *self.rows[kid])
+        finally:
+            with self._lock:
+                self._compiling = False
+                self._dirty = set()
+
+    def _add_overlay(self, kid: int, tokens: tuple, answer: str):
+        self._drop_overlay(kid)
+        weights = self._weights(tokens)
+        self.overlay[kid] = (weights, answer)
+        for tok in weights:
+            self.overlay_postings[tok].add(kid)
+
+    def _position(self, kid: int) -> int | None:
+        """Row of `kid` in the compiled matrix (ids are sorted), or None."""
+        pos = int(np.searchsorted(self.ids, kid))
+        return pos if pos < len(self.ids) and self.ids[pos] == kid else None
+
+    def _ensure_rows(self):
+        """Rebuild a snapshot's id -> (tokens, answer) table before the first edit, outside the lock."""
+        if self.rows is not None:
+            return
+        with self._rows_lock:
+            with self._lock:
+                if self.rows is not None:
+                    return
+                # alive only changes through edits, which wait for _rows_lock
+                generation, ids, questions, answers = self._generation, self.ids, self.questions, self.answers
+                alive = np.flatnonzero(self.alive)
+            rows = {int(ids[i]): (tuple(questions[i].split()), answers[i]) for i in alive}
+            with self._lock:
+                if self._generation == generation and self.rows is None:
+                    self.rows = rows
+
+    def _materialize_rows(self):
+        """Rebuild the row table under the lock; only needed if a reload raced _ensure_rows()."""
+        if self.rows is not None:
+            return
+        self.rows = {int(self.ids[i]): (tuple(self.questions[i].split()), self.answers[i])
+                     for i in np.flatnonzero(self.alive)}
+
+    def _drop_overlay(self, kid: int):
+        entry = self.overlay.pop(kid, None)
+        if entry is None:
+            return
+        for tok in entry[0]:
+            ids = self.overlay_postings.get(tok)
+            if ids is not None:
+                ids.discard(kid)
+                if not ids:
+                    del self.overlay_postings[tok]
+
+    # --------------------
+    # Lookup
+    # --------------------
+    def search(self, question: str, k: int = 1) -> list[tuple[str, float, int]]:
+        """Return up to `k` (answer, cosine score, id) tuples, best first."""
+        self.ensure_loaded()
+        tokens = terms(question)
+        if not tokens:
+            return []
+
+        with self._lock:
+            q = self._weights(tokens)
+            hits = []
+
+            known = [tok for tok in q if tok in self.vocab]
+            if known:
+                # sparse dot product: walk the CSC column of each query token
+                m = self.matrix
+                spans = [(m.indptr[self.vocab[tok]], m.indptr[self.vocab[tok] + 1]) for tok in known]
+                rows = np.concatenate([m.indices[a:b] for a, b in spans])
+                vals = np.concatenate([m.data[a:b] * q[tok] for (a, b), tok in zip(spans, known)])
+                scores = np.bincount(rows, weights=vals, minlength=m.shape[0])
+                scores[~self.alive] = 0.0
+                if k < len(scores):
+                    top = np.argpartition(-scores, k - 1)[:k]
+                else:
+                    top = np.arange(len(scores))
+                for pos in top:
+                    if scores[pos] > 0:
+                        hits.append((self.answers[pos], float(scores[pos]), int(self.ids[pos])))
+
+            hits.extend(self._overlay_hits(q))
+
+        hits.sort(key=lambda h: (-h[1], h[2]))
+        return hits[:k]
+
+    def _overlay_hits(self, q: dict[str, float]) -> list[tuple[str, float, int]]:
+        """Score the uncompiled overlay rows sharing a token with query weights `q`."""
+        overlay_ids = set()
+        for tok in q:
+            overlay_ids.update(self.overlay_postings.get(tok, ()))
+        hits = []
+        for kid in overlay_ids:
+            weights, answer = self.overlay[kid]
+            score = sum(w * weights.get(tok, 0.0) for tok, w in q.items())
+            if score > 0:
+                hits.append((answer, score, kid))
+        return hits
+
+    def best(self, question: str) -> tuple[str | None, float]:
+        """Return the single best (answer, score), or (None, 0.0)."""
+        hits = self.search(question, k=1)
+        return (hits[0][0], hits[0][1]) if hits else (None, 0.0)
+
+    def best_batch(self, questions: list[str]) -> list[tuple[str | None, float]]:
+        """best() for many questions with one sparse matrix product."""
+        from scipy import sparse
+        self.ensure_loaded()
+        with self._lock:
+            weights = [self._weights(terms(q)) for q in questions]
+            indptr, indices, data = [0], [], []
+            for q in weights:
+                for tok, w in q.items():
+                    col = self.vocab.get(tok)
+                    if col is not None:
+                        indices.append(col)
+                        data.append(w)
+                indptr.append(len(indices))
+            queries = sparse.csr_matrix(
+                (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+                shape=(len(questions), len(self.vocab)))
+            if not sparse.issparse(self.matrix):
+                m = self.matrix  # snapshot arrays: wrap them without copying
+                self.matrix = sparse.csc_matrix((m.data, m.indices, m.indptr), shape=m.shape, copy=False)
+            # (questions x vocab) . (vocab x rows); deleted/edited rows are masked out
+            scores = sparse.csr_matrix(queries.dot(self.matrix.T).multiply(self.alive[np.newaxis, :]))
+            top = np.asarray(scores.argmax(axis=1)).ravel()
+            top_scores = np.asarray(scores.max(axis=1).todense()).ravel()
+
+            results = []
+            for i, q in enumerate(weights):
+                # ids are sorted, so argmax's first maximum is the lowest id
+                best = (None, 0.0, 0)
+                if top_scores[i] > 0:
+                    pos = top[i]
+                    best = (self.answers[pos], float(top_scores[i]), int(self.ids[pos]))
+                for hit in self._overlay_hits(q):
+                    if hit[1] > best[1] or (hit[1] == best[1] and hit[2] < best[2]):
+                        best = hit
+                results.append(best[:2])
+        return results
+
+
+if __name__ == "__main__":
+    # python knowledge_index.py snapshot [dir]   - build the TF-IDF snapshot from the database
+    # python knowledge_index.py info [dir]       - show a snapshot and time mapping it
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "snapshot"
+    path = sys.argv[2] if len(sys.argv) > 2 else SNAPSHOT_PATH
+    if cmd == "snapshot":
+        start = time.perf_counter()
+        index = TfidfIndex()
+        index.load_from_db()
+        manifest = index.save_snapshot(path)
+        print(f"✓ Snapshot of {manifest['rows']} rows ({manifest['vocab']} tokens) written to {path} "
+              f"in {time.perf_counter() - start:.1f}s")
+        if manifest["revision"] is None:
+            print("  This database does not track a knowledge revision, so workers will not use the snapshot")
+    elif cmd == "info":
+        start = time.perf_counter()
+        index = TfidfIndex()
+        if not index.load_snapshot(path):
+            print(f"✗ No current snapshot at {path}")
+            sys.exit(1)
+        print(f"✓ {len(index)} rows, {len(index.vocab)} tokens, mapped in "
+              f"{(time.perf_counter() - start) * 1000:.1f} ms")
+    else:
+        print("usage: python knowledge_index.py [snapshot|info] [dir]")
+        sys.exit(2)
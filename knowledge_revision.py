@@ -0,0 +1,203 @@
+# knowledge_revision.py
+"""
+Change log and revision number for the content of the Knowledge table.
+
+Insert/update/delete triggers on `knowledge` append the id of every row
+they touch to knowledge_changes, whatever makes the write: an admin edit
+in any worker, an import upsert, a merge of duplicates or plain SQL. The
+sequence number of the last entry is the table's revision:
+
+- the TF-IDF snapshot records it and is only mapped while it still matches
+- KnowledgeWatcher polls the log so each worker replays the rows written
+  through the other workers into its in-memory indexes
+
+A bulk import suspends the triggers and logs a single "reload everything"
+entry (kid NULL) instead of one entry per row. The suspension is recorded
+in knowledge_changes_suspended, so if the import dies half way the next
+ensure_revision() (init_db) recreates the triggers and logs the reload. Only the last KEEP_CHANGES
+entries are kept; a worker that fell further behind reloads everything.
+
+SQLite only, like knowledge_fts; current() returns None on other databases.
+"""
+import os
+import threading
+import time
+from typing import Callable
+from sqlalchemy import bindparam, text
+
+CHANGES_TABLE = "knowledge_changes"
+SUSPENDED_TABLE = "knowledge_changes_suspended"
+# log entries kept for workers that are behind
+KEEP_CHANGES = int(os.getenv("KNOWLEDGE_KEEP_CHANGES", "10000"))
+# how often (seconds) a worker checks the log for edits made elsewhere
+SYNC_INTERVAL = float(os.getenv("KNOWLEDGE_SYNC_SECONDS", "2"))
+
+_TRIGGERS = {
+    "knowledge_changes_ai": f"""CREATE TRIGGER IF NOT EXISTS knowledge_changes_ai AFTER INSERT ON knowledge BEGIN
+        INSERT INTO {CHANGES_TABLE}(kid) VALUES (new.id);
+    END""",
+    "knowledge_changes_ad": f"""CREATE TRIGGER IF NOT EXISTS knowledge_changes_ad AFTER DELETE ON knowledge BEGIN
+        INSERT INTO {CHANGES_TABLE}(kid) VALUES (old.id);
+    END""",
+    "knowledge_changes_au": f"""CREATE TRIGGER IF NOT EXISTS knowledge_changes_au AFTER UPDATE ON knowledge BEGIN
+        INSERT INTO {CHANGES_TABLE}(kid) VALUES (new.id);
+        INSERT INTO {CHANGES_TABLE}(kid) SELECT old.id WHERE old.id != new.id;
+    END""",
+}
+
+# the earlier one-row revision counter and its triggers, dropped on upgrade
+_OBSOLETE = [
+    "DROP TRIGGER IF EXISTS knowledge_rev_ai",
+    "DROP TRIGGER IF EXISTS knowledge_rev_ad",
+    "DROP TRIGGER IF EXISTS knowledge_rev_au",
+    "DROP TABLE IF EXISTS knowledge_revision",
+]
+
+_SCHEMA = [
+    *_OBSOLETE,
+    # AUTOINCREMENT: sequence numbers are never reused, even after pruning
+    f"CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (seq INTEGER PRIMARY KEY AUTOINCREMENT, kid INTEGER)",
+    f"CREATE TABLE IF NOT EXISTS {SUSPENDED_TABLE} (since REAL)",
+    *_TRIGGERS.values(),
+]
+
+_ROWS = text("SELECT id, question, answer FROM knowledge WHERE id IN :ids").bindparams(
+    bindparam("ids", expanding=True))
+
+
+def ensure_revision(engine) -> bool:
+    """Create the change log and its triggers if missing, dropping the older revision counter.
+
+    Also finishes a suspend_triggers() that was never resumed by logging a
+    full reload. Returns False (and does nothing) for databases other than
+    SQLite.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        for stmt in _SCHEMA:
+            conn.execute(text(stmt))
+        if conn.execute(text(f"SELECT 1 FROM {SUSPENDED_TABLE}")).first():
+            conn.execute(text(f"INSERT INTO {CHANGES_TABLE}(kid) VALUES (NULL)"))
+            conn.execute(text(f"DELETE FROM {SUSPENDED_TABLE}"))
+    return True
+
+
+def current(db) -> int | None:
+    """Revision of the Knowledge table as seen by session `db`, or None if it is not tracked."""
+    if db.get_bind().dialect.name != "sqlite":
+        return None
+    row = db.execute(text("SELECT seq FROM sqlite_sequence WHERE name = :name"), {"name": CHANGES_TABLE}).first()
+    return int(row[0]) if row else 0
+
+
+def changes_since(db, revision: int) -> tuple[int, list[int] | None]:
+    """(latest revision, ids of the rows written after `revision`, oldest first).
+
+    The id list is None when the changes cannot be replayed row by row: a
+    bulk import happened, or the log no longer reaches back to `revision`.
+    """
+    rows = db.execute(
+        text(f"SELECT seq, kid FROM {CHANGES_TABLE} WHERE seq > :rev ORDER BY seq LIMIT :limit"),
+        {"rev": revision, "limit": KEEP_CHANGES + 1},
+    ).all()
+    if not rows:
+        latest = current(db)
+        return latest, ([] if latest == revision else None)
+    if rows[0][0] != revision + 1 or len(rows) > KEEP_CHANGES or any(kid is None for _, kid in rows):
+        return current(db), None
+    return rows[-1][0], list(dict.fromkeys(kid for _, kid in rows))
+
+
+def prune(engine, keep: int = KEEP_CHANGES):
+    """Drop all but the last `keep` log entries."""
+    with engine.begin() as conn:
+        conn.execute(
+            text(f"DELETE FROM {CHANGES_TABLE} WHERE seq <= "
+                 "(SELECT seq FROM sqlite_sequence WHERE name = :name) - :keep"),
+            {"name": CHANGES_TABLE, "keep": keep},
+        )
+
+
+def suspend_triggers(engine) -> bool:
+    """Drop the logging triggers before a bulk write; True if they were dropped.
+
+    resume_triggers() recreates them and logs one "reload everything" entry
+    for the whole import instead of one entry per row.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {SUSPENDED_TABLE} (since REAL)"))
+        conn.execute(text(f"INSERT INTO {SUSPENDED_TABLE} (since) VALUES (:now)"), {"now": time.time()})
+        for name in _TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    return True
+
+
+def resume_triggers(engine):
+    """Recreate the logging triggers after suspend_triggers() and log a full reload."""
+    ensure_revision(engine)  # sees the suspension and logs the reload
+
+
+class KnowledgeWatcher:
+    """Replays Knowledge rows written by other processes into this one.
+
+    poll() reads the log since the revision last seen and calls `on_rows`
+    with {id: (question, answer), or None if deleted} for the rows written
+    since, or `on_reload` when they cannot be replayed one by one. Rows this
+    process wrote itself come back as well; applying them twice is harmless.
+    """
+
+    def __init__(self, session_factory, on_rows: Callable[[dict], None], on_reload: Callable[[], None],
+                 interval: float = SYNC_INTERVAL):
+        self.session_factory = session_factory
+        self.on_rows = on_rows
+        self.on_reload = on_reload
+        self.interval = interval
+        self.revision: int | None = None
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.reloads = 0
+        self.polls = 0
+
+    def start(self):
+        """Note the current revision (once); call before the indexes first read the table."""
+        if self.revision is not None:
+            return
+        with self._lock:
+            if self.revision is None:
+                with self.session_factory() as db:
+                    self.revision = current(db)
+
+    def poll(self) -> int:
+        """Apply the changes made since the last poll; returns the number of rows replayed."""
+        if self.revision is None:
+            return 0
+        with self._lock:
+            self.polls += 1
+            with self.session_factory() as db:
+                engine = db.get_bind()
+                latest, kids = changes_since(db, self.revision)
+                rows = dict.fromkeys(kids or ())
+                for start in range(0, len(rows), 500):
+                    for kid, question, answer in db.execute(_ROWS, {"ids": kids[start:start + 500]}):
+                        rows[kid] = (question, answer)
+            if kids is None:
+                self.on_reload()
+                self.reloads += 1
+            elif rows:
+                self.on_rows(rows)
+                self.replayed += len(rows)
+            self.revision = latest
+            if self.polls % 100 == 0:
+                prune(engine)
+            return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "revision": self.revision,
+            "replayed": self.replayed,
+            "reloads": self.reloads,
+            "polls": self.polls,
+        }
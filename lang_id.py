@@ -0,0 +1,158 @@
+# lang_id.py
+"""
+Character-trigram language identification for chat messages.
+
+train_lang_id.py builds a profile offline (lang_profile.npz): the trigram
+vocabulary and a float16 matrix of smoothed log-probabilities, one row per
+trigram and one column per language. Trigrams are taken per space-padded
+word, so a word's score vector (the sum of its trigram rows) is computed
+once and cached; detecting a message is one pass over its words plus a
+vector sum and an argmax, whatever the number of languages.
+"""
+import os
+import re
+import threading
+import numpy as np
+
+PROFILE_PATH = os.getenv("LANG_PROFILE_PATH", "lang_profile.npz")
+DEFAULT_LANG = "en"
+# another language must out-score the default by this many nats (log-likelihood)
+# in total, so one- or two-word messages like "ok" or "no" stay English unless
+# the evidence is clear
+MIN_MARGIN = float(os.getenv("LANG_MIN_MARGIN", "5.0"))
+
+# digits and punctuation separate words; letters of every script are kept
+_NON_LETTER = re.compile(r"[\W\d_]+")
+
+
+# per-word score vectors kept by LanguageIdentifier before the cache is reset
+WORD_CACHE_SIZE = 50_000
+
+
+def words(text: str) -> list[str]:
+    return _NON_LETTER.sub(" ", text.lower()).split()
+
+
+def trigrams(word: str) -> list[str]:
+    """Trigrams of one space-padded word: "ok" -> [" ok", "ok "]."""
+    s = f" {word} "
+    return [s[i:i + 3] for i in range(len(s) - 2)]
+
+
+def build_profile(samples: dict[str, list[str]], smoothing: float = 1.0):
+    """Train the trigram model: returns (langs, vocab, logp).
+
+    Each language is smoothed in proportion to its amount of text, so every
+    language gives an unseen trigram the same probability and the languages
+    with the most training text are not penalised on rare trigrams.
+    logp[0] holds that unseen-trigram log-probability.
+    """
+    langs = sorted(samples)
+    counts: dict[str, np.ndarray] = {}
+    for j, lang in enumerate(langs):
+        for text in samples[lang]:
+            for word in words(text):
+                for g in trigrams(word):
+                    row = counts.get(g)
+                    if row is None:
+                        row = counts[g] = np.zeros(len(langs))
+                    row[j] += 1
+    vocab = sorted(counts)
+    table = np.array([counts[g] for g in vocab]).reshape(len(vocab), len(langs))
+    totals = table.sum(axis=0)
+    alpha = smoothing * totals / (len(vocab) + 1)
+    denom = totals + alpha * (len(vocab) + 1)
+    logp = np.vstack([np.log(alpha / denom), np.log((table + alpha) / denom)])
+    return langs, vocab, logp.astype(np.float16)
+
+
+class LanguageIdentifier:
+    """Loads a trigram profile once and scores messages against it."""
+
+    def __init__(self, path: str = PROFILE_PATH, default: str = DEFAULT_LANG,
+                 min_margin: float = MIN_MARGIN):
+        self.path = path
+        self.default = default
+        self.min_margin = min_margin
+        self.langs: list[str] = []
+        self.index: dict[str, int] = {}
+        self.logp = None
+        self._default_col = 0
+        self._word_scores: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.logp is not None
+
+    def load(self):
+        try:
+            with np.load(self.path) as data:
+                self.set_profile(list(data["langs"]), list(data["vocab"]), data["logp"])
+        except Exception as e:
+            # everything is reported as the default language until trained
+            print(f"Language profile not loaded ({type(e).__name__}: {e}); run train_lang_id.py")
+            self.set_profile([self.default], [], np.zeros((1, 1)))
+
+    def ensure_loaded(self):
+        if self.loaded:
+            return
+        with self._lock:
+            if not self.loaded:
+                self.load()
+
+    def set_profile(self, langs: list[str], vocab: list[str], logp):
+        # row 0 is the unseen-trigram row, so vocabulary ids start at 1
+        self.index = {str(g): i for i, g in enumerate(vocab, 1)}
+        self.langs = [str(l) for l in langs]
+        self._default_col = self.langs.index(self.default) if self.default in self.langs else 0
+        self.logp = np.asarray(logp, dtype=np.float32)
+        self._word_scores = {}
+
+    def word_score(self, word: str) -> np.ndarray:
+        """Per-language log-likelihood of one word (cached)."""
+        vec = self._word_scores.get(word)
+        if vec is None:
+            get = self.index.get
+            vec = self.logp[[get(g, 0) for g in trigrams(word)]].sum(axis=0)
+            if len(self._word_scores) >= WORD_CACHE_SIZE:
+                self._word_scores = {}
+            self._word_scores[word] = vec
+        return vec
+
+    def scores(self, msg: str) -> np.ndarray | None:
+        """Per-language log-likelihood of `msg`, or None if it has no words."""
+        self.ensure_loaded()
+        vecs = [self.word_score(w) for w in words(msg)]
+        if not vecs:
+            return None
+        return vecs[0] if len(vecs) == 1 else np.add.reduce(vecs)
+
+    def detect(self, msg: str) -> str:
+        """Best-scoring language code, or the default when nothing stands out."""
+        totals = self.scores(msg)
+        if totals is None:
+            return self.default
+        best = int(totals.argmax())
+        if totals[best] - totals[self._default_col] < self.min_margin:
+            return self.default
+        return self.langs[best]
+
+    def detect_batch(self, messages: list[str]) -> list[str]:
+        """detect() for many messages, with one argmax over the stacked scores."""
+        self.ensure_loaded()
+        out = [self.default] * len(messages)
+        rows, scored = [], []
+        for i, msg in enumerate(messages):
+            totals = self.scores(msg)
+            if totals is not None:
+                rows.append(totals)
+                scored.append(i)
+        if rows:
+            totals = np.vstack(rows)
+            best = totals.argmax(axis=1)
+            margin = totals[np.arange(len(rows)), best] - totals[:, self._default_col]
+            for i, b, m in zip(scored, best, margin):
+                if m >= self.min_margin:
+                    out[i] = self.langs[b]
+        return out
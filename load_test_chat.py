@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Load test for the /chat endpoint.
+
+Fires a burst of concurrent chat requests at the async handler in app.py and
+at a copy of the original synchronous handler (fresh SessionLocal() + ILIKE
+query + blocking log append on Starlette's threadpool), both in-process via
+httpx's ASGI transport, and prints the throughput of each. The same messages
+are then sent through /chat/batch in gateway-sized bursts.
+
+    python load_test_chat.py [requests] [concurrency] [batch size]
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import app as chat_app
+from chat_log import ChatLogWriter
+from models import SessionLocal, Knowledge
+
+MESSAGES = [
+    "how to plant maize",
+    "my tomato leaves have brown spots",
+    "when should I harvest beans",
+    "how often should I water cabbage",
+    "what fertilizer is best for cassava",
+]
+
+
+def build_legacy_app(log_file: str) -> FastAPI:
+    """The old /chat: sync def, one DB session per message, blocking log append."""
+    legacy = FastAPI()
+
+    @legacy.post("/chat")
+    def chat(req: chat_app.ChatRequest):
+        msg = req.message.strip()
+        lang = chat_app.auto_lang(msg)
+        intent = chat_app.keyword_intent(msg)
+        db = SessionLocal()
+        try:
+            clean_q = chat_app.preprocess(msg)
+            row = db.query(Knowledge).filter(Knowledge.question.ilike(f"%{clean_q}%")).first()
+            if row is None:
+                keywords = clean_q.split()
+                best, best_score = None, 0
+                for kb in db.query(Knowledge).all():
+                    score = sum(1 for kw in keywords if kw in chat_app.preprocess(kb.question).split())
+                    if score > best_score:
+                        best, best_score = kb, score
+                row = best
+        finally:
+            db.close()
+        reply = row.answer if row else "fallback"
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": int(time.time()), "message": msg, "lang": lang,
+                                "reply": reply, "intent": intent}, ensure_ascii=False) + "\n")
+        return {"reply": reply, "intent": intent, "language": lang}
+
+    return legacy
+
+
+async def run_burst(asgi_app, total: int, concurrency: int) -> float:
+    """Send `total` POST /chat requests, `concurrency` at a time; return req/s."""
+    transport = httpx.ASGITransport(app=asgi_app)
+    sem = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def one(i):
+            async with sem:
+                r = await client.post("/chat", json={"message": MESSAGES[i % len(MESSAGES)], "language": "auto"})
+                r.raise_for_status()
+
+        await one(0)  # warm-up: index / model load
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+
+async def run_batches(asgi_app, total: int, batch_size: int) -> float:
+    """Send `total` messages as POST /chat/batch bursts of `batch_size`; return msg/s."""
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        start = time.perf_counter()
+        for offset in range(0, total, batch_size):
+            # distinct texts, so the response cache does not hide the work
+            body = [{"message": f"{MESSAGES[i % len(MESSAGES)]} {i}", "language": "auto"}
+                    for i in range(offset, min(total, offset + batch_size))]
+            r = await client.post("/chat/batch", json=body)
+            r.raise_for_status()
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    batch_size = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        chat_app.chat_log_writer = ChatLogWriter(os.path.join(tmp, "async_chat_logs.txt"))
+        # raw throughput: one client, so switch admission control off
+        chat_app.chat_limiter.rate, chat_app.chat_gate.max_inflight = 0, 0
+        legacy = build_legacy_app(os.path.join(tmp, "legacy_chat_logs.txt"))
+
+        print(f"\n⏱  /chat load test: {total} requests, concurrency {concurrency}")
+        legacy_rps = asyncio.run(run_burst(legacy, total, concurrency))
+        print(f"  legacy sync handler : {legacy_rps:8.1f} req/s")
+        async_rps = asyncio.run(run_burst(chat_app.app, total, concurrency))
+        print(f"  async handler       : {async_rps:8.1f} req/s")
+        print(f"  speed-up            : {async_rps / legacy_rps:8.1f}x")
+        batch_rps = asyncio.run(run_batches(chat_app.app, total, batch_size))
+        print(f"  /chat/batch ({batch_size:>4}) : {batch_rps:8.1f} msg/s")
+        chat_app.chat_log_writer.close()
+
+
+if __name__ == "__main__":
+    main()
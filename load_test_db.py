@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Mixed read/write load test for the SQLite engine profiles in models.py.
+
+Builds a throwaway copy of the Knowledge table, then runs reader threads
+(admin list/search queries and lookups by id) while a writer thread keeps
+committing admin edits, once with SQLite's defaults and once with the tuned
+profile (WAL, synchronous=NORMAL, mmap, cache, busy_timeout), and prints the
+read throughput and worst read latency of each.
+
+    python load_test_db.py [seconds] [readers] [rows]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Knowledge, make_engine
+
+
+def populate(url: str, rows: int):
+    engine = make_engine(url, profile="default")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.bulk_insert_mappings(Knowledge, [
+            {"question": f"how do I grow crop {i} in dry season", "answer": f"answer {i} " * 20,
+             "intent": "planting", "language": "english"}
+            for i in range(rows)
+        ])
+        db.commit()
+    engine.dispose()
+
+
+def run(url: str, profile: str, seconds: float, readers: int, rows: int) -> tuple[float, float, int]:
+    """Return (reads/s, worst read latency in ms, writes committed)."""
+    engine = make_engine(url, profile=profile)
+    Session = sessionmaker(bind=engine)
+    stop = time.monotonic() + seconds
+    reads, worst, writes, errors = [0], [0.0], [0], [0]
+    lock = threading.Lock()
+
+    def reader(seed):
+        rnd = random.Random(seed)
+        n, slowest = 0, 0.0
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    if n % 20 == 0:
+                        db.query(Knowledge).filter(Knowledge.question.ilike(f"%crop {rnd.randrange(rows)}%")).limit(50).all()
+                    else:
+                        db.get(Knowledge, rnd.randrange(1, rows))
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            slowest = max(slowest, time.perf_counter() - start)
+            n += 1
+        with lock:
+            reads[0] += n
+            worst[0] = max(worst[0], slowest)
+
+    def writer():
+        rnd = random.Random(0)
+        while time.monotonic() < stop:
+            try:
+                with Session() as db:
+                    # a burst of edits in one transaction, like an admin import
+                    for _ in range(50):
+                        row = db.get(Knowledge, rnd.randrange(1, rows))
+                        row.answer = f"edited {time.time()}"
+                    db.commit()
+                writes[0] += 1
+            except Exception:
+                errors[0] += 1
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    if errors[0]:
+        print(f"  ({profile}: {errors[0]} operations failed, e.g. 'database is locked')")
+    return reads[0] / seconds, worst[0] * 1000, writes[0]
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rows = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+
+    print(f"\n⏱  SQLite mixed load: {readers} readers + 1 writer, {seconds:g}s, {rows} rows")
+    for profile in ("default", "tuned"):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            populate(url, rows)
+            rps, worst_ms, writes = run(url, profile, seconds, readers, rows)
+            print(f"  {profile:8} {rps:9.0f} reads/s   worst read {worst_ms:7.1f} ms   {writes} write batches")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Import throughput: the old per-row importer vs bulk_import.py.
+
+Writes a synthetic Question/Answer CSV, then imports it into throwaway
+databases that already hold `existing` rows: the old way (an ILIKE SELECT
+and a db.add per row, one commit) on the first `legacy_rows` rows, and the
+streaming bulk importer on the whole file.
+
+    python load_test_import.py [rows] [legacy_rows] [existing]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+import knowledge_fts
+from bulk_import import bulk_import, import_csv, read_csv
+from models import Base, Knowledge, make_engine
+
+CROPS = "maize beans cassava tomato coffee banana rice sorghum cabbage onion".split()
+TOPICS = "plant water harvest store spray fertilize prune weed".split()
+
+
+def write_csv(path: str, rows: int):
+    rnd = random.Random(0)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["Question", "Answer"])
+        for i in range(rows):
+            # ~2% repeats, as in merged extension-service exports
+            n = rnd.randrange(i) if i and rnd.random() < 0.02 else i
+            w.writerow([f"How do I {TOPICS[n % len(TOPICS)]} {CROPS[n % len(CROPS)]} in field {n}?",
+                        "Follow the recommended practice for your region and season."])
+
+
+def fresh_db(tmp: str, name: str, existing: int):
+    engine = make_engine(f"sqlite:///{os.path.join(tmp, name)}")
+    Base.metadata.create_all(bind=engine)
+    knowledge_fts.ensure_fts(engine)
+    Session = sessionmaker(bind=engine)
+    rows = ({"question": f"existing question {i}", "answer": "existing answer"} for i in range(existing))
+    bulk_import(rows, session_factory=Session, verbose=False)
+    return engine, Session
+
+
+def legacy_import(path: str, Session, limit: int) -> float:
+    start = time.perf_counter()
+    with Session() as db:
+        for i, row in enumerate(read_csv(path)):
+            if i >= limit:
+                break
+            question = row["question"].lower().strip()
+            if db.query(Knowledge).filter(Knowledge.question.ilike(question)).first():
+                continue
+            db.add(Knowledge(question=question, answer=row["answer"].strip(), intent="general", language="english"))
+        db.commit()
+    return limit / (time.perf_counter() - start)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    legacy_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    existing = int(sys.argv[3]) if len(sys.argv) > 3 else 20_000
+
+    print(f"\n⏱  Import: {rows} CSV rows into a table of {existing}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "faq.csv")
+        write_csv(path, rows)
+
+        engine, Session = fresh_db(tmp, "legacy.db", existing)
+        rate = legacy_import(path, Session, min(legacy_rows, rows))
+        engine.dispose()
+        print(f"  per-row  {rate:9.0f} rows/s   (first {min(legacy_rows, rows)} rows; {rows / rate:7.1f}s projected)")
+
+        engine, Session = fresh_db(tmp, "bulk.db", existing)
+        stats = import_csv(path, session_factory=Session, verbose=False)
+        engine.dispose()
+        print(f"  bulk     {stats['rows_per_sec']:9.0f} rows/s   ({stats['seconds']:.1f}s, "
+              f"{stats['added']} added, {stats['duplicates']} duplicates)")
+
+
+if __name__ == "__main__":
+    main()
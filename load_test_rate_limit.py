@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Latency of a well-behaved client while another floods /chat.
+
+Starts the app under uvicorn twice, once with admission control off and
+once as configured (CHAT_RATE_PER_SEC / CHAT_BURST / CHAT_MAX_INFLIGHT).
+In each run one client sends a chat every 50 ms and records its latency,
+while a second client keeps `flood` requests in flight with distinct
+messages. The clients are told apart by X-Forwarded-For, which the server
+is started to trust.
+
+    python load_test_rate_limit.py [seconds] [flood]
+"""
+
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+PORT = 8765
+BASE_URL = f"http://127.0.0.1:{PORT}"
+MESSAGES = ["how to plant maize", "my tomato leaves have brown spots", "when should I harvest beans"]
+
+
+def start_server(tmp: str, admission: bool) -> subprocess.Popen:
+    env = dict(os.environ, WARMUP="eager", TRUST_FORWARDED_FOR="1", CHAT_LOG_DIR=os.path.join(tmp, "chat_logs"))
+    if not admission:
+        env.update(CHAT_RATE_PER_SEC="0", CHAT_MAX_INFLIGHT="0")
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(PORT), "--log-level", "error"],
+                              env=env, stdout=subprocess.DEVNULL)
+    for _ in range(300):
+        try:
+            if httpx.get(f"{BASE_URL}/ready").status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("server did not become ready")
+
+
+async def scenario(seconds: float, flood: int) -> dict:
+    limits = httpx.Limits(max_connections=flood + 10)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=60, limits=limits) as client:
+        stop = time.perf_counter() + seconds
+        latencies, good_codes, bad_codes = [], [], []
+
+        async def abuser(worker: int):
+            i = 0
+            while time.perf_counter() < stop:
+                r = await client.post("/chat", json={"message": f"{MESSAGES[i % 3]} {worker} {i}"},
+                                      headers={"X-Forwarded-For": "10.0.0.2"})
+                bad_codes.append(r.status_code)
+                i += 1
+
+        async def farmer():
+            i = 0
+            while time.perf_counter() < stop:
+                start = time.perf_counter()
+                r = await client.post("/chat", json={"message": MESSAGES[i % 3]},
+                                      headers={"X-Forwarded-For": "10.0.0.1"})
+                latencies.append((time.perf_counter() - start) * 1000)
+                good_codes.append(r.status_code)
+                i += 1
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(farmer(), *(abuser(w) for w in range(flood)))
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[max(0, int(len(latencies) * 0.99) - 1)],
+        "good_ok": good_codes.count(200) / len(good_codes),
+        "flood_served": bad_codes.count(200),
+        "flood_rejected": len(bad_codes) - bad_codes.count(200),
+    }
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    flood = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    print(f"\n🚦 {seconds:.0f}s, flood of {flood} concurrent requests vs one client every 50 ms")
+    print(f"{'admission':<12}{'p50 ms':>9}{'p99 ms':>9}{'good 200s':>11}{'flood served':>14}{'rejected':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, admission in (("off", False), ("on", True)):
+            server = start_server(tmp, admission)
+            try:
+                r = asyncio.run(scenario(seconds, flood))
+            finally:
+                server.terminate()
+                server.wait()
+            print(f"{label:<12}{r['p50']:>9.1f}{r['p99']:>9.1f}{r['good_ok']:>10.0%}"
+                  f"{r['flood_served']:>14}{r['flood_rejected']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Cold start: import-to-serving and import-to-first-reply time per WARMUP mode.
+
+Each run is a fresh interpreter that imports app, enters the lifespan through
+a TestClient and sends one chat, so it measures what a newly scaled-up
+worker pays before it can answer. Uses the configured DATABASE_URL.
+
+    python load_test_startup.py [runs]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+CHILD = """
+import time
+t0 = time.perf_counter()
+import json, app
+from fastapi.testclient import TestClient
+with TestClient(app.app) as client:
+    serving = time.perf_counter() - t0
+    client.post('/chat', json={'message': 'how do I plant maize', 'language': 'en'})
+    first_reply = time.perf_counter() - t0
+print(json.dumps({'import': app.APP_IMPORTED - app.IMPORT_STARTED, 'serving': serving, 'first_reply': first_reply}))
+"""
+
+
+def measure(mode: str) -> dict:
+    env = dict(os.environ, WARMUP=mode)
+    out = subprocess.run([sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    print(f"Cold start, best of {runs} runs (seconds since import started)\n")
+    print(f"{'WARMUP':<12}{'import':>9}{'serving':>10}{'first reply':>13}")
+    for mode in ("lazy", "background", "eager"):
+        start = time.perf_counter()
+        results = [measure(mode) for _ in range(runs)]
+        best = {k: min(r[k] for r in results) for k in results[0]}
+        print(f"{mode:<12}{best['import']:>9.2f}{best['serving']:>10.2f}{best['first_reply']:>13.2f}"
+              f"   ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
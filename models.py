@@ -1,13 +1,34 @@
 # models.py
-from sqlalchemy import Column, Integer, String, DateTime, create_engine
+from sqlalchemy import Column, Integer, String, DateTime, Float, create_engine, event
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.sql import func
 import os
+import threading
+
+from knowledge_fts import ensure_fts
+from knowledge_revision import ensure_revision
 
 # DATABASE LOCATION
-# ensure database folder exists
-os.makedirs("./database", exist_ok=True)
-DATABASE_URL = "sqlite:///./database/farming.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database/farming.db")
+
+# SQLITE ENGINE PROFILE
+#   DB_PROFILE=tuned   - WAL journal + the pragmas below on every new connection (default)
+#   DB_PROFILE=default - SQLite's own defaults (rollback journal, no mmap)
+# With WAL, readers keep reading the last committed state while an admin
+# write is in progress instead of waiting for its lock.
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned").lower()
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),        # safe with WAL, far fewer fsyncs
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),     # negative = KiB, i.e. 64 MiB
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+# connections kept open for reuse (+ overflow opened under bursts)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
 
 Base = declarative_base()
 
@@ -36,17 +57,85 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+# LOGIN TOKENS (shared by all workers; see token_store.py)
+class AuthToken(Base):
+    __tablename__ = "auth_tokens"
+
+    token_hash = Column(String, primary_key=True)           # SHA-256 of the token, never the token
+    username = Column(String, index=True, nullable=False)
+    role = Column(String, default="farmer")
+    expires = Column(Float, index=True, nullable=False)     # Unix time
+
+
 # DATABASE ENGINE + SESSION
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+def make_engine(url: str = DATABASE_URL, profile: str = DB_PROFILE):
+    """Create the engine; SQLite connections get the tuning pragmas for `profile`."""
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                             pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+
+    kwargs = {}
+    if ":memory:" not in url and url != "sqlite://":
+        kwargs = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_timeout": DB_POOL_TIMEOUT}
+    eng = create_engine(url, connect_args={"check_same_thread": False}, **kwargs)
+
+    if profile == "tuned":
+        @event.listens_for(eng, "connect")
+        def apply_pragmas(dbapi_conn, _record):
+            cur = dbapi_conn.cursor()
+            try:
+                for name, value in SQLITE_PRAGMAS.items():
+                    cur.execute(f"PRAGMA {name}={value}")
+            finally:
+                cur.close()
+    return eng
+
 
-SessionLocal = sessionmaker(
+engine = make_engine()
+
+
+# LAZY SCHEMA SETUP
+# Importing models does no I/O. The database folder, tables, full-text index
+# and revision counter are created by init_db(), which the first session of
+# the process (or the app's startup) triggers.
+_init_lock = threading.Lock()
+db_initialized = False
+
+
+def init_db():
+    """Create the SQLite folder, all tables, the FTS index and revision counter (once per process)."""
+    global db_initialized
+    if db_initialized:
+        return
+    with _init_lock:
+        if db_initialized:
+            return
+        path = engine.url.database if engine.dialect.name == "sqlite" else None
+        if path and path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        Base.metadata.create_all(bind=engine)
+        ensure_fts(engine)
+        ensure_revision(engine)
+        db_initialized = True
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        init_db()
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine
 )
 
-# CREATE ALL TABLES (idempotent)
-Base.metadata.create_all(bind=engine)
+
+def get_db():
+    """FastAPI dependency: one session per request, returned to the pool afterwards."""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,284 @@
+# near_duplicates.py
+"""
+Near-duplicate detection over Knowledge.question with MinHash + LSH.
+
+Each question becomes a set of word features (stop words dropped, light
+suffix stripping, so "best time for planting maize" and "What is the best
+time to plant maize?" share almost all of them). A MinHash signature of
+NUM_PERM values estimates the Jaccard similarity of two sets; LSH splits it
+into BANDS bands and only questions that agree on a whole band are ever
+compared, so the work grows with the number of rows rather than pairs.
+Candidates whose estimated similarity comes close to the threshold are
+checked on their exact feature sets. Each cluster is built around a keeper
+and holds only questions similar to that keeper; similarity is never
+chained, so "plant maize" ~ "plant beans" ~ "plant rice" stays apart.
+
+    python near_duplicates.py                     # list clusters
+    python near_duplicates.py --threshold 0.8
+    python near_duplicates.py --merge 12 40       # merge the clusters kept by entries 12 and 40
+"""
+import argparse
+import os
+import sys
+import time
+import zlib
+import numpy as np
+from sqlalchemy import func
+from models import Knowledge, SessionLocal
+from text_utils import STOP_WORDS, split_words, stem
+
+DEFAULT_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))
+NUM_PERM = 64
+BANDS = 16          # 16 bands of 4 rows: pairs above ~0.5 similarity usually collide
+BATCH_ROWS = 20000  # signatures are computed this many questions at a time
+# candidates whose MinHash estimate is this far below the threshold still get
+# the exact check (the estimate from 64 values is off by ~0.06)
+ESTIMATE_SLACK = 0.1
+
+# multiply-shift hashing: h(x) = (a * x + b mod 2**64) >> 32, one (a, b) per permutation
+_rng = np.random.default_rng(20240601)
+_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+
+# question words are not features, but questions that ask different things
+# ("when to plant beans" / "how to plant beans") are never near-duplicates
+QUESTION_KINDS = {"how": 1, "when": 2, "where": 3, "why": 4, "who": 5}
+
+
+# word -> feature hash (None for stop words), shared by every call
+_word_hashes: dict[str, int | None] = {}
+
+
+def features(question: str) -> set[int]:
+    """Hashed word features of a question (empty if it has no content words)."""
+    words = split_words((question or "").lower())
+    cache = _word_hashes
+    try:
+        f = {cache[w] for w in words}
+    except KeyError:
+        if len(cache) > 1_000_000:
+            cache.clear()
+        for w in words:
+            if w not in cache:
+                cache[w] = None if w in STOP_WORDS else zlib.crc32(stem(w).encode())
+        f = {cache[w] for w in words}
+    f.discard(None)
+    return f
+
+
+def question_kind(question: str) -> int:
+    """QUESTION_KINDS value of the first question word in `question`, 0 if none."""
+    for w in split_words((question or "").lower()):
+        if w in QUESTION_KINDS:
+            return QUESTION_KINDS[w]
+    return 0
+
+
+def _same_kind(a: int, b: int) -> bool:
+    return a == b or not a or not b
+
+
+def signatures(feature_sets: list[set[int]]) -> np.ndarray:
+    """MinHash signatures, one uint32 row of NUM_PERM values per non-empty set."""
+    lengths = np.fromiter((len(f) for f in feature_sets), dtype=np.int64, count=len(feature_sets))
+    flat = np.fromiter((h for f in feature_sets for h in f), dtype=np.uint64, count=int(lengths.sum()))
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    # one row per permutation keeps the reduceat segments contiguous
+    hashed = (_A[:, None] * flat[None, :] + _B[:, None]) >> _SHIFT
+    return np.minimum.reduceat(hashed, offsets, axis=1).T.astype(np.uint32)
+
+
+def _band_keys(sig: np.ndarray, band: int) -> np.ndarray:
+    width = NUM_PERM // BANDS
+    cols = sig[:, band * width:(band + 1) * width].astype(np.uint64)
+    key = cols[:, 0].copy()
+    for c in range(1, width):
+        key = key * np.uint64(1000003) ^ cols[:, c]
+    return key
+
+
+def _candidate_pairs(sig: np.ndarray, band: int) -> tuple[np.ndarray, np.ndarray]:
+    """Row pairs sharing an LSH bucket in `band`.
+
+    Each member is paired with its neighbour in the bucket and with the
+    bucket's first member, so a bucket of k rows costs under 2k checks
+    rather than k*(k-1)/2; the other bands recover most of the pairs this
+    skips.
+    """
+    keys = _band_keys(sig, band)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    same = sorted_keys[1:] == sorted_keys[:-1]
+    starts = np.flatnonzero(np.concatenate(([True], ~same)))
+    first = np.repeat(starts, np.diff(np.append(starts, len(order))))
+    pos = np.arange(len(order))
+    star = pos - first >= 2
+    a = np.concatenate((order[:-1][same], order[first[star]]))
+    b = np.concatenate((order[1:][same], order[pos[star]]))
+    return a, b
+
+
+def _jaccard(flat: np.ndarray, bounds: np.ndarray, a: int, b: int) -> float:
+    fa = set(flat[bounds[a]:bounds[a + 1]].tolist())
+    fb = set(flat[bounds[b]:bounds[b + 1]].tolist())
+    return len(fa & fb) / len(fa | fb)
+
+
+def find_clusters(rows, threshold: float = DEFAULT_THRESHOLD) -> list[list[int]]:
+    """Group (id, question[, priority]) rows into near-duplicate clusters of ids.
+
+    Every cluster starts with its keeper, the rest follow in ascending id
+    order, and each of them asks the same kind of question as the keeper
+    with an exact feature Jaccard similarity of at least `threshold` (they
+    need not be similar to each other).
+    Keepers are picked by priority (higher first, 0 if not given), then by
+    how many similar questions they have, then by the lower id. Returns
+    clusters of two or more ids, largest first.
+    """
+    ids, priority, kinds, batch, blocks, flat_blocks, lengths = [], [], [], [], [], [], []
+    for row in rows:
+        f = features(row[1])
+        if f:
+            ids.append(row[0])
+            priority.append(row[2] if len(row) > 2 else 0)
+            kinds.append(question_kind(row[1]))
+            batch.append(f)
+            lengths.append(len(f))
+            if len(batch) == BATCH_ROWS:
+                blocks.append(signatures(batch))
+                flat_blocks.append(np.fromiter((h for f in batch for h in f), dtype=np.uint32))
+                batch = []
+    if batch:
+        blocks.append(signatures(batch))
+        flat_blocks.append(np.fromiter((h for f in batch for h in f), dtype=np.uint32))
+    if len(ids) < 2:
+        return []
+    sig = np.vstack(blocks)
+    flat = np.concatenate(flat_blocks)
+    bounds = np.concatenate(([0], np.cumsum(lengths)))
+    del blocks, flat_blocks
+
+    # candidates are screened on the low byte of each MinHash value (b-bit
+    # MinHash): a quarter of the memory traffic, and unrelated values agree
+    # by chance only 1 time in 256. Only the survivors get the exact check.
+    low = sig.astype(np.uint8)
+    loose = max(threshold - ESTIMATE_SLACK, 0.0)
+    min_agree = (loose + (1 - loose) / 256) * NUM_PERM
+    checked: set[tuple[int, int]] = set()
+    neighbours: dict[int, list[int]] = {}
+    for band in range(BANDS):
+        pairs_a, pairs_b = _candidate_pairs(sig, band)
+        for i in range(0, len(pairs_a), 200_000):
+            a, b = pairs_a[i:i + 200_000], pairs_b[i:i + 200_000]
+            close = np.count_nonzero(np.take(low, a, axis=0) == np.take(low, b, axis=0), axis=1) >= min_agree
+            for x, y in zip(a[close].tolist(), b[close].tolist()):
+                pair = (x, y) if x < y else (y, x)
+                if pair in checked:
+                    continue
+                checked.add(pair)
+                if _same_kind(kinds[x], kinds[y]) and _jaccard(flat, bounds, x, y) >= threshold:
+                    neighbours.setdefault(x, []).append(y)
+                    neighbours.setdefault(y, []).append(x)
+
+    clusters, taken = [], set()
+    for i in sorted(neighbours, key=lambda i: (-priority[i], -len(neighbours[i]), ids[i])):
+        if i in taken:
+            continue
+        members = [j for j in neighbours[i] if j not in taken]
+        if members:
+            taken.add(i)
+            taken.update(members)
+            clusters.append([ids[i]] + sorted(ids[j] for j in members))
+    clusters.sort(key=lambda g: (-len(g), g[0]))
+    return clusters
+
+
+# --------------------
+# Database helpers (admin endpoint + CLI)
+# --------------------
+def load_clusters(db, threshold: float = DEFAULT_THRESHOLD, limit: int | None = None) -> list[list[dict]]:
+    """Near-duplicate clusters of Knowledge entries, the suggested keeper first.
+
+    The keeper is the entry with the longest answer that other questions are similar to.
+    """
+    rows = db.query(Knowledge.id, Knowledge.question, func.coalesce(func.length(Knowledge.answer), 0)).yield_per(10000)
+    clusters = find_clusters(rows, threshold)[:limit]
+    wanted = [kid for c in clusters for kid in c]
+    entries = {}
+    for i in range(0, len(wanted), 500):
+        for r in db.query(Knowledge).filter(Knowledge.id.in_(wanted[i:i + 500])):
+            entries[r.id] = {"id": r.id, "question": r.question, "answer": r.answer, "intent": r.intent,
+                             "crop": r.crop, "language": r.language, "topic": r.topic}
+    out = []
+    for c in clusters:
+        group = [entries[kid] for kid in c if kid in entries]
+        if len(group) > 1 and group[0]["id"] == c[0]:
+            out.append(group)
+    return out
+
+
+def similarity(a: str, b: str) -> float:
+    """Exact Jaccard similarity of two questions' word features (0 if they ask different things)."""
+    if not _same_kind(question_kind(a), question_kind(b)):
+        return 0.0
+    fa, fb = features(a), features(b)
+    return len(fa & fb) / len(fa | fb) if fa and fb else 0.0
+
+
+def merge_entries(db, keep: int, remove: list[int], threshold: float = DEFAULT_THRESHOLD) -> list[int]:
+    """Delete `remove`, first copying any labels `keep` lacks. Returns deleted ids.
+
+    Raises ValueError, deleting nothing, if one of them is not a near-duplicate
+    of `keep` (similarity below `threshold`).
+    """
+    keeper = db.get(Knowledge, keep)
+    if keeper is None:
+        raise KeyError(keep)
+    rows = [row for row in (db.get(Knowledge, kid) for kid in remove if kid != keep) if row is not None]
+    unlike = [row.id for row in rows if similarity(keeper.question, row.question) < threshold]
+    if unlike:
+        raise ValueError(f"not near-duplicates of entry {keep}: {unlike}")
+    removed = []
+    for row in rows:
+        for col in ("intent", "crop", "topic"):
+            if getattr(keeper, col) in (None, "", "general") and getattr(row, col) not in (None, ""):
+                setattr(keeper, col, getattr(row, col))
+        db.delete(row)
+        removed.append(row.id)
+    db.commit()
+    return removed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Find and merge near-duplicate knowledge questions.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="minimum estimated Jaccard similarity")
+    parser.add_argument("--limit", type=int, default=50, help="clusters to print")
+    parser.add_argument("--merge", type=int, nargs="+", metavar="ID", default=[],
+                        help="merge the clusters kept by these entries (the ids marked *) into their keeper")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        clusters = load_clusters(db, args.threshold)
+        print(f"✓ {len(clusters)} near-duplicate clusters "
+              f"({sum(len(c) for c in clusters)} entries) in {time.perf_counter() - start:.1f}s")
+        for group in clusters[:args.limit]:
+            print()
+            for i, e in enumerate(group):
+                print(f"  {'*' if i == 0 else ' '} [{e['id']}] {e['question']}")
+        if clusters and not args.merge:
+            print("\nReview the clusters, then merge the ones that really are duplicates with --merge ID (the * entry).")
+        chosen = {g[0]["id"]: g for g in clusters}
+        unknown = [kid for kid in args.merge if kid not in chosen]
+        if unknown:
+            print(f"\n✗ Not the keeper of any cluster: {unknown}")
+            return 1
+        for kid in args.merge:
+            removed = merge_entries(db, kid, [e["id"] for e in chosen[kid][1:]], args.threshold)
+            print(f"✓ Merged into [{kid}]: removed {removed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# rate_limit.py
+"""
+Admission control for the chat endpoints.
+
+- TokenBucketLimiter: one bucket per client (a logged-in user, otherwise an
+  IP address) that refills at `rate` requests/s up to `burst`; a request
+  that finds its bucket empty is answered 429 with a Retry-After header.
+- ConcurrencyGate: at most `max_inflight` chat requests are processed at
+  once; the next one is answered 503 immediately instead of queueing behind
+  them, so a flood cannot push up the latency of everyone else.
+- ChatAdmission: ASGI middleware applying both to the chat routes. It holds
+  a gate slot until the whole response (a full SSE stream too) is sent.
+
+Limits are per worker process; with WORKERS=N the host admits N times as much.
+"""
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets, the least recently seen key evicted beyond `max_keys`."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict = OrderedDict()  # key -> [tokens, monotonic time of last refill]
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key, cost: float = 1.0) -> float:
+        """Take `cost` tokens from `key`'s bucket: 0.0 if allowed, else seconds until it could be."""
+        if not self.enabled:
+            return 0.0
+        need = min(cost, self.burst)  # a request larger than the bucket waits for a full one...
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= need:
+                bucket[0] -= cost  # ...and is still charged in full, leaving the bucket in debt
+                self.allowed += 1
+                return 0.0
+            self.limited += 1
+            return (need - bucket[0]) / self.rate
+
+    def stats(self) -> dict:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "clients": len(self._buckets),
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+
+class ConcurrencyGate:
+    """Counts requests in progress; try_enter() fails instead of waiting when full."""
+
+    def __init__(self, max_inflight: int):
+        self.max_inflight = max_inflight
+        self._lock = threading.Lock()
+        self.inflight = 0
+        self.peak = 0
+        self.rejected = 0
+
+    def try_enter(self) -> bool:
+        with self._lock:
+            if 0 < self.max_inflight <= self.inflight:
+                self.rejected += 1
+                return False
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_inflight": self.max_inflight,
+            "inflight": self.inflight,
+            "peak": self.peak,
+            "rejected": self.rejected,
+        }
+
+
+class ChatAdmission:
+    """ASGI middleware: rate limit and concurrency cap for the routes in `routes`.
+
+    `routes` maps (method, path) to the tokens a request costs. A cost of 0
+    leaves the charge to the handler (e.g. one token per message of a batch,
+    known only once the body is parsed). `client_key(scope)` is an async
+    callable naming the bucket of a request; the key is left in
+    request.state.client_key for such handlers.
+    """
+
+    def __init__(self, app, limiter: TokenBucketLimiter, gate: ConcurrencyGate, routes, client_key):
+        self.app = app
+        self.limiter = limiter
+        self.gate = gate
+        self.routes = dict(routes)
+        self.client_key = client_key
+
+    async def __call__(self, scope, receive, send):
+        cost = self.routes.get((scope["method"], scope["path"])) if scope["type"] == "http" else None
+        if cost is None:
+            await self.app(scope, receive, send)
+            return
+        key = await self.client_key(scope)
+        scope.setdefault("state", {})["client_key"] = key
+        wait = self.limiter.acquire(key, cost) if cost else 0.0
+        if wait:
+            await reject(send, 429, "Too many requests, please slow down.", wait)
+            return
+        if not self.gate.try_enter():
+            await reject(send, 503, "Server busy, please try again shortly.", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gate.leave()
+
+
+async def reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
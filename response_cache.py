@@ -0,0 +1,73 @@
+# response_cache.py
+"""
+LRU + TTL cache for /chat replies.
+
+Farmers send the same short messages over and over ("how to plant maize",
+greetings, "thanks"); a hit skips intent detection, response generation and
+retrieval entirely. The cache is cleared whenever the knowledge base changes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from text_utils import preprocess
+
+
+def cache_key(msg: str, lang: str) -> tuple[str, str]:
+    """Normalized message + resolved language.
+
+    preprocess() drops every non-ASCII character, so non-Latin scripts are
+    only lower-cased and whitespace-collapsed to keep them distinct.
+    """
+    text = preprocess(msg) if msg.isascii() else msg.lower()
+    return " ".join(text.split()), lang
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
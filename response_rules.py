@@ -0,0 +1,146 @@
+# response_rules.py
+"""
+Declarative reply rules for /chat, loaded from response_rules.json.
+
+Each rule has a name, optional keywords, an optional intent it is limited to,
+a priority and per-language replies:
+
+    {"name": "weather_cold", "intent": "weather", "priority": 50,
+     "keywords": ["frost", "cold"], "replies": {"en": "...", "es": "..."}}
+
+Rules without keywords always apply (per-intent defaults). A rule with
+"action": "retrieve" answers from the knowledge base instead and falls
+through to the next rule when nothing scores high enough.
+
+All keywords are compiled into one KeywordMatcher keyed by rule name, so a
+message costs a pass over its words plus a sort of the few rules that fired,
+however many rules the file holds. The file is re-read when its mtime
+changes (checked at most every `check_interval` seconds).
+"""
+import json
+import os
+import threading
+import time
+from typing import Callable
+from text_utils import KeywordMatcher
+
+RULES_PATH = os.getenv("RESPONSE_RULES_PATH", "response_rules.json")
+# how often (seconds) to stat the rules file for changes; 0 checks every message
+CHECK_INTERVAL = float(os.getenv("RESPONSE_RULES_CHECK_SECONDS", "2"))
+
+ACTIONS = ("reply", "retrieve")
+
+
+class RuleSet:
+    """One compiled version of the rules file."""
+
+    def __init__(self, doc: dict):
+        self.default_language = doc.get("default_language", "en")
+        self.rules: list[dict] = []
+        self.by_name: dict[str, dict] = {}
+        keywords: dict[str, list[str]] = {}
+        for pos, raw in enumerate(doc.get("rules", [])):
+            rule = {
+                "name": raw["name"],
+                "intent": raw.get("intent"),
+                "action": raw.get("action", "reply"),
+                "replies": raw.get("replies", {}),
+                # higher priority first, file order breaks ties
+                "order": (-float(raw.get("priority", 0)), pos),
+            }
+            if rule["name"] in self.by_name:
+                raise ValueError(f"duplicate rule name: {rule['name']}")
+            if rule["action"] not in ACTIONS:
+                raise ValueError(f"rule {rule['name']}: unknown action {rule['action']!r}")
+            if rule["action"] == "reply" and self.default_language not in rule["replies"]:
+                raise ValueError(f"rule {rule['name']}: no '{self.default_language}' reply")
+            if raw.get("keywords"):
+                keywords[rule["name"]] = raw["keywords"]
+            self.rules.append(rule)
+            self.by_name[rule["name"]] = rule
+
+        self.matcher = KeywordMatcher(keywords)
+        # intents named by some rule; anything else is answered as "general"
+        self.intents = {r["intent"] for r in self.rules if r["intent"]}
+        # keyword-less rules are candidates for every message of their intent
+        self.always: dict[str | None, list[dict]] = {}
+        for r in self.rules:
+            if r["name"] not in keywords:
+                self.always.setdefault(r["intent"], []).append(r)
+
+    def candidates(self, msg: str, intent: str) -> list[dict]:
+        """Rules that apply to `msg` under `intent`, best first."""
+        if intent not in self.intents:
+            intent = "general"
+        fired = [self.by_name[name] for name in self.matcher.match(msg)]
+        out = [r for r in fired if r["intent"] in (None, intent)]
+        out += self.always.get(None, []) + self.always.get(intent, [])
+        out.sort(key=lambda r: r["order"])
+        return out
+
+
+class ResponseRules:
+    """Hot-reloading front end for a rules file."""
+
+    def __init__(self, path: str = RULES_PATH, check_interval: float = CHECK_INTERVAL,
+                 on_reload: Callable[[], None] | None = None):
+        self.path = path
+        self.check_interval = check_interval
+        self.on_reload = on_reload
+        self.ruleset: RuleSet | None = None
+        self.mtime = None
+        self.reloads = 0
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> RuleSet:
+        """(Re)read and compile the rules file; a broken file keeps the old rules."""
+        with self._lock:
+            mtime = None
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                with open(self.path, encoding="utf-8") as f:
+                    ruleset = RuleSet(json.load(f))
+            except Exception as e:
+                if self.ruleset is None:
+                    raise
+                print(f"Response rules reload error: {e}")
+                self.mtime = mtime  # retry once the file changes again
+                return self.ruleset
+            first = self.ruleset is None
+            self.ruleset, self.mtime = ruleset, mtime
+            if not first:
+                self.reloads += 1
+                print(f"✓ Reloaded {len(ruleset.rules)} response rules from {self.path}")
+                if self.on_reload:
+                    self.on_reload()
+            return ruleset
+
+    def current(self) -> RuleSet:
+        """The compiled rules, re-read first if the file has changed."""
+        if self.ruleset is None:
+            return self.load()
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            try:
+                changed = os.stat(self.path).st_mtime_ns != self.mtime
+            except OSError:
+                changed = False
+            if changed:
+                return self.load()
+        return self.ruleset
+
+    def respond(self, msg: str, intent: str, lang: str,
+                retrieve: Callable[[str], str | None]) -> str | None:
+        """Reply from the best matching rule, or None if no rule applies."""
+        ruleset = self.current()
+        for rule in ruleset.candidates(msg, intent):
+            if rule["action"] == "retrieve":
+                answer = retrieve(msg)
+                if answer:
+                    return answer
+                continue
+            replies = rule["replies"]
+            return replies.get(lang, replies[ruleset.default_language])
+        return None
@@ -1,36 +1,23 @@
 #!/usr/bin/env python3
 """
 Main entry point for the AI Farming Chatbot application.
-Initializes the database and starts the FastAPI server.
-"""
+Starts the FastAPI server; the app creates the database, the default admin
+and the chat indexes in its startup lifespan (see WARMUP in app.py).
 
-import sys
+WORKERS=4 python run.py starts four worker processes; login tokens are
+shared between them through TOKEN_STORE (see token_store.py).
+"""
 import os
 
-# Ensure database directory exists
-os.makedirs("./database", exist_ok=True)
-
-# Initialize database
-try:
-    from models import Base, engine, SessionLocal
-    print("✓ Database initialized")
-except Exception as e:
-    print(f"✗ Database initialization failed: {e}")
-    sys.exit(1)
-
-# Ensure default admin exists
-try:
-    from app import ensure_default_admin
-    ensure_default_admin()
-    print("✓ Admin user verified")
-except Exception as e:
-    print(f"✗ Admin creation failed: {e}")
-    sys.exit(1)
+WORKERS = int(os.getenv("WORKERS", "1"))
 
 # Start the server
 if __name__ == "__main__":
     import uvicorn
-    print("\n🚀 Starting AI Farming Chatbot...")
+    from token_store import TOKEN_STORE
+    print(f"\n🚀 Starting AI Farming Chatbot ({WORKERS} worker{'s' if WORKERS > 1 else ''})...")
+    if WORKERS > 1 and TOKEN_STORE == "memory":
+        print("⚠️  TOKEN_STORE=memory: a login only works on the worker that issued it")
     print("\n📍 Application URLs:")
     print("   Home: http://localhost:8000")
     print("   Signup: http://localhost:8000/signup")
@@ -38,4 +25,4 @@ if __name__ == "__main__":
     print("   Chat: http://localhost:8000/chat")
     print("   Admin: http://localhost:8000/admin (login: admin/admin123)")
     print("\n✓ Server running. Press Ctrl+C to stop.\n")
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=False)
+    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=False, workers=WORKERS)
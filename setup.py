@@ -32,7 +32,7 @@ def main():
     
     # Step 2: Initialize database
     if not run_command(
-        f"{sys.executable} -c \"from models import Base, engine; Base.metadata.create_all(bind=engine); print('✓ Database initialized')\"",
+        f"{sys.executable} -c \"from models import init_db; init_db(); print('✓ Database initialized')\"",
         "Step 2: Initializing database..."
     ):
         print("✗ Failed to initialize database")
@@ -41,8 +41,8 @@ def main():
     # Step 3: Import dataset
     if os.path.exists("a sample_Farming_FAQ_Assistant_Dataset.csv"):
         if not run_command(
-            f"{sys.executable} import_dataset.py",
-            "Step 3: Importing farming dataset..."
+            f"{sys.executable} import_knowledge.py",
+            "Step 3: Importing farming datasets..."
         ):
             print("⚠ Failed to import dataset (non-critical)")
     else:
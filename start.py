@@ -5,6 +5,7 @@
 This script provides an interactive setup experience.
 """
 
+import asyncio
 import os
 import sys
 import subprocess
@@ -59,8 +60,8 @@ def initialize_database():
     print("\n🗄️  Initializing database...")
     
     try:
-        from models import Base, engine
-        Base.metadata.create_all(bind=engine)
+        from models import init_db
+        init_db()
         print("   ✓ Database created/verified")
         return True
     except Exception as e:
@@ -96,15 +97,16 @@ def import_dataset():
     """Optionally import dataset."""
     print("\n📊 Checking for dataset...")
     
-    if not os.path.exists("a sample_Farming_FAQ_Assistant_Dataset.csv"):
+    from import_knowledge import DATASETS, import_files
+    found = [p for p in DATASETS if os.path.exists(p)]
+    if not found:
         print("   ℹ Dataset file not found (optional)")
         return True
     
-    print("   Found dataset. Importing...")
+    print(f"   Found {len(found)} dataset(s). Importing...")
     
     try:
-        from import_dataset import import_dataset
-        return import_dataset()
+        return import_files(found)
     except Exception as e:
         print(f"   ⚠ Dataset import failed (non-critical): {e}")
         return True
@@ -141,7 +143,7 @@ def run_diagnostics():
     try:
         from app import chat, detect_intent, ChatRequest
         req = ChatRequest(message="test", language="en")
-        response = chat(req=req)
+        response = asyncio.run(chat(req=req))
         if "reply" in response:
             print("   ✓ Chat system ready")
             tests_passed += 1
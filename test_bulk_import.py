@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Checks for the streaming bulk importer (bulk_import.py).
+Runs without a server: python test_bulk_import.py
+"""
+
+import csv
+import os
+import tempfile
+
+from sqlalchemy.orm import sessionmaker
+
+import bulk_import as bi
+import knowledge_fts
+import knowledge_revision
+from bulk_import import bulk_import, detect_schema, import_csv, normalize_question, read_knowledge_file
+from import_knowledge import import_files
+from models import Base, Knowledge, make_engine
+
+
+def make_db(tmp):
+    engine = make_engine(f"sqlite:///{os.path.join(tmp, 'import.db')}")
+    Base.metadata.create_all(bind=engine)
+    knowledge_fts.ensure_fts(engine)
+    knowledge_revision.ensure_revision(engine)
+    return engine, sessionmaker(bind=engine)
+
+
+def test_dedupes_against_table_and_file():
+    assert normalize_question("  How to  plant Maize? ") == "how to plant maize"
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_db(tmp)
+        with Session() as db:
+            db.add(Knowledge(question="how to plant maize?", answer="At the start of the rains."))
+            db.commit()
+
+        path = os.path.join(tmp, "faq.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["Question", "Answer", "Crop"])
+            w.writerow(["How to plant maize", "duplicate of the table", "maize"])
+            w.writerow(["When to harvest beans?", "When pods are dry.", "beans"])
+            w.writerow(["when to  harvest beans", "duplicate within the file", ""])
+            w.writerow(["", "no question", ""])
+        stats = import_csv(path, session_factory=Session, verbose=False)
+
+        assert (stats["read"], stats["added"], stats["duplicates"], stats["skipped"]) == (4, 1, 2, 1), stats
+        with Session() as db:
+            row = db.query(Knowledge).filter_by(question="when to harvest beans?").one()
+            assert (row.crop, row.intent, row.language) == ("beans", "general", "english")
+        engine.dispose()
+    print("  ✓ Duplicates skipped against the table and within the file")
+
+
+def test_chunked_import_keeps_fts_in_sync():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_db(tmp)
+        rows = ({"question": f"question {i} about cassava", "answer": f"answer {i}"} for i in range(250))
+        stats = bulk_import(rows, session_factory=Session, chunk_size=40, verbose=False)
+        assert stats["added"] == 250 and stats["rows_per_sec"] > 0
+
+        with Session() as db:
+            assert db.query(Knowledge).count() == 250
+            assert len(knowledge_fts.search(db, "cassava", limit=1000)) == 250
+            revision = knowledge_revision.current(db)
+            assert revision > 0
+            # triggers are back after the import
+            db.add(Knowledge(question="yam storage", answer="Keep dry."))
+            db.commit()
+            assert knowledge_fts.search(db, "yam")[0][2] == "Keep dry."
+            assert knowledge_revision.current(db) == revision + 1
+        knowledge_fts.integrity_check(engine)
+        engine.dispose()
+    print("  ✓ Chunked import commits every row, rebuilds the FTS index and bumps the revision")
+
+
+def test_killed_import_is_repaired_on_next_start():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_db(tmp)
+        with Session() as db:
+            revision = knowledge_revision.current(db)
+
+        def killed(rows):
+            yield from rows
+            raise SystemExit("killed")   # stands in for a kill: the triggers stay dropped
+
+        rows = ({"question": f"question {i} about sorghum", "answer": f"answer {i}"} for i in range(100))
+        original_fts, original_rev = knowledge_fts.resume_triggers, knowledge_revision.resume_triggers
+        knowledge_fts.resume_triggers = knowledge_revision.resume_triggers = lambda engine: None
+        try:
+            bulk_import(killed(rows), session_factory=Session, chunk_size=40, verbose=False)
+        except SystemExit:
+            pass
+        finally:
+            knowledge_fts.resume_triggers, knowledge_revision.resume_triggers = original_fts, original_rev
+        with Session() as db:
+            assert db.query(Knowledge).count() == 80       # two chunks committed
+            assert len(knowledge_fts.search(db, "sorghum", limit=200)) < 80     # FTS is stale
+
+        knowledge_fts.ensure_fts(engine)            # what init_db does on the next start
+        knowledge_revision.ensure_revision(engine)
+        with Session() as db:
+            assert len(knowledge_fts.search(db, "sorghum", limit=200)) == 80
+            db.add(Knowledge(question="how to dry sorghum", answer="In the sun."))
+            db.commit()
+            assert knowledge_fts.search(db, "dry sorghum", require_all=True)[0][1] == "how to dry sorghum"
+            latest, kids = knowledge_revision.changes_since(db, revision)
+            assert kids is None and latest > revision     # the other workers reload everything
+        engine.dispose()
+    print("  ✓ An import killed with the triggers dropped is repaired on the next start")
+
+
+def test_detects_all_dataset_layouts():
+    assert detect_schema(["Question", "Answer"]) == "faq"
+    assert detect_schema(["question", "answer", "intent", "crop", "language", "topic"]) == "labelled"
+    records = list(read_knowledge_file("agriculture_ai_dataset.csv", workers=1))
+    labelled = [r for r in records if r["question"] == "how to rear chickens" and r["intent"] == "animal_rearing"]
+    assert labelled and labelled[0]["topic"] == "livestock"
+    # bilingual rows give an English and a Luganda entry with the same labels
+    lg = [r for r in records if r["question"] == "nsimba ntya bijanjaalo"]
+    assert lg and (lg[0]["language"], lg[0]["crop"], lg[0]["intent"]) == ("luganda", "beans", "planting")
+    cow = [r for r in records if r["question"] == "cow diseases"]
+    assert cow and (cow[0]["crop"], cow[0]["language"]) == ("cow", "english")
+    print(f"  ✓ FAQ, labelled and bilingual rows parsed ({len(records)} records)")
+
+
+def test_upsert_fills_labels_and_parallel_parse_matches():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_db(tmp)
+        with Session() as db:
+            db.add(Knowledge(question="how to plant maize", answer="old answer", intent="general", language="english"))
+            db.commit()
+
+        path = os.path.join(tmp, "labelled.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(["question", "answer", "intent", "crop", "language", "topic"])
+            w.writerow(["How to plant maize?", "Plant at the start of the rains.", "planting", "Maize", "", ""])
+            for i in range(300):
+                w.writerow([f"question {i}", f"line one\nline \"two\" of {i}", "general", "", "english", ""])
+
+        serial = list(read_knowledge_file(path, workers=1))
+        min_bytes, bi.POOL_MIN_BYTES = bi.POOL_MIN_BYTES, 0
+        try:
+            parallel = list(read_knowledge_file(path, workers=2, block_rows=50))
+        finally:
+            bi.POOL_MIN_BYTES = min_bytes
+        assert serial == parallel and len(serial) == 301
+
+        stats = bulk_import(serial, session_factory=Session, update=True, verbose=False)
+        assert (stats["added"], stats["updated"]) == (300, 1), stats
+        with Session() as db:
+            row = db.query(Knowledge).filter_by(question="how to plant maize").one()
+            assert (row.answer, row.intent, row.crop, row.language) == (
+                "Plant at the start of the rains.", "planting", "maize", "english")
+        # a second run changes nothing
+        stats = bulk_import(serial, session_factory=Session, update=True, verbose=False)
+        assert (stats["added"], stats["updated"], stats["duplicates"]) == (0, 0, 301), stats
+        engine.dispose()
+    print("  ✓ Upsert on normalized question keeps labels; pool parse matches serial")
+
+
+def test_reimporting_files_with_a_shared_question_changes_nothing():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_db(tmp)
+        paths = []
+        for name, answer in (("first.csv", "Answer from the first file."), ("second.csv", "Answer from the second.")):
+            paths.append(os.path.join(tmp, name))
+            with open(paths[-1], "w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(["Question", "Answer"])
+                w.writerow(["How do I store beans?", answer])
+                w.writerow([f"Question only in {name}", "Some answer."])
+
+        assert import_files(paths, workers=1, session_factory=Session, verbose=False)
+        with Session() as db:
+            revision = knowledge_revision.current(db)
+        assert import_files(paths, workers=1, session_factory=Session, verbose=False)
+        with Session() as db:
+            assert knowledge_revision.current(db) == revision   # the second run wrote nothing
+            assert db.query(Knowledge).count() == 3
+            row = db.query(Knowledge).filter_by(question="how do i store beans?").one()
+            assert row.answer == "Answer from the first file."
+        engine.dispose()
+    print("  ✓ Re-running a multi-file import is a no-op; the first file wins")
+
+
+if __name__ == "__main__":
+    print("\n📥 Testing bulk import...")
+    test_dedupes_against_table_and_file()
+    test_chunked_import_keeps_fts_in_sync()
+    test_killed_import_is_repaired_on_next_start()
+    test_detects_all_dataset_layouts()
+    test_upsert_fills_labels_and_parallel_parse_matches()
+    test_reimporting_files_with_a_shared_question_changes_nothing()
+    print("\n🎉 All bulk import checks passed.")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Checks for the chat log storage helpers.
+Runs without a server: python test_chat_log.py
+"""
+
+import csv
+import io
+import json
+import os
+import tempfile
+
+import chat_log
+from chat_log import ChatLogStore, ChatLogWriter, iter_csv, iter_records, tail_lines
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(ln) for ln in f]
+
+
+def test_writer_batches_and_flushes_on_close():
+    """Records queued by /chat all reach the file, in order, once closed."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chat_logs.txt")
+        writer = ChatLogWriter(path, max_batch=10, flush_interval=5.0, durability="fsync")
+        for i in range(25):
+            writer.write({"ts": i, "message": f"msg {i}", "lang": "en", "reply": "ok", "intent": "general"})
+        writer.close()
+
+        rows = read_lines(path)
+        assert [r["ts"] for r in rows] == list(range(25))
+        assert writer.written == 25 and writer.batches >= 3
+        writer.write({"ts": 99})  # ignored after close
+        assert len(read_lines(path)) == 25
+    print("  ✓ Batched writer flushes everything on close")
+
+
+def test_writer_write_many_keeps_order():
+    """A /chat/batch burst is queued as one item and written in order."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chat_logs.txt")
+        writer = ChatLogWriter(path, max_batch=1000, flush_interval=5.0)
+        writer.write({"ts": 0})
+        writer.write_many([{"ts": i} for i in range(1, 301)])
+        writer.write({"ts": 301})
+        writer.close()
+        assert [r["ts"] for r in read_lines(path)] == list(range(302))
+        assert writer.written == 302
+    print("  ✓ write_many() appends a whole burst in order")
+
+
+def test_writer_rejects_unknown_durability():
+    try:
+        ChatLogWriter("unused.txt", durability="sometimes")
+    except ValueError:
+        print("  ✓ Unknown durability mode rejected")
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_tail_lines_reads_backwards():
+    """Only the last `limit` lines come back, across block boundaries."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chat_logs.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(1000):
+                f.write(json.dumps({"ts": i, "message": "é" * (i % 7)}, ensure_ascii=False) + "\n")
+
+        for block in (16, 100, 64 * 1024):
+            tail = tail_lines(path, 5, block_size=block)
+            assert [json.loads(ln)["ts"] for ln in tail] == [995, 996, 997, 998, 999]
+        assert len(tail_lines(path, 5000)) == 1000
+        assert tail_lines(path, 0) == []
+    print("  ✓ Tail reader returns the last lines only")
+
+
+def test_csv_export_filters_and_chunks():
+    """The export stream honours since/until and emits CSV in chunks."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chat_logs.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(100):
+                f.write(json.dumps({"ts": 1000 + i, "message": f"hi, {i}", "lang": "en", "reply": "ok"}) + "\n")
+            f.write("not json\n")
+
+        chunks = list(iter_csv(iter_records(path, since=1010, until=1039), chunk_rows=7))
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        assert rows[0] == ["timestamp", "message", "language", "reply"]
+        assert [int(r[0]) for r in rows[1:]] == list(range(1010, 1040))
+        assert rows[1][1] == "hi, 10"
+        assert len(chunks) == 5
+    print("  ✓ CSV export streams filtered rows in chunks")
+
+
+DAY = 86400
+START = 1_700_000_000 - 1_700_000_000 % DAY  # midnight UTC
+
+
+def make_store(tmp):
+    """Three days of chats, one every 10 minutes, alternating lang and intent."""
+    store = ChatLogStore(os.path.join(tmp, "chat_logs"))
+    records = [
+        {"ts": START + i * 600, "message": f"m{i}", "lang": "lg" if i % 2 else "en",
+         "intent": "disease" if i % 3 == 0 else "general", "reply": "ok"}
+        for i in range(3 * 144)
+    ]
+    for i in range(0, len(records), 20):
+        store.append_batch(records[i:i + 20])
+    store.close()
+    return store, records
+
+
+def test_store_segments_and_range_queries():
+    """Records split into daily segments; range + filter queries are exact."""
+    old_stride = chat_log.INDEX_STRIDE_BYTES
+    chat_log.INDEX_STRIDE_BYTES = 512  # force several index entries per day
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store, records = make_store(tmp)
+            assert len(store.segments()) == 3
+            with open(store.index_path(store.segments()[1][0])) as f:
+                assert len(f.readlines()) > 1
+
+            since, until = START + DAY + 3600, START + DAY + 5 * 3600
+            got = list(store.iter_records(since, until, lang="lg", intent="disease"))
+            want = [r for r in records if since <= r["ts"] <= until and r["lang"] == "lg" and r["intent"] == "disease"]
+            assert got == want and got
+
+            assert store.latest(5) == records[-5:]
+            assert store.latest(200) == records[-200:]  # spans two segments
+            assert store.latest(3, lang="en", until=START + DAY) == [r for r in records if r["lang"] == "en" and r["ts"] <= START + DAY][-3:]
+
+            assert store.compress(older_than_days=0)
+            assert all(p.endswith(".gz") for _, p in store.segments())
+            assert list(store.iter_records(since, until, lang="lg", intent="disease")) == want
+            assert store.latest(200) == records[-200:]
+    finally:
+        chat_log.INDEX_STRIDE_BYTES = old_stride
+    print("  ✓ Segmented store answers range / lang / intent queries")
+
+
+def test_store_migrates_legacy_file():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, "chat_logs.txt")
+        with open(legacy, "w", encoding="utf-8") as f:
+            for i in range(50):
+                f.write(json.dumps({"ts": START + i * 3600, "message": f"m{i}"}) + "\n")
+        store = ChatLogStore(os.path.join(tmp, "chat_logs"))
+        assert store.migrate(legacy) == 50
+        assert len(store.segments()) == 3
+        assert [r["message"] for r in store.iter_records()] == [f"m{i}" for i in range(50)]
+    print("  ✓ Legacy chat_logs.txt migrates into segments")
+
+
+if __name__ == "__main__":
+    print("\n📝 Testing chat log storage...")
+    test_writer_batches_and_flushes_on_close()
+    test_writer_write_many_keeps_order()
+    test_writer_rejects_unknown_durability()
+    test_tail_lines_reads_backwards()
+    test_csv_export_filters_and_chunks()
+    test_store_segments_and_range_queries()
+    test_store_migrates_legacy_file()
+    print("\n🎉 All chat log checks passed.")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Checks for the streaming chat endpoints (/chat/stream SSE and /chat/ws).
+Runs without a server: python test_chat_stream.py
+"""
+
+import json
+
+import conftest  # noqa: F401 - throwaway database and chat log directory
+import app
+from fastapi.testclient import TestClient
+
+
+def make_client():
+    return TestClient(app.app)
+
+
+def test_reply_chunks_round_trip():
+    reply = "Most crops want about 1-2 inches of water a week, but the key is watering deep not daily."
+    chunks = app.reply_chunks(reply, size=16)
+    assert "".join(chunks) == reply and len(chunks) > 3
+    assert all(c.endswith(" ") for c in chunks[:-1])  # split at word boundaries
+    assert app.reply_chunks("") == []
+    print("  ✓ Replies split into word-aligned chunks")
+
+
+def test_sse_sends_meta_then_chunks():
+    client = make_client()
+    r = client.post("/chat/stream", json={"message": "bonjour", "language": "auto"})
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = [json.loads(line[6:]) for line in r.text.splitlines() if line.startswith("data: ")]
+    assert events[0] == {"type": "meta", "intent": "general", "language": "fr"}
+    assert events[-1]["type"] == "done"
+    text = "".join(e["text"] for e in events if e["type"] == "chunk")
+    assert text == app.build_reply("bonjour", "auto")["reply"]
+    print("  ✓ SSE stream: meta, chunks, done")
+
+
+def test_websocket_serves_many_messages():
+    client = make_client()
+    with client.websocket_connect("/chat/ws") as ws:
+        for msg in ["hi", "how to plant maize", ""]:
+            ws.send_json({"message": msg, "language": "auto"})
+            events = [ws.receive_json()]
+            while events[-1]["type"] not in ("done", "error"):
+                events.append(ws.receive_json())
+            if not msg:
+                assert events == [{"type": "error", "detail": "Please send a message."}]
+                continue
+            assert events[0]["type"] == "meta"
+            text = "".join(e.get("text", "") for e in events)
+            assert text == app.build_reply(msg, "auto")["reply"]
+    print("  ✓ One WebSocket carries several chats")
+
+
+if __name__ == "__main__":
+    print("\n📡 Testing streaming chat...")
+    test_reply_chunks_round_trip()
+    test_sse_sends_meta_then_chunks()
+    test_websocket_serves_many_messages()
+    print("\n🎉 All streaming chat checks passed.")
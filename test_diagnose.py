@@ -4,6 +4,7 @@ Quick test script to verify all components are working.
 Run this to diagnose any issues with the chatbot.
 """
 
+import asyncio
 import sys
 import os
 import traceback
@@ -87,7 +88,7 @@ def test_chat():
         
         # Test chat function
         request = ChatRequest(message="test question", language="en")
-        response = chat(req=request)
+        response = asyncio.run(chat(req=request))
         if "reply" in response:
             print(f"  ✓ Chat endpoint works")
             print(f"  ✓ Response: {response['reply'][:50]}...")
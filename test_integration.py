@@ -2,7 +2,6 @@
 """Simple test to verify frontend-backend connections."""
 
 import requests
-import json
 import time
 
 BASE_URL = "http://localhost:8000"
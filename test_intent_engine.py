@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Checks for the intent classifier (intent_engine.py).
+Runs without a server: python test_intent_engine.py
+"""
+
+import csv
+
+import numpy as np
+
+from intent_engine import IntentEngine, keyword_intent
+
+
+class FixedModel:
+    """Stands in for the sklearn pickles: the same probabilities for every message."""
+
+    classes_ = np.array(["disease", "fertilizer", "harvest", "irrigation", "weather"])
+
+    def __init__(self, proba):
+        self.proba = np.asarray([proba])
+
+    def transform(self, messages):
+        return messages
+
+    def predict_proba(self, X):
+        return np.repeat(self.proba, len(X), axis=0)
+
+
+def test_keywords_win_over_the_model():
+    engine = IntentEngine(min_lift=1.05, min_margin=0.1)
+    sure = FixedModel([0.05, 0.05, 0.6, 0.15, 0.15])
+    assert engine._try_sklearn(sure, sure) and abs(engine.min_confidence - 0.21) < 1e-9
+    engine.mode = "sklearn"
+    assert engine.predict("pests on my beans") == keyword_intent("pests on my beans") == "disease"
+    assert engine.predict("how to plant maize") == "harvest"   # no rule keyword: the model decides
+    print("  ✓ Rule keywords win; the model labels messages without one")
+
+
+def test_model_needs_a_margin():
+    engine = IntentEngine(min_lift=1.05, min_margin=0.1)
+    close = FixedModel([0.12, 0.12, 0.28, 0.24, 0.24])        # above chance, but 0.04 ahead
+    engine._try_sklearn(close, close)
+    engine.mode = "sklearn"
+    assert engine.predict("how to plant maize") == "general"
+
+    unsure = FixedModel([0.2, 0.2, 0.2, 0.2, 0.2])            # no better than chance
+    engine._try_sklearn(unsure, unsure)
+    assert engine.predict("how to plant maize") == "general"
+    print("  ✓ Guesses close to the runner-up are not used")
+
+
+def test_shipped_model_keeps_keyword_intents():
+    engine = IntentEngine()
+    assert engine.load() == "sklearn"
+    expected = {
+        "my tomatoes have pests": "disease",
+        "what fertilizer for cassava": "fertilizer",
+        "what is the weather today": "weather",
+        "how much water for tomatoes": "irrigation",
+    }
+    for msg, intent in expected.items():
+        assert engine.predict(msg) == intent, msg
+    for msg, wrong in {"how do I control fall armyworm": "fertilizer", "how to plant maize": "harvest"}.items():
+        assert engine.predict(msg) != wrong, msg
+
+    with open("agriculture_ai_dataset.csv", encoding="utf-8") as f:
+        questions = [row["question"] for row in csv.DictReader(f)]
+    predicted = engine.predict_batch(questions)
+    for question, label in zip(questions, predicted):
+        if keyword_intent(question) != "general":
+            assert label == keyword_intent(question), question
+    print(f"  ✓ The shipped model keeps the keyword intents of {len(questions)} dataset questions")
+
+
+if __name__ == "__main__":
+    print("\n🏷  Testing intent engine...")
+    test_keywords_win_over_the_model()
+    test_model_needs_a_margin()
+    test_shipped_model_keeps_keyword_intents()
+    print("\n🎉 All intent engine checks passed.")
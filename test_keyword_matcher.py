@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Checks for the compiled keyword matcher behind the response and intent rules.
+Runs without a server: python test_keyword_matcher.py
+"""
+
+from text_utils import KeywordMatcher
+
+RULES = {
+    "greeting": ["hi", "hello", "good morning", "مرحبا"],
+    "no": ["no", "no gracias"],
+    "yes": ["ok", "yes"],
+    "question": ["how", "which"],
+    "irrigation_amount": ["how much"],
+    "pest": ["pest"],
+}
+
+
+def test_word_boundaries():
+    """Short keywords no longer fire inside longer words."""
+    m = KeywordMatcher(RULES)
+    assert m.match("I know which one") == {"question"}   # no "no", no "hi"
+    assert m.match("okra and yesterday") == set()
+    assert m.match("No, thanks") == {"no"}
+    print("  ✓ Substring false positives are gone")
+
+
+def test_all_categories_in_one_pass():
+    m = KeywordMatcher(RULES)
+    assert m.match("Hello, how much pesticide?") == {"greeting", "question", "irrigation_amount", "pest"}
+    assert m.match("no gracias") == {"no"}
+    assert m.match("مرحبا") == {"greeting"}
+    print("  ✓ Every matching category is reported")
+
+
+if __name__ == "__main__":
+    print("\n🔤 Testing keyword matcher...")
+    test_word_boundaries()
+    test_all_categories_in_one_pass()
+    print("\n🎉 All keyword matcher checks passed.")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Checks for the FTS5 knowledge index (knowledge_fts.py).
+Runs without a server: python test_knowledge_fts.py
+"""
+
+import os
+import tempfile
+
+from sqlalchemy.orm import sessionmaker
+
+import knowledge_fts
+from models import Base, Knowledge, make_engine
+
+
+def make_db(tmp):
+    engine = make_engine(f"sqlite:///{os.path.join(tmp, 'fts.db')}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def test_triggers_keep_index_in_sync():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_db(tmp)
+        with sessionmaker(bind=engine)() as db:
+            # rows that exist before the index is created are picked up by the rebuild
+            db.add(Knowledge(question="How to plant maize?", answer="Plant at the start of the rains.", crop="maize"))
+            db.commit()
+            assert knowledge_fts.ensure_fts(engine)
+            beans = Knowledge(question="When to harvest beans?", answer="When pods are dry.", crop="beans")
+            db.add(beans)
+            db.commit()
+
+            assert [h[1] for h in knowledge_fts.search(db, "maize")] == ["How to plant maize?"]
+            assert [h[1] for h in knowledge_fts.search(db, "beans")] == ["When to harvest beans?"]
+
+            beans.question = "When to harvest cowpeas?"
+            db.commit()
+            assert knowledge_fts.search(db, "beans", limit=5)[0][1] == "When to harvest cowpeas?"  # crop column
+            assert [h[1] for h in knowledge_fts.search(db, "cowpeas")] == ["When to harvest cowpeas?"]
+
+            db.delete(beans)
+            db.commit()
+            assert knowledge_fts.search(db, "cowpeas") == []
+            knowledge_fts.integrity_check(engine)
+        engine.dispose()
+    print("  ✓ Inserts, updates and deletes reach the FTS index")
+
+
+def test_ranking_and_query_safety():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_db(tmp)
+        knowledge_fts.ensure_fts(engine)
+        with sessionmaker(bind=engine)() as db:
+            db.add_all([
+                Knowledge(question="General farm advice", answer="Water maize early in the morning."),
+                Knowledge(question="How often should I water maize?", answer="Twice a week."),
+                Knowledge(question="Fertilizer for tomatoes", answer="Use compost."),
+            ])
+            db.commit()
+
+            # the question column outweighs the answer column
+            answer, score = knowledge_fts.best(db, "how often to water maize")
+            assert answer == "Twice a week." and score >= 0.6, (answer, score)
+            assert knowledge_fts.best(db, "coffee") == (None, 0.0)
+
+            # admin search: every word as a prefix
+            hits = knowledge_fts.search(db, "fert tom", require_all=True, prefix=True)
+            assert [h[1] for h in hits] == ["Fertilizer for tomatoes"]
+
+            # FTS5 syntax in user input is treated as plain words
+            assert knowledge_fts.search(db, 'maize" OR * NEAR(') != []
+            assert knowledge_fts.search(db, "?!") == []
+        engine.dispose()
+    print("  ✓ BM25 ranking, prefix search and query quoting")
+
+
+if __name__ == "__main__":
+    print("\n🔎 Testing full-text knowledge index...")
+    test_triggers_keep_index_in_sync()
+    test_ranking_and_query_safety()
+    print("\n🎉 All full-text index checks passed.")
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Checks for the in-memory knowledge index used by /chat retrieval.
+Runs without a server: python test_knowledge_index.py
+"""
+
+import os
+import tempfile
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from bulk_import import read_knowledge_file
+from import_knowledge import DATASETS
+from knowledge_fts import ensure_fts
+from knowledge_index import MIN_RETRIEVAL_SCORE, KnowledgeIndex, TfidfIndex, knowledge_stamp
+import knowledge_revision
+from knowledge_revision import KnowledgeWatcher, ensure_revision
+from models import Base, Knowledge, make_engine
+
+ROWS = [
+    (1, "What is the best time to plant maize?", "Plant maize at the onset of rains."),
+    (2, "How do I control pests in tomatoes?", "Remove affected leaves and spray neem oil."),
+    (3, "How often should I water tomato plants?", "Every 2-3 days, keep soil moist."),
+]
+
+
+def make_index():
+    index = KnowledgeIndex()
+    index.build(ROWS)
+    return index
+
+
+def test_phrase_match():
+    """A query contained in a stored question returns that row."""
+    index = make_index()
+    assert index.search("best time to plant maize") == ROWS[0][2]
+    print("  ✓ Phrase match works")
+
+
+def test_keyword_scoring():
+    """Without a phrase match, the row sharing the most words wins."""
+    index = make_index()
+    assert index.search("water my tomato plants please") == ROWS[2][2]
+    assert index.search("xyzzy") is None
+    assert index.search("?") is None
+    print("  ✓ Keyword scoring works")
+
+
+def test_incremental_updates():
+    """Admin CRUD deltas are visible without a rebuild."""
+    index = make_index()
+    index.add(4, "How do I store cassava?", "Keep cassava in a cool dry place.")
+    assert index.search("store cassava") == "Keep cassava in a cool dry place."
+
+    index.add(4, "How do I dry cassava chips?", "Sun-dry the chips on raised racks.")
+    assert index.search("store cassava") != "Keep cassava in a cool dry place."
+    assert index.search("dry cassava chips") == "Sun-dry the chips on raised racks."
+
+    index.remove(4)
+    assert index.search("cassava chips") is None
+    assert "cassava" not in index.postings
+    assert len(index) == 3
+    print("  ✓ Add / replace / remove deltas work")
+
+
+def test_rebuild_does_not_block_lookups():
+    """Lookups are answered from the old index while a rebuild streams rows, and edits made meanwhile survive."""
+    index = make_index()
+    during = []
+
+    def slow_rows():
+        yield ROWS[0]
+        lookup = threading.Thread(target=lambda: during.append(index.search("control pests in tomatoes")))
+        lookup.start()
+        lookup.join(timeout=5)
+        index.add(4, "How do I store cassava?", "Keep cassava in a cool dry place.")   # edited mid-build
+        index.remove(1)
+        yield from ROWS[1:]
+
+    index.build(slow_rows())
+    assert during == [ROWS[1][2]]
+    assert index.search("store cassava") == "Keep cassava in a cool dry place."
+    assert 1 not in index.entries and len(index) == 3 and not index._pending
+    print("  ✓ Rebuilds happen outside the lock and keep concurrent edits")
+
+
+def test_tfidf_scores():
+    """TF-IDF retrieval ranks by cosine similarity and reports the score."""
+    index = TfidfIndex()
+    index.build(ROWS)
+    answer, score = index.best("best time to plant maize")
+    assert answer == ROWS[0][2] and 0.5 < score <= 1.0
+    assert index.best("xyzzy") == (None, 0.0)
+    hits = index.search("tomatoes", k=2)
+    assert [h[2] for h in hits] == [2, 3]
+    assert index.search("how do i", k=2) == []     # stop words only
+    print("  ✓ TF-IDF cosine retrieval works")
+
+
+def test_tfidf_cutoff_on_bundled_datasets():
+    """MIN_RETRIEVAL_SCORE keeps the right answers to reworded questions and drops off-topic ones."""
+    rows, seen = [], set()
+    for path in DATASETS:
+        for r in read_knowledge_file(path, workers=1):
+            if r["question"].lower() not in seen:
+                seen.add(r["question"].lower())
+                rows.append((len(rows) + 1, r["question"], r["answer"]))
+    questions = {kid: q.lower() for kid, q, _ in rows}
+    index = TfidfIndex()
+    index.build(rows)
+
+    answered = {
+        "how do I control fall armyworm": "how do i control armyworms in maize?",
+        "how much water for tomatoes": "how often should i water tomato plants?",
+        "how to keep maize in store": "how to store maize safely",
+        "my bean leaves are turning yellow": "why beans turn yellow",
+        "how do I keep birds away from my crops": "how do i protect crops from birds?",
+    }
+    for message, question in answered.items():
+        (_, score, kid), = index.search(message)
+        assert questions[kid] == question and score >= MIN_RETRIEVAL_SCORE, (message, questions[kid], score)
+    for message in ["how do I fix my car", "how to grow coffee", "tell me a joke", "how to plant sugarcane"]:
+        assert index.best(message)[1] < MIN_RETRIEVAL_SCORE, message
+    print("  ✓ The retrieval cutoff fits the bundled knowledge base")
+
+
+def test_tfidf_incremental_updates():
+    """Edits are served from the overlay until the matrix is recompiled."""
+    index = TfidfIndex(max_overlay=1)
+    index.build(ROWS)
+    index.add(4, "How do I store cassava?", "Keep cassava in a cool dry place.")
+    assert index.best("store cassava")[0] == "Keep cassava in a cool dry place."
+    index.add(1, "When do I plant sorghum?", "Plant sorghum early.")
+    assert index.best("plant sorghum")[0] == "Plant sorghum early."
+    assert not index.overlay  # second edit pushed it past max_overlay
+    index.remove(4)
+    assert index.best("store cassava")[0] is None
+    print("  ✓ TF-IDF add / replace / remove deltas work")
+
+
+def test_tfidf_recompiles_without_blocking_lookups():
+    """Lookups are answered during a recompile, and edits made meanwhile survive the swap."""
+    index = TfidfIndex(max_overlay=1)
+    index.build(ROWS)
+    during = []
+    compile_rows = index._compile_rows
+
+    def slow_compile(rows):
+        lookup = threading.Thread(target=lambda: during.append(index.best("store cassava")))
+        lookup.start()
+        lookup.join(timeout=5)
+        index.add(5, "When do I plant sorghum?", "Plant sorghum early.")   # edited mid-compile
+        index.remove(2)
+        return compile_rows(rows)
+
+    index._compile_rows = slow_compile
+    index.add(4, "How do I store cassava?", "Keep cassava in a cool dry place.")
+    index.add(6, "How do I dry beans?", "On a tarpaulin in the sun.")      # over max_overlay: recompiles
+    assert during == [("Keep cassava in a cool dry place.", during[0][1])]
+    assert set(index.overlay) == {5} and not index._compiling
+    assert index.best("plant sorghum")[0] == "Plant sorghum early."
+    assert index.best("control pests in tomatoes")[0] != ROWS[1][2]
+    assert index.best("dry beans")[0] == "On a tarpaulin in the sun."
+    print("  ✓ TF-IDF recompiles outside the lock and keeps concurrent edits")
+
+
+def test_tfidf_batch_matches_single():
+    """best_batch() gives the same answers as best(), overlay rows included."""
+    index = TfidfIndex(max_overlay=10)
+    index.build(ROWS)
+    index.add(4, "How do I store cassava?", "Keep cassava in a cool dry place.")
+    index.remove(1)
+    questions = ["best time to plant maize", "store cassava", "how do i", "", "xyzzy"]
+    assert index.best_batch(questions) == [index.best(q) for q in questions]
+    print("  ✓ TF-IDF batch lookup matches single lookups")
+
+
+def test_tfidf_snapshot_round_trip():
+    """A mapped snapshot answers like the index it was written from, edits included."""
+    rows = ROWS + [(10, "Wéeding of matooke gardens", "Slash weeds monthly; mulch well.")]
+    built = TfidfIndex()
+    built.build(rows, stamp=(4, 10, 7))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        manifest = built.save_snapshot(path)
+        assert (manifest["rows"], manifest["max_id"], manifest["revision"]) == (4, 10, 7)
+
+        mapped = TfidfIndex(max_overlay=1)
+        assert not mapped.load_snapshot(path, stamp=(4, 10, 8))  # a row was written since
+        assert mapped.load_snapshot(path, stamp=(4, 10, 7)) and mapped.rows is None
+        questions = ["best time to plant maize", "how do i", "wéeding matooke", "xyzzy", ""]
+        assert [mapped.search(q, k=3) for q in questions] == [built.search(q, k=3) for q in questions]
+        assert mapped.best_batch(questions) == built.best_batch(questions)
+
+        mapped.add(4, "How do I store cassava?", "Keep cassava in a cool dry place.")
+        mapped.remove(2)
+        assert mapped.best("store cassava")[0] == "Keep cassava in a cool dry place."
+        assert mapped.best("control pests in tomatoes")[0] != ROWS[1][2]
+        mapped.add(5, "When do I plant sorghum?", "Plant sorghum early.")  # recompiles
+        assert not mapped.overlay and len(mapped) == 5
+        assert mapped.best("wéeding matooke")[0] == rows[3][2]
+    print("  ✓ TF-IDF snapshot maps back with the same scores and takes edits")
+
+
+def test_snapshot_goes_stale_on_any_write():
+    """Edits that keep the row count and highest id still retire the snapshot."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'kb.db')}")
+        Base.metadata.create_all(bind=engine)
+        ensure_fts(engine)
+        ensure_revision(engine)
+        db = sessionmaker(bind=engine)()
+        db.add_all([Knowledge(id=kid, question=q, answer=a) for kid, q, a in ROWS])
+        db.commit()
+
+        def fresh_index():
+            index = TfidfIndex()
+            if not index.load_snapshot(path, stamp=knowledge_stamp(db)):
+                index.build(db.query(Knowledge.id, Knowledge.question, Knowledge.answer),
+                            stamp=knowledge_stamp(db))
+            return index
+
+        path = os.path.join(tmp, "snapshot")
+        fresh_index().save_snapshot(path)
+        assert fresh_index().rows is None                      # mapped: still current
+        db.query(Knowledge).filter(Knowledge.id == 1).update({"answer": "NEW maize answer"})
+        db.commit()
+        assert fresh_index().best("best time to plant maize")[0] == "NEW maize answer"
+
+        edited = fresh_index()
+        edited.add(9, "new row", "kept in memory only")
+        assert edited.save_snapshot(path)["revision"] is None  # never mapped back
+        assert not TfidfIndex().load_snapshot(path, stamp=knowledge_stamp(db))
+        db.close()
+        engine.dispose()
+    print("  ✓ TF-IDF snapshot is ignored after any write to the table")
+
+
+def test_upgrade_drops_the_old_revision_counter():
+    """A database created with the one-row revision counter logs each write once after the upgrade."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'kb.db')}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE knowledge_revision (id INTEGER PRIMARY KEY, revision INTEGER NOT NULL)"))
+            conn.execute(text("INSERT INTO knowledge_revision VALUES (1, 0)"))
+            for suffix, event in (("ai", "INSERT"), ("ad", "DELETE"), ("au", "UPDATE")):
+                conn.execute(text(f"CREATE TRIGGER knowledge_rev_{suffix} AFTER {event} ON knowledge BEGIN "
+                                  "UPDATE knowledge_revision SET revision = revision + 1 WHERE id = 1; END"))
+        ensure_revision(engine)
+        with engine.begin() as conn:
+            names = {n for (n,) in conn.execute(text("SELECT name FROM sqlite_master"))}
+            conn.execute(text("INSERT INTO knowledge (question, answer) VALUES ('q', 'a')"))
+            logged = conn.execute(text("SELECT COUNT(*) FROM knowledge_changes")).scalar()
+        assert not any(n.startswith("knowledge_rev") for n in names) and "knowledge_changes_ai" in names
+        assert logged == 1
+        engine.dispose()
+    print("  ✓ The upgrade drops the old revision counter and its triggers")
+
+
+def test_watcher_replays_edits_from_other_workers():
+    """An index kept up to date by KnowledgeWatcher sees writes made by another process."""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'kb.db')}")
+        Base.metadata.create_all(bind=engine)
+        ensure_revision(engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as db:
+            db.add_all([Knowledge(id=kid, question=q, answer=a) for kid, q, a in ROWS])
+            db.commit()
+
+        index = TfidfIndex()
+        reloads = []
+
+        def apply(rows):
+            for kid, row in rows.items():
+                index.add(kid, *row) if row else index.remove(kid)
+
+        def reload():
+            reloads.append(1)
+            with Session() as db:
+                index.build(db.query(Knowledge.id, Knowledge.question, Knowledge.answer))
+
+        watcher = KnowledgeWatcher(Session, on_rows=apply, on_reload=reload)
+        watcher.start()
+        reload()
+        assert watcher.poll() == 0
+
+        # "another worker" edits, adds and deletes rows
+        with Session() as db:
+            db.query(Knowledge).filter(Knowledge.id == 1).update({"answer": "NEW maize answer"})
+            db.add(Knowledge(id=4, question="How do I store cassava?", answer="Keep it dry."))
+            db.query(Knowledge).filter(Knowledge.id == 2).delete()
+            db.commit()
+        assert watcher.poll() == 3 and watcher.poll() == 0
+        assert index.best("best time to plant maize")[0] == "NEW maize answer"
+        assert index.best("store cassava")[0] == "Keep it dry."
+        assert index.best("control pests in tomatoes")[0] != ROWS[1][2]
+
+        # a bulk import logs one reload marker; a log pruned past us also reloads
+        knowledge_revision.suspend_triggers(engine)
+        with Session() as db:
+            db.add(Knowledge(id=5, question="When do I plant sorghum?", answer="Early."))
+            db.commit()
+        knowledge_revision.resume_triggers(engine)
+        watcher.poll()
+        with Session() as db:
+            for i in range(3):
+                db.query(Knowledge).filter(Knowledge.id == 5).update({"answer": f"Early, take {i}."})
+                db.commit()
+        knowledge_revision.prune(engine, keep=1)
+        watcher.poll()
+        assert len(reloads) == 3 and index.best("plant sorghum")[0] == "Early, take 2."
+        engine.dispose()
+    print("  ✓ Edits, bulk imports and pruned logs reach the other workers' indexes")
+
+
+if __name__ == "__main__":
+    print("\n🔎 Testing knowledge index...")
+    test_phrase_match()
+    test_keyword_scoring()
+    test_incremental_updates()
+    test_rebuild_does_not_block_lookups()
+    test_tfidf_scores()
+    test_tfidf_cutoff_on_bundled_datasets()
+    test_tfidf_incremental_updates()
+    test_tfidf_recompiles_without_blocking_lookups()
+    test_tfidf_batch_matches_single()
+    test_tfidf_snapshot_round_trip()
+    test_snapshot_goes_stale_on_any_write()
+    test_upgrade_drops_the_old_revision_counter()
+    test_watcher_replays_edits_from_other_workers()
+    print("\n🎉 All knowledge index checks passed.")
@@ -1,8 +1,165 @@
-from app import chat, auto_lang
-
-print("detect french:", auto_lang('bonjour je suis agriculteur'))
-print("detect arabic:", auto_lang('مرحبا كيف الحال'))
-print("detect hindi:", auto_lang('नमस्ते मुझे मदद चाहिए'))
-print("chat french reply:", chat(req=type('r',(),{'message':'bonjour','language':'auto'})()))
-print("chat arabic hello:", chat(req=type('r',(),{'message':'مرحبا','language':'auto'})()))
-print("chat hindi hello:", chat(req=type('r',(),{'message':'नमस्ते','language':'auto'})()))
+#!/usr/bin/env python3
+"""
+Accuracy and throughput benchmark for auto_lang.
+
+Compares the character-trigram identifier (lang_id.py) with the old
+keyword-list heuristic on a labelled set of farmer messages that is not
+part of the training data (lang_seeds.json / the CSV datasets).
+
+    python test_language_detection.py
+"""
+
+import re
+import time
+
+import conftest  # noqa: F401 - throwaway database and chat log directory
+from lang_id import LanguageIdentifier
+from train_lang_id import load_samples
+
+# held-out messages per language code; none of them is a training sample or
+# a run of whole words inside one (see test_benchmark_is_held_out)
+LABELLED = {
+    "en": [
+        "thanks, bye", "thank you so much, goodbye",
+        "my tomato leaves have brown spots", "good morning, my goats are coughing",
+        "when should I harvest beans", "what fertilizer is best for cassava",
+        "I have a cow that will not eat", "is there a non organic option for pests",
+        "the soil in my garden is dry and hard", "how often should I water cabbage",
+        "par for the course this season", "can I use ash on my farm",
+        "which seeds grow fast in sandy soil", "the rains came late this year",
+    ],
+    "es": [
+        "buenos días, necesito ayuda", "cómo siembro frijoles",
+        "mi maíz tiene hojas amarillas", "cuándo cosecho los tomates",
+        "qué hago con las plagas de la yuca", "el agua de riego es poca",
+        "mis vacas están flacas", "buenas tardes, mis gallinas no ponen huevos",
+        "cuánto abono necesita el maíz",
+    ],
+    "fr": [
+        "comment semer les haricots", "mon maïs a des feuilles jaunes", "quand récolter les tomates",
+        "que faire contre les insectes sur le manioc", "il fait très sec cette année",
+        "bonsoir, mes poules sont malades", "combien d'engrais pour le maïs",
+        "merci beaucoup pour votre aide",
+    ],
+    "sw": [
+        "habari za asubuhi", "nipande mahindi lini", "nyanya zangu zina madoa",
+        "mbolea ya muhogo ni ipi", "mvua imekuwa nyingi sana", "jina langu ni juma",
+        "ng'ombe wangu ni mgonjwa", "shamba langu halina maji", "kuku wangu hawatagi mayai",
+        "asante sana kwa msaada",
+    ],
+    "lg": [
+        "nsimba ntya ebijanjaalo", "kasooli wange alina endwadde", "nkungula ddi ennyaanya",
+        "enkuba etonnya nnyo", "obulimi bwange", "nze njagala okulunda enkoko",
+        "ente zange tezirya",
+    ],
+    "rn": [
+        "agandi nyabo", "ninyenda obuyambi", "ebitookye byangye nibirwara", "ndahinga ryari",
+        "omwaka ogu enjura nkye",
+    ],
+    "ach": [
+        "pur me kal", "lobo na tek",
+    ],
+    "lg2": [
+        "wak me poto", "par ikom poto",
+    ],
+    "ar": [
+        "كيف أزرع الطماطم", "محصولي مريض", "متى أحصد الذرة", "الماء قليل في المزرعة",
+        "دجاجي لا يبيض", "شكرا جزيلا على المساعدة", "كم سمادا يحتاج القمح",
+    ],
+    "hi": [
+        "मुझे मदद चाहिए", "टमाटर कब लगाएं", "मेरी फसल में कीड़े हैं", "गेहूं के लिए खाद",
+        "मेरी गाय दूध नहीं दे रही", "बारिश बहुत कम हुई है", "बहुत बहुत शुक्रिया",
+    ],
+}
+
+
+def legacy_auto_lang(msg: str) -> str:
+    """The original keyword-list heuristic, kept for comparison."""
+    words = msg.lower().split()
+    spanish_words = ["el", "la", "de", "que", "y", "a", "en", "es", "se", "del", "para", "con"]
+    if sum(1 for w in words if w in spanish_words) > len(words) * 0.3:
+        return "es"
+    for lang, keywords in [
+        ("lg", ["kyokka", "nze", "obulimi", "ssebo", "mukyala", "bye", "ggwe"]),
+        ("sw", ["sala", "mimi", "kwa", "ni", "jina", "chakula", "sawa"]),
+        ("rn", ["ye", "omuntu", "enkorogoto", "obulimi", "togye"]),
+        ("ach", ["awuok", "anyo", "lul", "kede", "romo", "iny"]),
+        ("lg2", ["par", "laber", "pi", "wak", "iyo", "yɛ"]),
+        ("fr", ["bonjour", "merci", "oui", "non", "s'il", "vous", "être"]),
+        ("ar", ["مرحبا", "شكرا", "نعم", "لا", "زراعة", "مزارع"]),
+        ("hi", ["नमस्ते", "धन्यवाद", "हाँ", "नहीं", "कृषि", "फसल"]),
+    ]:
+        if any(w in keywords for w in words):
+            return lang
+    return "en"
+
+
+def accuracy(detect) -> float:
+    pairs = [(msg, lang) for lang, msgs in LABELLED.items() for msg in msgs]
+    return sum(detect(msg) == lang for msg, lang in pairs) / len(pairs)
+
+
+def throughput(detect, rounds: int = 200) -> float:
+    msgs = [msg for msgs in LABELLED.values() for msg in msgs]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for msg in msgs:
+            detect(msg)
+    return rounds * len(msgs) / (time.perf_counter() - start)
+
+
+def words(text: str) -> str:
+    return " ".join(re.findall(r"\w+", text.lower()))
+
+
+def test_benchmark_is_held_out():
+    training = [f" {words(t)} " for texts in load_samples().values() for t in texts]
+    seen = [msg for msgs in LABELLED.values() for msg in msgs
+            if any(f" {words(msg)} " in t for t in training)]
+    assert not seen, seen
+    print("  ✓ No benchmark message appears in the training data")
+
+
+def test_common_messages():
+    lid = LanguageIdentifier()
+    assert lid.detect("bonjour je suis agriculteur") == "fr"
+    assert lid.detect("مرحبا كيف الحال") == "ar"
+    assert lid.detect("नमस्ते मुझे मदद चाहिए") == "hi"
+    # words the old lists claimed for other languages
+    assert lid.detect("thanks, bye") == "en"
+    assert lid.detect("is there a non organic option") == "en"
+    assert lid.detect("") == "en"
+    print("  ✓ Common messages detected")
+
+
+def test_more_accurate_than_keyword_lists():
+    lid = LanguageIdentifier()
+    new, old = accuracy(lid.detect), accuracy(legacy_auto_lang)
+    assert new > old and new >= 0.8, (new, old)
+    print(f"  ✓ Accuracy {new:.0%} (keyword lists: {old:.0%})")
+
+
+def test_chat_replies_in_detected_language():
+    from app import build_reply
+    for msg, lang in [("bonjour", "fr"), ("مرحبا", "ar"), ("नमस्ते", "hi")]:
+        result = build_reply(msg, "auto")
+        assert result["language"] == lang, result
+    print("  ✓ /chat replies use the detected language")
+
+
+if __name__ == "__main__":
+    print("\n🌍 Language detection benchmark...")
+    test_benchmark_is_held_out()
+    test_common_messages()
+    test_more_accurate_than_keyword_lists()
+    test_chat_replies_in_detected_language()
+
+    lid = LanguageIdentifier()
+    lid.ensure_loaded()
+    for name, detect in [("keyword lists", legacy_auto_lang), ("trigram model", lid.detect)]:
+        print(f"  {name:14} accuracy {accuracy(detect):6.1%}   {throughput(detect):9.0f} msg/s")
+
+    print("\n  Per language (trigram model):")
+    for lang, msgs in LABELLED.items():
+        wrong = [(m, lid.detect(m)) for m in msgs if lid.detect(m) != lang]
+        print(f"    {lang:4} {len(msgs) - len(wrong)}/{len(msgs)}  {wrong[:3] if wrong else ''}")
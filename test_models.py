@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Checks for the SQLite engine profiles in models.py.
+Runs without a server: python test_models.py
+"""
+
+import os
+import tempfile
+
+from sqlalchemy import text
+
+from models import get_db, make_engine
+
+
+def pragmas(engine):
+    with engine.connect() as conn:
+        return {name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout")}
+
+
+def test_tuned_profile_applies_pragmas():
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'test.db')}"
+        tuned, plain = make_engine(url, profile="tuned"), make_engine(url, profile="default")
+        assert pragmas(tuned) == {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000}
+        assert pragmas(plain)["synchronous"] == 2  # FULL
+        assert tuned.pool.size() > 1
+        tuned.dispose()
+        plain.dispose()
+    print("  ✓ Tuned profile runs in WAL with the configured pragmas")
+
+
+def test_get_db_closes_session():
+    gen = get_db()
+    db = next(gen)
+    assert db.execute(text("SELECT 1")).scalar() == 1
+    gen.close()
+    assert not db.in_transaction()
+    print("  ✓ get_db() hands out one session and closes it")
+
+
+if __name__ == "__main__":
+    print("\n🗄  Testing database engine...")
+    test_tuned_profile_applies_pragmas()
+    test_get_db_closes_session()
+    print("\n🎉 All database engine checks passed.")
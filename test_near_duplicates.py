@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Checks for MinHash/LSH near-duplicate detection (near_duplicates.py).
+Runs without a server: python test_near_duplicates.py
+"""
+
+import os
+import random
+import tempfile
+
+from sqlalchemy.orm import sessionmaker
+
+from bulk_import import read_knowledge_file
+from import_knowledge import DATASETS
+from models import Base, Knowledge, make_engine
+from near_duplicates import DEFAULT_THRESHOLD, features, find_clusters, load_clusters, merge_entries, similarity
+
+
+def test_clusters_reworded_questions():
+    rows = [
+        (1, "What is the best time to plant maize?"),
+        (2, "best time for planting maize"),
+        (3, "How to plant beans"),
+        (4, "how do I plant beans?"),
+        (5, "how to plant maize"),
+        (6, "when to harvest maize"),
+        (7, "how to harvest maize"),
+        (8, "???"),
+        (9, "When should I plant beans?"),
+    ]
+    assert features("???") == set()
+    assert find_clusters(rows) == [[1, 2], [3, 4]]
+    print("  ✓ Reworded questions cluster, different questions do not")
+
+
+def test_clusters_do_not_chain():
+    # each neighbour is similar to the next, but not to the questions further along
+    rows = [(1, "best time plant maize"), (2, "best time plant maize beans"), (3, "best time plant beans"),
+            (4, "best time plant beans rice"), (5, "best time plant rice")]
+    clusters = find_clusters(rows, threshold=0.75)
+    assert all(similarity(dict(rows)[c[0]], dict(rows)[m]) >= 0.75 for c in clusters for m in c[1:])
+    assert not any({1, 4} <= set(c) or {2, 5} <= set(c) for c in clusters), clusters
+    print("  ✓ A cluster only holds questions similar to its keeper")
+
+
+def test_bundled_questions_with_different_answers_stay_apart():
+    questions = [r["question"] for path in DATASETS for r in read_knowledge_file(path, workers=1)]
+    rows = list(enumerate(questions))
+    clusters = find_clusters(rows)
+    for c in clusters:
+        for kid in c[1:]:
+            assert similarity(questions[c[0]], questions[kid]) >= DEFAULT_THRESHOLD, (questions[c[0]], questions[kid])
+    together = [{questions[kid].lower() for kid in c} for c in clusters]
+    for a, b in [("what is the best time to plant maize?", "what is the best time to plant beans?"),
+                 ("what is the best time to plant maize?", "what is the best time to harvest maize?"),
+                 ("what is the best time to plant cassava?", "what is the best time to plant rice?")]:
+        assert not any(a in g and b in g for g in together), (a, b)
+    print(f"  ✓ {len(clusters)} clusters in the bundled datasets, none mixing different questions")
+
+
+def test_finds_planted_duplicates_among_many():
+    rnd = random.Random(1)
+    vocab = [f"w{i}" for i in range(5000)]
+    rows = [(i, " ".join(rnd.sample(vocab, 8))) for i in range(20000)]
+    planted = []
+    for j in range(100):
+        kid, question = rows[rnd.randrange(len(rows))]
+        words = question.split()
+        words[rnd.randrange(8)] = "the"         # one word becomes a stop word
+        rows.append((100000 + j, " ".join(words) + "?"))
+        planted.append({kid, 100000 + j})
+    clusters = [set(c) for c in find_clusters(rows, threshold=0.7)]
+    found = sum(any(p <= c for c in clusters) for p in planted)
+    assert found >= 95, found
+    assert all(len(c) == 2 for c in clusters)
+    print(f"  ✓ {found}/100 planted near-duplicates found among 20k questions")
+
+
+def test_merge_keeps_one_entry_with_labels():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'dup.db')}")
+        Base.metadata.create_all(bind=engine)
+        with sessionmaker(bind=engine)() as db:
+            db.add_all([
+                Knowledge(question="What is the best time to plant maize?", answer="At the onset of the rains, March to May.", intent="general"),
+                Knowledge(question="best time for planting maize", answer="Early rains.", intent="planting", crop="maize"),
+                Knowledge(question="how to store beans", answer="Dry them well."),
+            ])
+            db.commit()
+
+            clusters = load_clusters(db)
+            assert len(clusters) == 1 and [e["id"] for e in clusters[0]] == [1, 2]  # longest answer first
+            removed = merge_entries(db, clusters[0][0]["id"], [e["id"] for e in clusters[0][1:]])
+            assert removed == [2]
+            keeper = db.get(Knowledge, 1)
+            assert (keeper.intent, keeper.crop) == ("planting", "maize")
+            assert db.query(Knowledge).count() == 2 and load_clusters(db) == []
+
+            try:
+                merge_entries(db, 1, [3])
+                raise AssertionError("merged a different question")
+            except ValueError:
+                pass
+            assert db.query(Knowledge).count() == 2
+        engine.dispose()
+    print("  ✓ Merge keeps one entry, carries over its labels and refuses other questions")
+
+
+if __name__ == "__main__":
+    print("\n🧬 Testing near-duplicate detection...")
+    test_clusters_reworded_questions()
+    test_clusters_do_not_chain()
+    test_bundled_questions_with_different_answers_stay_apart()
+    test_finds_planted_duplicates_among_many()
+    test_merge_keeps_one_entry_with_labels()
+    print("\n🎉 All near-duplicate checks passed.")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Checks for chat admission control (rate_limit.py and its use in app.py).
+Runs without a server: python test_rate_limit.py
+"""
+
+import time
+
+from fastapi.testclient import TestClient
+
+import conftest  # noqa: F401 - throwaway database and chat log directory
+import app
+from rate_limit import ConcurrencyGate, TokenBucketLimiter
+
+
+def test_bucket_allows_burst_then_refills():
+    limiter = TokenBucketLimiter(rate=50, burst=3, max_keys=2)
+    assert [limiter.acquire("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    wait = limiter.acquire("a")
+    assert 0 < wait <= 1 / 50
+    assert limiter.acquire("b") == 0.0           # other clients keep their own bucket
+    time.sleep(0.05)
+    assert limiter.acquire("a") == 0.0           # refilled
+    limiter.acquire("c")
+    assert limiter.stats()["clients"] == 2       # least recently seen client evicted
+    assert TokenBucketLimiter(rate=0, burst=1).acquire("a", cost=100) == 0.0  # disabled
+
+    # a cost above the burst is allowed from a full bucket and charged in full
+    limiter = TokenBucketLimiter(rate=10, burst=3)
+    assert limiter.acquire("a", cost=10) == 0.0
+    assert abs(limiter.acquire("a") - 0.8) < 0.01   # 7 tokens of debt + 1 needed, at 10/s
+    assert limiter.acquire("b", cost=1) == 0.0 and limiter.acquire("b", cost=10) > 0
+    print("  ✓ Token bucket: burst, refill, per-client buckets, bounded key count, large costs")
+
+
+def test_gate_rejects_instead_of_queueing():
+    gate = ConcurrencyGate(2)
+    assert gate.try_enter() and gate.try_enter() and not gate.try_enter()
+    gate.leave()
+    assert gate.try_enter()
+    assert gate.stats() == {"max_inflight": 2, "inflight": 2, "peak": 2, "rejected": 1}
+    print("  ✓ Concurrency gate rejects beyond its cap")
+
+
+def test_chat_returns_429_and_503():
+    limiter, gate = app.chat_limiter, app.chat_gate
+    saved = (limiter.rate, limiter.burst, gate.max_inflight)
+    limiter.rate, limiter.burst = 0.01, 2
+    limiter._buckets.clear()
+    try:
+        client = TestClient(app.app)
+        ok = [client.post("/chat", json={"message": "hello"}).status_code for _ in range(2)]
+        r = client.post("/chat", json={"message": "hello"},
+                        headers={"X-Forwarded-For": "10.0.0.9", "Origin": "https://farm.example"})
+        assert ok == [200, 200] and r.status_code == 429 and int(r.headers["retry-after"]) >= 1
+        assert r.headers["access-control-allow-origin"] == "https://farm.example"  # readable by browsers
+        assert client.get("/chat").status_code == 200  # the chat page is not limited
+
+        # a batch costs one token per message, also when it is larger than CHAT_BURST
+        limiter._buckets.clear()
+        assert client.post("/chat/batch", json=[{"message": "hi"}] * 2).status_code == 200
+        assert client.post("/chat/batch", json=[{"message": "hi"}]).status_code == 429
+        limiter._buckets.clear()
+        big = client.post("/chat/batch", json=[{"message": f"hi {i}"} for i in range(50)])
+        assert big.status_code == 200 and len(big.json()) == 50
+        r = client.post("/chat", json={"message": "hello"})   # ...and the debt is paid off first
+        assert r.status_code == 429 and int(r.headers["retry-after"]) > 1000
+
+        # unknown tokens are looked up only while their IP still has tokens
+        limiter._buckets.clear()
+        lookups = []
+        original_get = app.token_store.get
+        app.token_store.get = lambda token: lookups.append(token)
+        try:
+            codes = [client.post("/chat", json={"message": "hi"}, headers={"X-Token": f"made-up-{i}"}).status_code
+                     for i in range(4)]
+        finally:
+            app.token_store.get = original_get
+        assert codes == [200, 429, 429, 429] and len(lookups) == 1
+
+        limiter.rate = 0
+        gate.max_inflight, gate.inflight = 1, 1     # one request already in progress
+        busy = client.post("/chat", json={"message": "hello"}, headers={"Origin": "https://farm.example"})
+        assert busy.status_code == 503 and busy.headers["retry-after"] == "1"
+        assert busy.headers["access-control-allow-origin"] == "https://farm.example"
+        gate.inflight = 0
+        with client.websocket_connect("/chat/ws") as ws:
+            gate.inflight = 1
+            ws.send_json({"message": "hi"})
+            assert ws.receive_json()["detail"].startswith("Server busy")
+            gate.inflight = 0
+    finally:
+        limiter.rate, limiter.burst, gate.max_inflight = saved
+        limiter._buckets.clear()
+    print("  ✓ /chat answers 429 over the rate and 503 over the concurrency cap")
+
+
+if __name__ == "__main__":
+    print("\n🚦 Testing chat admission control...")
+    test_bucket_allows_burst_then_refills()
+    test_gate_rejects_instead_of_queueing()
+    test_chat_returns_429_and_503()
+    print("\n🎉 All admission control checks passed.")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Checks for the /chat response cache.
+Runs without a server: python test_response_cache.py
+"""
+
+import time
+
+from response_cache import ResponseCache, cache_key
+
+
+def test_keys_normalize_messages():
+    assert cache_key("How to plant MAIZE?", "en") == cache_key("how to  plant maize", "en")
+    assert cache_key("hello", "en") != cache_key("hello", "fr")
+    assert cache_key("مرحبا", "ar") != cache_key("شكرا", "ar")  # not collapsed to ""
+    print("  ✓ Cache keys normalize text and keep the language")
+
+
+def test_lru_ttl_and_counters():
+    cache = ResponseCache(maxsize=2, ttl=0.2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1      # a is now most recent
+    cache.put("c", 3)               # evicts b
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    time.sleep(0.25)
+    assert cache.get("a") is None   # expired
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    cache.put("d", 4)
+    cache.clear()
+    assert cache.get("d") is None and cache.stats()["size"] == 0
+    print("  ✓ LRU eviction, TTL expiry and counters work")
+
+
+if __name__ == "__main__":
+    print("\n🗃  Testing response cache...")
+    test_keys_normalize_messages()
+    test_lru_ttl_and_counters()
+    print("\n🎉 All response cache checks passed.")
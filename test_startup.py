@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Checks for the startup lifecycle: import does no I/O, the lifespan warms up.
+Runs without a server: python test_startup.py
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_python(code: str, tmp: str, **env) -> str:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'db', 'farming.db')}",
+               CHAT_LOG_DIR=os.path.join(tmp, "chat_logs"), **env)
+    out = subprocess.run([sys.executable, "-c", code], cwd=HERE, env=env,
+                         capture_output=True, text=True, timeout=120)
+    assert out.returncode == 0, out.stderr
+    return out.stdout
+
+
+def test_import_touches_no_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        out = run_python(
+            "import sys, app, models\n"
+            "assert not models.db_initialized and not app._admin_checked\n"
+            "assert 'scipy' not in sys.modules\n"
+            "print('ok')", tmp)
+        assert out.strip().endswith("ok")
+        assert not os.path.exists(os.path.join(tmp, "db"))
+    print("  ✓ Importing app creates no database and loads no index")
+
+
+def test_lifespan_warms_up_and_reports_ready():
+    with tempfile.TemporaryDirectory() as tmp:
+        out = run_python(
+            "from fastapi.testclient import TestClient\n"
+            "import app\n"
+            "with TestClient(app.app) as client:\n"
+            "    r = client.get('/ready')\n"
+            "    assert r.status_code == 200, r.text\n"
+            "    body = r.json()\n"
+            "    assert body['ready'] and body['ready_seconds'] >= body['import_seconds'] > 0\n"
+            "    token = client.post('/admin/login', json={'username': 'admin', 'password': 'admin123'}).json()['token']\n"
+            "    startup = client.get('/admin/metrics', headers={'X-Token': token}).json()['startup']\n"
+            "    assert startup['warm_up'] == 'eager' and startup['warm_up_seconds'] > 0\n"
+            "print('ok')", tmp, WARMUP="eager", RETRIEVAL_MODE="fts")
+        assert out.strip().endswith("ok"), out
+        assert os.path.exists(os.path.join(tmp, "db", "farming.db"))
+    print("  ✓ Eager lifespan creates the database and admin, /ready turns 200")
+
+
+def test_lazy_mode_is_not_ready_until_used():
+    with tempfile.TemporaryDirectory() as tmp:
+        out = run_python(
+            "from fastapi.testclient import TestClient\n"
+            "import app\n"
+            "with TestClient(app.app) as client:\n"
+            "    assert client.get('/ready').status_code == 503\n"
+            "    assert client.post('/chat', json={'message': 'hello'}).status_code == 200\n"
+            "    assert client.get('/ready').status_code == 200\n"
+            "print('ok')", tmp, WARMUP="lazy", RETRIEVAL_MODE="fts")
+        assert out.strip().endswith("ok"), out
+    print("  ✓ Lazy mode loads the chat path on the first chat")
+
+
+if __name__ == "__main__":
+    print("\n🚀 Testing startup lifecycle...")
+    test_import_touches_no_database()
+    test_lifespan_warms_up_and_reports_ready()
+    test_lazy_mode_is_not_ready_until_used()
+    print("\n🎉 All startup checks passed.")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Checks for the shared login token store (token_store.py).
+Runs without a server: python test_token_store.py
+"""
+
+import os
+import tempfile
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+import conftest  # noqa: F401 - throwaway database and chat log directory
+from models import Base, make_engine
+from token_store import FileBackend, MemoryBackend, SqlBackend, TokenStore, token_key
+
+
+def check_shared(backend_a, backend_b):
+    """Two workers: a token issued by one is valid in the other until revoked."""
+    worker_a = TokenStore(backend_a, cache_seconds=0)
+    worker_b = TokenStore(backend_b, cache_seconds=0)
+    token = worker_a.issue("admin", "admin", ttl=60)
+    assert worker_b.get(token)["username"] == "admin"
+    worker_b.revoke(token)
+    assert worker_a.get(token) is None
+    expired = worker_a.issue("farmer", "farmer", ttl=-1)
+    assert worker_b.get(expired) is None and backend_a.get(token_key(expired)) is None
+
+
+def test_sql_and_file_backends_share_tokens():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'tokens.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        check_shared(SqlBackend(Session), SqlBackend(Session))
+        engine.dispose()
+
+        directory = os.path.join(tmp, "tokens")
+        check_shared(FileBackend(directory), FileBackend(directory))
+        # only the (empty) per-user marker directories are left
+        assert all(not os.listdir(os.path.join(directory, d)) for d in os.listdir(directory))
+    print("  ✓ SQLite and file backends share tokens and revocations")
+
+
+def test_l1_cache_answers_repeat_checks():
+    backend = MemoryBackend()
+    store = TokenStore(backend, cache_seconds=60)
+    token = store.issue("admin", "admin", ttl=60)
+    for _ in range(5):
+        assert store.get(token)["role"] == "admin"
+    assert (store.hits, store.misses) == (5, 0)
+    backend.delete_many([token_key(token)])  # revoked by another worker:
+    assert store.get(token) is not None  # still cached here until cache_seconds pass
+    store.cache_seconds = 0
+    assert store.get(token) is None
+    assert store.get(None) is None and store.get("not-a-token") is None
+    print("  ✓ Repeat checks are served from the in-process cache")
+
+
+def test_sweep_and_session_cap_bound_memory():
+    backend = MemoryBackend()
+    store = TokenStore(backend, max_per_user=3, purge_seconds=0)
+    tokens = [store.issue("farmer1", "farmer", ttl=60) for _ in range(5)]
+    assert [store.get(t) is not None for t in tokens] == [False, False, True, True, True]
+    assert len(backend.user_sessions("farmer1")) == 3 and store.evicted == 2
+
+    # many one-off logins: the sweep reclaims every expired one
+    for i in range(5000):
+        store.issue(f"user{i}", "farmer", ttl=30 if i % 2 else 90)
+    assert store.sweep(now=time.time() + 45) == 2500
+    assert len(store._cache) == len(backend._entries) == 2503
+    assert store.sweep(now=time.time() + 120) == 2503
+    assert not store._cache and not backend._entries and not store._heap
+
+    stats = store.stats()
+    assert (stats["live_sessions"], stats["issued"], stats["expired"], stats["sweeps"]) == (0, 5005, 5003, 2)
+    print("  ✓ Sweeps reclaim expired sessions; each user keeps at most 3")
+
+
+def test_sql_backend_caps_sessions_across_workers():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, 'tokens.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        worker_a = TokenStore(SqlBackend(Session), cache_seconds=0, max_per_user=2)
+        worker_b = TokenStore(SqlBackend(Session), cache_seconds=0, max_per_user=2)
+        first = worker_a.issue("admin", "admin", ttl=60)
+        worker_b.issue("admin", "admin", ttl=60)
+        worker_a.issue("admin", "admin", ttl=60)
+        assert worker_b.get(first) is None and worker_b.stats()["live_sessions"] == 2
+
+        worker_b.issue("farmer1", "farmer", ttl=1)
+        assert worker_a.sweep(now=time.time() + 5) == 0      # not cached in worker a...
+        worker_a.purge_seconds = 0
+        worker_a.sweep(now=time.time() + 5)                  # ...so its periodic purge removes it
+        assert worker_a.stats()["live_sessions"] == 2 and SqlBackend(Session).user_sessions("farmer1") == []
+        engine.dispose()
+    print("  ✓ The session cap and purge work across workers sharing SQLite")
+
+
+def test_only_admin_tokens_pass_admin_checks():
+    import app
+    original, app.token_store = app.token_store, TokenStore(MemoryBackend())
+    try:
+        admin = app.token_store.issue("admin", "admin", ttl=60)
+        farmer = app.token_store.issue("farmer1", "farmer", ttl=60)
+        assert app.verify_admin_token(admin)
+        assert not app.verify_admin_token(farmer) and not app.verify_admin_token(None)
+    finally:
+        app.token_store = original
+    print("  ✓ Farmer tokens are refused on admin endpoints")
+
+
+if __name__ == "__main__":
+    print("\n🔑 Testing token store...")
+    test_sql_and_file_backends_share_tokens()
+    test_l1_cache_answers_repeat_checks()
+    test_sweep_and_session_cap_bound_memory()
+    test_sql_backend_caps_sessions_across_workers()
+    test_only_admin_tokens_pass_admin_checks()
+    print("\n🎉 All token store checks passed.")
@@ -0,0 +1,114 @@
+# text_utils.py
+"""
+Shared text normalization helpers used by the chat and retrieval code.
+"""
+import re
+import string
+
+_NON_ALNUM = re.compile(r"[^a-zA-Z0-9\s]")
+_WORD = re.compile(r"\w+")
+# punctuation -> space, so str.split() yields bare words (much cheaper than a \w+ regex)
+_PUNCT = re.compile("[" + re.escape(string.punctuation + "¡¿«»“”‘’،؟।") + "]")
+
+
+# words that say little about what a question is about; TF-IDF retrieval and
+# near-duplicate detection ignore them
+STOP_WORDS = frozenset({
+    "a", "an", "the", "is", "are", "was", "be", "to", "for", "of", "in", "on", "at", "by",
+    "with", "and", "or", "my", "i", "me", "we", "you", "your", "it", "its", "this", "that",
+    "do", "does", "can", "could", "should", "would", "will", "there", "any", "some",
+    "what", "how", "when", "where", "which", "why", "who", "much", "many", "have", "has",
+})
+
+
+def stem(word: str) -> str:
+    """Light suffix stripping, so "planting"/"planted"/"plants" and "tomatoes" meet their stem."""
+    if len(word) > 5 and word.endswith("ing"):
+        return word[:-3]
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 4 and word.endswith("ed"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def content_words(words) -> list[str]:
+    """Stemmed words of a token list, stop words dropped."""
+    return [stem(w) for w in words if w not in STOP_WORDS]
+
+
+def split_words(text: str) -> list[str]:
+    """Split already lower-cased text into words, dropping punctuation."""
+    return _PUNCT.sub(" ", text).split()
+
+
+def preprocess(text: str) -> str:
+    """Clean and normalize text for matching."""
+    text = text.lower().strip()
+    return _NON_ALNUM.sub("", text)
+
+
+def tokenize(text: str) -> list[str]:
+    """Normalize text and split it into word tokens."""
+    return preprocess(text).split()
+
+
+class KeywordMatcher:
+    """Finds every keyword category present in a text in one pass over its words.
+
+    Keywords must start on a word boundary, so "no" does not fire inside
+    "know" and "hi" not inside "which". Keywords of up to three characters
+    must also end on one ("ok" is not "okra"); longer ones match as word
+    prefixes so "pest" still covers "pests" and "pesticide". The rule table
+    is compiled once into dicts keyed by word, so a message costs a few
+    lookups per word rather than a substring scan per keyword.
+    """
+
+    SHORT = 3
+
+    def __init__(self, rules: dict[str, list[str]]):
+        self.short: dict[str, set[str]] = {}    # whole-word keywords
+        self.prefix: dict[str, list[tuple[str, set[str]]]] = {}  # stem -> keywords matched as word prefixes
+        self.phrases: dict[str, list[tuple[re.Pattern, set[str]]]] = {}  # first word -> multi-word keywords
+        self.others: list[tuple[str, set[str]]] = []  # keywords not starting with a word character
+        categories: dict[str, set[str]] = {}
+        for category, words in rules.items():
+            for w in words:
+                categories.setdefault(w.lower(), set()).add(category)
+        for kw, cats in categories.items():
+            words = split_words(kw)
+            if not words or not kw.startswith(words[0]):
+                self.others.append((kw, cats))
+            elif words[0] != kw:
+                end = r"\b" if len(kw) <= self.SHORT and _WORD.search(kw[-1]) else ""
+                pattern = re.compile(r"\b" + re.escape(kw) + end)
+                self.phrases.setdefault(words[0], []).append((pattern, cats))
+            elif len(kw) <= self.SHORT:
+                self.short[kw] = cats
+            else:
+                self.prefix.setdefault(kw[:self.SHORT + 1], []).append((kw, cats))
+
+    def match(self, text: str) -> set[str]:
+        """Return every category with at least one keyword in `text`."""
+        text = text.lower()
+        words = set(split_words(text))
+        found: set[str] = set()
+        # set intersections keep the per-word work in C
+        for word in words & self.short.keys():
+            found |= self.short[word]
+        prefix, stem_len = self.prefix, self.SHORT + 1
+        for word in words:
+            for kw, cats in prefix.get(word[:stem_len], ()):
+                if word.startswith(kw):
+                    found |= cats
+        # multi-word keywords are rare, so only their first word is indexed
+        for word in words & self.phrases.keys():
+            for pattern, cats in self.phrases[word]:
+                if pattern.search(text):
+                    found |= cats
+        for kw, cats in self.others:
+            if kw in text:
+                found |= cats
+        return found
@@ -0,0 +1,370 @@
+# token_store.py
+"""
+Login tokens shared by every worker (and host) running the app.
+
+Tokens issued by /admin/login and /user/login live in a backend that all
+workers can see, with each worker's own dict in front of it as an L1 cache:
+
+- MemoryBackend: nothing shared; tokens only exist in the issuing process
+- SqlBackend: the auth_tokens table of DATABASE_URL (SQLite for the workers
+  of one host, PostgreSQL across hosts)
+- FileBackend: one small JSON file per token in a shared directory,
+  /dev/shm (shared memory) by default; a network mount spans hosts
+
+Backends are keyed by the SHA-256 of a token, never the token itself. A token
+seen by a worker is answered from its L1 dict for up to TOKEN_CACHE_SECONDS,
+which is also how long a logout in one worker can take to reach the others.
+
+Memory stays bounded: every cached token sits in a min-heap ordered by
+expiry, and sweep() (run by the app every TOKEN_SWEEP_SECONDS) pops the
+expired ones in O(log n) each and deletes them from the backend too. A user
+holds at most TOKEN_MAX_PER_USER sessions; logging in again ends the oldest.
+"""
+import hashlib
+import heapq
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from sqlalchemy import func
+from models import AuthToken, SessionLocal
+
+# TOKEN_STORE=sqlite | file | memory
+TOKEN_STORE = os.getenv("TOKEN_STORE", "sqlite").lower()
+TOKEN_STORE_DIR = os.getenv(
+    "TOKEN_STORE_DIR",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "farm_chat_tokens"),
+)
+TOKEN_CACHE_SECONDS = float(os.getenv("TOKEN_CACHE_SECONDS", "10"))
+TOKEN_MAX_PER_USER = int(os.getenv("TOKEN_MAX_PER_USER", "5"))
+TOKEN_SWEEP_SECONDS = float(os.getenv("TOKEN_SWEEP_SECONDS", "60"))
+# full backend clean-up, for tokens whose worker exited before sweeping them
+TOKEN_PURGE_SECONDS = float(os.getenv("TOKEN_PURGE_SECONDS", "900"))
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+# --------------------
+# Backends: entries by token key, per-user listing, expiry clean-up
+# --------------------
+class MemoryBackend:
+    """In-process dict; fine for one worker and for tests."""
+
+    def __init__(self):
+        self._entries: dict[str, dict] = {}
+        self._by_user: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._by_user.setdefault(entry["username"], set()).add(key)
+
+    def get(self, key: str) -> dict | None:
+        return self._entries.get(key)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is None:
+                    continue
+                user_keys = self._by_user.get(entry["username"])
+                if user_keys is not None:
+                    user_keys.discard(key)
+                    if not user_keys:
+                        del self._by_user[entry["username"]]
+
+    def user_sessions(self, username: str) -> list[tuple[float, str]]:
+        """(expires, key) of every stored session of `username`."""
+        with self._lock:
+            return [(self._entries[k]["expires"], k) for k in self._by_user.get(username, ())]
+
+    def purge_expired(self, now: float) -> int:
+        expired = [k for k, e in list(self._entries.items()) if e["expires"] < now]
+        self.delete_many(expired)
+        return len(expired)
+
+    def count_live(self, now: float) -> int:
+        return sum(1 for e in list(self._entries.values()) if e["expires"] >= now)
+
+
+class SqlBackend:
+    """Rows of the auth_tokens table, through the app's SQLAlchemy sessions."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def put(self, key: str, entry: dict):
+        with self.session_factory() as db:
+            db.merge(AuthToken(token_hash=key, username=entry["username"],
+                               role=entry["role"], expires=entry["expires"]))
+            db.commit()
+
+    def get(self, key: str) -> dict | None:
+        with self.session_factory() as db:
+            row = db.get(AuthToken, key)
+            if row is None:
+                return None
+            return {"username": row.username, "role": row.role, "expires": row.expires}
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        with self.session_factory() as db:
+            for i in range(0, len(keys), 500):
+                db.query(AuthToken).filter(AuthToken.token_hash.in_(keys[i:i + 500])).delete(
+                    synchronize_session=False)
+            db.commit()
+
+    def user_sessions(self, username: str) -> list[tuple[float, str]]:
+        with self.session_factory() as db:
+            rows = db.query(AuthToken.expires, AuthToken.token_hash).filter(AuthToken.username == username)
+            return [(expires, key) for expires, key in rows]
+
+    def purge_expired(self, now: float) -> int:
+        with self.session_factory() as db:
+            n = db.query(AuthToken).filter(AuthToken.expires < now).delete(synchronize_session=False)
+            db.commit()
+            return n
+
+    def count_live(self, now: float) -> int:
+        with self.session_factory() as db:
+            return db.query(func.count(AuthToken.token_hash)).filter(AuthToken.expires >= now).scalar()
+
+
+class FileBackend:
+    """One JSON file per token, written atomically (temp file + rename).
+
+    Each file's mtime is its expiry time, and an empty marker file per
+    session under u-<hash of username>/ lists the sessions of a user.
+    """
+
+    def __init__(self, directory: str = TOKEN_STORE_DIR):
+        self.directory = directory
+        self._created = False
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _user_dir(self, username: str) -> str:
+        return os.path.join(self.directory, "u-" + hashlib.sha256(username.encode()).hexdigest()[:32])
+
+    def put(self, key: str, entry: dict):
+        if not self._created:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            self._created = True
+        expires = (entry["expires"], entry["expires"])
+        tmp = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.utime(tmp, expires)
+        os.replace(tmp, self._path(key))
+        user_dir = self._user_dir(entry["username"])
+        os.makedirs(user_dir, mode=0o700, exist_ok=True)
+        marker = os.path.join(user_dir, key)
+        open(marker, "w").close()
+        os.utime(marker, expires)
+
+    def get(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def delete_many(self, keys):
+        for key in keys:
+            entry = self.get(key)
+            paths = [self._path(key)]
+            if entry is not None:
+                paths.append(os.path.join(self._user_dir(entry["username"]), key))
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def user_sessions(self, username: str) -> list[tuple[float, str]]:
+        try:
+            with os.scandir(self._user_dir(username)) as it:
+                return [(e.stat().st_mtime, e.name) for e in it]
+        except FileNotFoundError:
+            return []
+
+    def purge_expired(self, now: float) -> int:
+        """Remove expired token and marker files, found by mtime (a directory scan)."""
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for e in entries:
+            try:
+                if e.is_dir():
+                    with os.scandir(e.path) as markers:
+                        for m in markers:
+                            if m.stat().st_mtime < now:
+                                os.remove(m.path)
+                elif not e.name.endswith(".tmp") and e.stat().st_mtime < now:
+                    os.remove(e.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def count_live(self, now: float) -> int:
+        try:
+            with os.scandir(self.directory) as it:
+                return sum(1 for e in it if e.is_file() and not e.name.endswith(".tmp")
+                           and e.stat().st_mtime >= now)
+        except FileNotFoundError:
+            return 0
+
+
+def make_backend(kind: str = TOKEN_STORE):
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "file":
+        return FileBackend()
+    if kind in ("sqlite", "sql", "db"):
+        return SqlBackend()
+    raise ValueError(f"TOKEN_STORE must be sqlite, file or memory, got {kind!r}")
+
+
+# --------------------
+# Token store: L1 dict + expiry heap in front of a backend
+# --------------------
+class TokenStore:
+    """Issues, checks, revokes and expires login tokens."""
+
+    def __init__(self, backend=None, cache_seconds: float = TOKEN_CACHE_SECONDS,
+                 max_per_user: int = TOKEN_MAX_PER_USER, purge_seconds: float = TOKEN_PURGE_SECONDS):
+        self.backend = backend if backend is not None else make_backend()
+        self.cache_seconds = cache_seconds
+        self.max_per_user = max_per_user
+        self.purge_seconds = purge_seconds
+        self._lock = threading.Lock()
+        # token key -> (entry, monotonic time it was read from the backend)
+        self._cache: dict[str, tuple[dict, float]] = {}
+        # (expires, key) for every cached token; pairs of dropped keys are skipped when popped
+        self._heap: list[tuple[float, str]] = []
+        self._last_purge = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.issued = 0
+        self.revoked = 0
+        self.expired = 0
+        self.evicted = 0
+        self.sweeps = 0
+
+    def _cache_put(self, key: str, entry: dict):
+        with self._lock:
+            if key not in self._cache:
+                heapq.heappush(self._heap, (entry["expires"], key))
+            self._cache[key] = (entry, time.monotonic())
+
+    def _cache_drop(self, keys):
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+            # revoked tokens leave their pairs in the heap; rebuild it once they dominate
+            if len(self._heap) > 2 * len(self._cache) + 1024:
+                self._heap = [(e["expires"], k) for k, (e, _) in self._cache.items()]
+                heapq.heapify(self._heap)
+
+    def issue(self, username: str, role: str, ttl: float) -> str:
+        token = str(uuid.uuid4())
+        now = time.time()
+        entry = {"username": username, "role": role, "expires": now + ttl}
+        if self.max_per_user > 0:
+            # end the oldest sessions so this one fits under the cap
+            live = sorted(s for s in self.backend.user_sessions(username) if s[0] >= now)
+            oldest = [key for _, key in live[:max(0, len(live) - self.max_per_user + 1)]]
+            if oldest:
+                self.backend.delete_many(oldest)
+                self._cache_drop(oldest)
+                self.evicted += len(oldest)
+        key = token_key(token)
+        self.backend.put(key, entry)
+        self._cache_put(key, entry)
+        self.issued += 1
+        return token
+
+    def get(self, token: str | None) -> dict | None:
+        """The entry of a live token ({username, role, expires}), or None."""
+        if not token:
+            return None
+        key = token_key(token)
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[1] < self.cache_seconds:
+            self.hits += 1
+            entry = cached[0]
+        else:
+            self.misses += 1
+            entry = self.backend.get(key)
+            if entry is None:
+                if cached is not None:
+                    self._cache_drop([key])
+                return None
+            self._cache_put(key, entry)
+        if entry["expires"] < time.time():
+            self.backend.delete_many([key])
+            self._cache_drop([key])
+            self.expired += 1
+            return None
+        return entry
+
+    def peek(self, token: str) -> dict | None:
+        """get() from this worker's cache only, never waiting on the backend (None if not cached)."""
+        cached = self._cache.get(token_key(token))
+        if cached is None or time.monotonic() - cached[1] >= self.cache_seconds:
+            return None
+        return cached[0] if cached[0]["expires"] >= time.time() else None
+
+    def revoke(self, token: str | None):
+        if not token:
+            return
+        key = token_key(token)
+        self.backend.delete_many([key])
+        self._cache_drop([key])
+        self.revoked += 1
+
+    def sweep(self, now: float | None = None) -> int:
+        """Drop every expired token from the cache and the backend; returns how many."""
+        now = time.time() if now is None else now
+        expired = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] < now:
+                expires, key = heapq.heappop(heap)
+                cached = self._cache.get(key)
+                if cached is not None and cached[0]["expires"] == expires:
+                    del self._cache[key]
+                    expired.append(key)
+        if expired:
+            self.backend.delete_many(expired)
+        if time.monotonic() - self._last_purge >= self.purge_seconds:
+            self._last_purge = time.monotonic()
+            self.backend.purge_expired(now)
+        self.expired += len(expired)
+        self.sweeps += 1
+        return len(expired)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "live_sessions": self.backend.count_live(time.time()),
+            "cached": len(self._cache),
+            "heap": len(self._heap),
+            "hits": self.hits,
+            "misses": self.misses,
+            "issued": self.issued,
+            "revoked": self.revoked,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "sweeps": self.sweeps,
+        }
@@ -0,0 +1,80 @@
+# train_lang_id.py
+"""
+Train the character-trigram language profile used by auto_lang.
+
+Sources: the CSV datasets (English questions/answers, plus the Luganda
+columns of agriculture_ai_dataset.csv), the per-language replies in
+response_rules.json and the seed phrases in lang_seeds.json.
+"""
+import csv
+import json
+import os
+import sys
+import numpy as np
+from lang_id import PROFILE_PATH, build_profile
+
+ENGLISH_CSVS = ["professional_farming_dataset.csv", "a sample_Farming_FAQ_Assistant_Dataset.csv"]
+BILINGUAL_CSV = "agriculture_ai_dataset.csv"
+RULES_PATH = "response_rules.json"
+SEEDS_PATH = "lang_seeds.json"
+
+
+def load_samples() -> dict[str, list[str]]:
+    """Collect training text per language code."""
+    samples: dict[str, list[str]] = {}
+
+    def add(lang, text):
+        if text and text.strip():
+            samples.setdefault(lang, []).append(text.strip())
+
+    for path in ENGLISH_CSVS:
+        if os.path.exists(path):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for row in csv.DictReader(f):
+                    add("en", row.get("Question"))
+                    add("en", row.get("Answer"))
+
+    if os.path.exists(BILINGUAL_CSV):
+        with open(BILINGUAL_CSV, encoding="utf-8", errors="replace") as f:
+            rows = list(csv.reader(f))
+        for row in rows[1:]:
+            if len(row) < 5:
+                continue
+            if row[4] in ("english", "luganda"):
+                # question,answer,intent,crop,language,topic (answers are English)
+                add("lg" if row[4] == "luganda" else "en", row[0])
+                add("en", row[1])
+            else:
+                # question_en,question_lg,answer_en,answer_lg,...
+                add("en", row[0])
+                add("lg", row[1])
+                add("en", row[2])
+                add("lg", row[3])
+
+    if os.path.exists(RULES_PATH):
+        with open(RULES_PATH, encoding="utf-8") as f:
+            for rule in json.load(f).get("rules", []):
+                for lang, text in rule.get("replies", {}).items():
+                    add(lang, text)
+
+    with open(SEEDS_PATH, encoding="utf-8") as f:
+        for lang, phrases in json.load(f).items():
+            for text in phrases:
+                add(lang, text)
+    return samples
+
+
+def train_and_save(path: str = PROFILE_PATH) -> bool:
+    samples = load_samples()
+    for lang in sorted(samples):
+        print(f"  {lang:4} {len(samples[lang]):5} texts")
+    langs, vocab, logp = build_profile(samples)
+    np.savez_compressed(path, langs=np.array(langs), vocab=np.array(vocab), logp=logp)
+    print(f"✓ {len(vocab)} trigrams x {len(langs)} languages saved to {path} "
+          f"({os.path.getsize(path) // 1024} KiB)")
+    return True
+
+
+if __name__ == "__main__":
+    print("🌍 Training language identifier...\n")
+    sys.exit(0 if train_and_save() else 1)
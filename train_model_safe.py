@@ -5,7 +5,6 @@ Falls back to keyword-based approach if sklearn has compatibility issues.
 """
 import pickle
 import sys
-import json
 from collections import defaultdict
 from models import SessionLocal, Knowledge
 